@@ -13,6 +13,10 @@ class EnsembleEstimator(BaseEstimator):
     def build_prediction_list(self):
         prediction_list = []
         for y_true_indexes, y_preds in zip(self.y_true_indexes_list, self.y_preds_list):
+            if y_true_indexes is None:
+                # already in row order, e.g. a view of ``ResourceManager.oof_store``
+                prediction_list.append(y_preds)
+                continue
             prediction = np.zeros_like(np.vstack(y_preds))
             for y_index, y_pred in zip(y_true_indexes, y_preds):
                 prediction[y_index] = y_pred
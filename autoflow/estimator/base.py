@@ -24,7 +24,7 @@ from autoflow.manager.resource_manager import ResourceManager
 from autoflow.metrics import r2, accuracy
 from autoflow.pipeline.dataframe import GenericDataFrame
 from autoflow.tuner.tuner import Tuner
-from autoflow.utils.concurrence import get_chunks
+from autoflow.utils.concurrence import get_chunks, WorkQueue
 from autoflow.utils.config_space import replace_phps, estimate_config_space_numbers
 from autoflow.utils.dict import update_placeholder_from_other_dict
 from autoflow.utils.klass import instancing, sequencing
@@ -45,6 +45,7 @@ class AutoFlowEstimator(BaseEstimator):
             log_config: Optional[dict] = None,
             highR_nan_threshold=0.5,
             highR_cat_threshold=0.5,
+            share_data=False,
             **kwargs
     ):
         '''
@@ -78,6 +79,11 @@ class AutoFlowEstimator(BaseEstimator):
         highR_cat_threshold: float
             high ratio categorical feature's cardinality threshold, you can find example and practice in :class:`autoflow.hdl.hdl_constructor.HDL_Constructor`
 
+        share_data: bool
+            If tuner's ``n_jobs > 1``, numerical and (encoded) categorical columns of the dataset are placed once
+            in memory-mapped files under ``{store_path}/caches/datasets``, and every tuner worker attaches them
+            read-only, so that memory usage does not grow with ``n_jobs``.
+
         kwargs: dict
             if parameters like ``tuner`` or ``hdl_constructor`` and ``resource_manager`` are passing None,
 
@@ -103,6 +109,7 @@ class AutoFlowEstimator(BaseEstimator):
         self.log_config = log_config
         self.highR_nan_threshold = highR_nan_threshold
         self.highR_cat_threshold = highR_cat_threshold
+        self.share_data = share_data
 
         # ---logger------------------------------------
         self.log_file = log_file
@@ -263,7 +270,19 @@ class AutoFlowEstimator(BaseEstimator):
             dhp, self.estimator = tuner.evaluator.shp2model(tuner.shps.sample_configuration())
             self.estimator.fit(self.data_manager.X_train, self.data_manager.y_train)
             return {"is_manual": True}
+        tuner.set_deadline()
+        # tables are created before the workers are forked, see ``ResourceManager.pooled_db``
+        self.resource_manager.init_trials_table()
         n_jobs = tuner.n_jobs
+        if self.share_data and n_jobs > 1:
+            self.data_manager.share_data(self.resource_manager.get_local_cache_dir(
+                os.path.join("datasets", self.resource_manager.task_id)))
+        if tuner.is_batch_mode():
+            self.run_batch(tuner)
+            return {"is_manual": False}
+        if tuner.is_work_stealing():
+            self.run_work_stealing(tuner)
+            return {"is_manual": False}
         run_limits = [math.ceil(tuner.run_limit / n_jobs)] * n_jobs
         is_master_list = [False] * n_jobs
         is_master_list[0] = True
@@ -326,10 +345,60 @@ class AutoFlowEstimator(BaseEstimator):
         else:
             raise NotImplementedError
 
-    def run(self, tuner, resource_manager, run_limit, initial_configs, is_master, random_state, sync_dict=None):
+    def run_work_stealing(self, tuner: Tuner):
+        # initial configurations and the runs of the search are pulled by the idle processes
+        n_jobs = tuner.n_jobs
+        initial_configs = tuner.design_initial_configs(n_jobs)
+        for config in initial_configs:
+            if config.origin is None:
+                config.origin = "Initial design"
+        manager = Manager()
+        work_queue = WorkQueue(manager, [(config.get_array(), config.origin) for config in initial_configs],
+                               tuner.get_run_limit())
+        sync_dict = manager.dict()
+        sync_dict["exit_processes"] = tuner.exit_processes
+        self.resource_manager.close_trials_table()
+        self.resource_manager.clear_pid_list()
+        self.resource_manager.close_redis()
+        random_states = np.arange(n_jobs) + self.random_state
+        processes = []
+        for i, random_state in enumerate(random_states):
+            p = multiprocessing.Process(
+                target=self.run,
+                args=(deepcopy(tuner), deepcopy(self.resource_manager), None, None, i == 0, random_state,
+                      sync_dict, work_queue)
+            )
+            processes.append(p)
+            p.start()
+        for p in processes:
+            p.join()
+        utilization = work_queue.get_utilization()
+        for pid, stats in utilization.items():
+            self.logger.info(f"Worker PID = {pid}: {stats['n_works']} trials, busy {stats['busy_time']:.2f}s, "
+                             f"utilization {stats['utilization']:.2%}.")
+        if utilization:
+            self.logger.info(f"Mean utilization of workers: "
+                             f"{np.mean([stats['utilization'] for stats in utilization.values()]):.2%}.")
+
+    def run(self, tuner, resource_manager, run_limit, initial_configs, is_master, random_state, sync_dict=None,
+            work_queue=None):
         if sync_dict:
             sync_dict[os.getpid()] = 0
             resource_manager.sync_dict = sync_dict
+        # todo : 增加 n_jobs ? 调研默认值
+        if run_limit is None:
+            run_limit = tuner.run_limit
+        tuner.run(
+            initial_configs=initial_configs,
+            work_queue=work_queue,
+            **self.prepare_tuner(tuner, resource_manager, run_limit, is_master, random_state)
+        )
+        # background writer of a worker process dies with it
+        resource_manager.close_trials_writer()
+        if sync_dict:
+            sync_dict[os.getpid()] = 1
+
+    def prepare_tuner(self, tuner, resource_manager, run_limit, is_master, random_state) -> Dict[str, Any]:
         resource_manager.set_is_master(is_master)
         resource_manager.push_pid_list()
         # random_state: 1. set_hdl中传给phps 2. 传给所有配置
@@ -339,9 +408,7 @@ class AutoFlowEstimator(BaseEstimator):
         # 替换搜索空间中的 random_state
         replace_phps(tuner.shps, "random_state", int(random_state))
         tuner.shps.seed(random_state)
-        # todo : 增加 n_jobs ? 调研默认值
-        tuner.run(
-            initial_configs=initial_configs,
+        return dict(
             evaluator_params=dict(
                 random_state=random_state,
                 data_manager=self.data_manager,
@@ -356,8 +423,41 @@ class AutoFlowEstimator(BaseEstimator):
             rh_db_params=resource_manager.runhistory_db_params,
             rh_db_table_name=resource_manager.runhistory_table_name
         )
-        if sync_dict:
-            sync_dict[os.getpid()] = 1
+
+    def run_batch(self, tuner: Tuner):
+        # one optimizer (in this process) proposes batches of configurations, ``n_jobs`` workers evaluate them
+        n_jobs = tuner.n_jobs
+        initial_configs = tuner.design_initial_configs(n_jobs)
+        manager = Manager()
+        proposal_queue, result_queue = manager.Queue(), manager.Queue()
+        self.resource_manager.close_trials_table()
+        self.resource_manager.clear_pid_list()
+        self.resource_manager.close_redis()
+        processes = []
+        for i in range(n_jobs):
+            p = multiprocessing.Process(
+                target=self.run_batch_worker,
+                args=(deepcopy(tuner), deepcopy(self.resource_manager), proposal_queue, result_queue)
+            )
+            processes.append(p)
+            p.start()
+        resource_manager = deepcopy(self.resource_manager)
+        tuner = deepcopy(tuner)
+        tuner.run_batch_optimizer(
+            initial_configs, proposal_queue, result_queue, n_jobs,
+            lambda: any(p.is_alive() for p in processes),
+            **self.prepare_tuner(tuner, resource_manager, tuner.run_limit, True, self.random_state)
+        )
+        resource_manager.close_trials_writer()
+        for p in processes:
+            p.join()
+
+    def run_batch_worker(self, tuner, resource_manager, proposal_queue, result_queue):
+        tuner.run_batch_worker(
+            proposal_queue, result_queue,
+            **self.prepare_tuner(tuner, resource_manager, tuner.run_limit, False, self.random_state)
+        )
+        resource_manager.close_trials_writer()
 
     def fit_ensemble(
             self,
@@ -372,6 +472,7 @@ class AutoFlowEstimator(BaseEstimator):
         if task_id is None:
             assert hasattr(self.resource_manager, "task_id") and self.resource_manager.task_id is not None
             task_id = self.resource_manager.task_id
+        self.resource_manager.flush_trials()
         # if hdl_id is None:
         #     assert hasattr(self.resource_manager, "hdl_id") and self.resource_manager.hdl_id is not None
         #     hdl_id = self.resource_manager.hdl_id
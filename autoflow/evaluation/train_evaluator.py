@@ -1,13 +1,16 @@
 import re
 import sys
 from collections import defaultdict
-from contextlib import redirect_stderr
+from contextlib import redirect_stderr, ExitStack
+from copy import deepcopy
 from io import StringIO
 from time import time
 from typing import Dict, Optional
 
 import numpy as np
+import pandas as pd
 from ConfigSpace import Configuration
+from joblib import Parallel, delayed
 
 from dsmac.runhistory.utils import get_id_of_config
 from autoflow.constants import PHASE2, PHASE1
@@ -16,22 +19,132 @@ from autoflow.evaluation.base import BaseEvaluator
 from autoflow.manager.data_manager import DataManager
 from autoflow.manager.resource_manager import ResourceManager
 from autoflow.metrics import Scorer, calculate_score
+from autoflow.pipeline.cache import MemoryPreprocessingCache, DiskPreprocessingCache
 from autoflow.pipeline.dataframe import GenericDataFrame
 from autoflow.pipeline.pipeline import GenericPipeline
 from autoflow.shp2dhp.shp2dhp import SHP2DHP
+from autoflow.utils.concurrence import parse_n_jobs
 from autoflow.utils.dict import group_dict_items_before_first_dot
+from autoflow.utils.hash import get_hash_of_array, get_hash_of_str
 from autoflow.utils.logging import get_logger
+from autoflow.utils.memory import AllocationTracer
 from autoflow.utils.ml_task import MLTask
 from autoflow.utils.packages import get_class_object_in_pipeline_components
 from autoflow.utils.pipeline import concat_pipeline
 from autoflow.utils.sys import get_trance_back_msg
 
 
+logger = get_logger(__name__)
+
+
+def _procedure_one_fold_in_process(*args, **kwargs):
+    # warnings of worker processes are not redirected by the trial, they are returned with the fold result
+    warning_info = StringIO()
+    with redirect_stderr(warning_info):
+        result = _procedure_one_fold(*args, **kwargs)
+    result["warning_info"] = warning_info.getvalue()
+    return result
+
+
+def _procedure_one_fold(model: GenericPipeline, ml_task: MLTask, X: GenericDataFrame, y, X_test, y_test,
+                        train_index, valid_index, resource_manager, should_store_intermediate_result, debug,
+                        preprocessing_cache=None, cache_key=""):
+    # module level function, so that process-based executors only need to pickle what is used by one fold
+    X_train, X_valid = X.split([train_index, valid_index])
+    y_train, y_valid = y[train_index], y[valid_index]
+    if should_store_intermediate_result:
+        intermediate_result = []
+    else:
+        intermediate_result = None
+    try:
+        procedure_result = model.procedure(ml_task, X_train, y_train, X_valid, y_valid, X_test, y_test,
+                                           resource_manager, intermediate_result, preprocessing_cache, cache_key)
+    except Exception as e:
+        if debug:
+            logger.error("re-raise exception")
+            raise sys.exc_info()[1]
+        return {
+            "status": "FAILED",
+            "failed_info": get_trance_back_msg(),
+            "intermediate_result": intermediate_result
+        }
+    return {
+        "status": "SUCCESS",
+        "model": model,
+        "valid_index": valid_index,
+        "y_valid": y_valid,
+        "y_pred": procedure_result["pred_valid"],
+        "y_test_pred": procedure_result["pred_test"],
+        "cache_stats": procedure_result["cache_stats"],
+        "step_stats": procedure_result["step_stats"],
+        "intermediate_result": intermediate_result
+    }
+
+
 class TrainEvaluator(BaseEvaluator):
-    def __init__(self):
+    def __init__(
+            self,
+            n_fold_jobs: int = 1,
+            fold_executor: str = "thread",
+            preprocessing_cache: Optional[str] = None,
+            preprocessing_cache_size: float = 1024,
+            race_folds: bool = False,
+            trace_allocations: bool = False
+    ):
+        '''
+
+        Parameters
+        ----------
+        n_fold_jobs: int
+            How many cross-validation folds are fitted concurrently in one trial.
+
+            ``1`` means folds are fitted one after another in current process.
+        fold_executor: str
+            Which executor is used when ``n_fold_jobs > 1``.
+
+                * ``thread``  - folds share the data with the trial directly.
+                * ``process`` - folds are sent to worker processes, large arrays are shared by memory mapping.
+        preprocessing_cache: str or None
+            Cache fitted preprocessing prefixes across trials, keyed by task, fold and the DHP sub-tree of the prefix.
+            Trials which share the same preprocessing steps will only fit them once per fold.
+
+                * ``None``   - no cache.
+                * ``memory`` - in the memory of each tuner worker, disabled with ``process`` fold executors.
+                * ``disk``   - in ``{store_path}/caches/preprocessing``, shared by all tuner workers.
+        preprocessing_cache_size: float
+            Max size of the preprocessing cache in MB, least recently used entries are evicted.
+        race_folds: bool
+            Every cross-validation fold is a SMAC instance, and one call evaluates only one fold.
+
+            So that SMAC's intensification can race a challenger against the incumbent fold by fold,
+            and drop it without running the rest folds if it is clearly worse.
+            Each fold is stored in trials table with its ``fold_index``, and a complete trial (``fold_index = -1``)
+            is inserted after all folds of a configuration are evaluated.
+            Splitter is not re-seeded for every tuner worker in this mode, so that folds are the same in all workers.
+        trace_allocations: bool
+            Trace the memory allocated by each trial, from getting the data to fitting and scoring all folds,
+            and store it in ``allocation_stats`` of trials table (``peak_bytes`` and ``retained_bytes``).
+            Allocations of ``process`` fold executors are not traced.
+        '''
+        assert fold_executor in ("thread", "process")
+        assert preprocessing_cache in (None, "memory", "disk")
+        self.fold_executor = fold_executor
+        self.n_fold_jobs = parse_n_jobs(n_fold_jobs)
+        if preprocessing_cache == "memory" and self.is_process_executor():
+            # every fold process would fill its own copy of the cache, which is lost with the process
+            logger.warning("preprocessing_cache = 'memory' is disabled with fold_executor = 'process', "
+                           "use 'disk' to share the cache with fold processes.")
+            preprocessing_cache = None
+        self.preprocessing_cache = preprocessing_cache
+        self.preprocessing_cache_size = preprocessing_cache_size
+        self.race_folds = race_folds
+        self.trace_allocations = trace_allocations
         # ---member variable----
         self.debug = False
 
+    def is_process_executor(self) -> bool:
+        return self.fold_executor == "process" and self.n_fold_jobs > 1
+
     def init_data(
             self,
             random_state,
@@ -43,7 +156,7 @@ class TrainEvaluator(BaseEvaluator):
             resource_manager: ResourceManager
     ):
         self.random_state = random_state
-        if hasattr(splitter, "random_state"):
+        if hasattr(splitter, "random_state") and not self.race_folds:
             setattr(splitter, "random_state", self.random_state)
         self.splitter = splitter
         self.data_manager = data_manager
@@ -64,6 +177,26 @@ class TrainEvaluator(BaseEvaluator):
 
         self.logger = get_logger(self)
         self.resource_manager = resource_manager
+        self.init_preprocessing_cache()
+
+    def init_preprocessing_cache(self):
+        if self.preprocessing_cache == "memory":
+            self.cache = MemoryPreprocessingCache(self.preprocessing_cache_size)
+        elif self.preprocessing_cache == "disk":
+            cache_dir = self.resource_manager.get_local_cache_dir("preprocessing")
+            self.cache = DiskPreprocessingCache(cache_dir, self.preprocessing_cache_size)
+        else:
+            self.cache = None
+
+    def disable_memory_caches(self):
+        '''
+        Disable the caches which are kept in the memory of the process, called in persistent workers:
+        their address space is limited once, cached entries would count against the memory limit of the next trials.
+        '''
+        if self.preprocessing_cache == "memory":
+            self.cache = None
+        self.resource_manager.model_cache_size = 0
+        self.resource_manager.model_cache = None
 
     def loss(self, y_true, y_hat):
         score = calculate_score(
@@ -99,7 +232,42 @@ class TrainEvaluator(BaseEvaluator):
         return (self.X_train), (self.y_train), (self.X_test), (self.y_test)
         # return deepcopy(self.X_train), deepcopy(self.y_train), deepcopy(self.X_test), deepcopy(self.y_test)
 
-    def evaluate(self, model: GenericPipeline, X, y, X_test, y_test):
+    def get_fold_cache_key(self, train_index, valid_index):
+        if self.cache is None:
+            return ""
+        # indexes are hashed because every tuner worker has its own splitter random_state
+        return get_hash_of_str(
+            f"{self.resource_manager.task_id}-"
+            f"{get_hash_of_array(np.asarray(train_index))}-{get_hash_of_array(np.asarray(valid_index))}")
+
+    def iter_fold_results(self, model: GenericPipeline, X, y, X_test, y_test, fold_indexes=None):
+        folds = list(self.splitter.split(X, y))
+        if fold_indexes is not None:
+            folds = [folds[fold_index] for fold_index in fold_indexes]
+        n_jobs = min(self.n_fold_jobs, len(folds))
+        in_process = n_jobs > 1 and self.is_process_executor()
+        # the resource manager (connections, queues) is not sent to fold processes
+        resource_manager = None if in_process else self.resource_manager
+        # every fold fits its own copy of the pipeline, so fitted models of different folds are not shared
+        args_list = [
+            (deepcopy(model), self.ml_task, X, y, X_test, y_test, train_index, valid_index, resource_manager,
+             self.should_store_intermediate_result, self.debug, self.cache,
+             self.get_fold_cache_key(train_index, valid_index))
+            for train_index, valid_index in folds
+        ]
+        if n_jobs <= 1:
+            # lazy, so that the rest folds will not be fitted after a failed fold
+            return (_procedure_one_fold(*args) for args in args_list)
+        if in_process:
+            # joblib memory-maps large arrays (such as X and y) instead of copying them into every worker
+            return Parallel(n_jobs=n_jobs, backend="loky")(
+                delayed(_procedure_one_fold_in_process)(*args) for args in args_list
+            )
+        return Parallel(n_jobs=n_jobs, backend="threading")(
+            delayed(_procedure_one_fold)(*args) for args in args_list
+        )
+
+    def evaluate(self, model: GenericPipeline, X, y, X_test, y_test, fold_indexes=None):
         assert self.resource_manager is not None
         warning_info = StringIO()
         with redirect_stderr(warning_info):
@@ -112,88 +280,146 @@ class TrainEvaluator(BaseEvaluator):
             all_scores = []
             status = "SUCCESS"
             failed_info = ""
-            for train_index, valid_index in self.splitter.split(X, y):
-                X: GenericDataFrame
-                X_train, X_valid = X.split([train_index, valid_index])
-                y_train, y_valid = y[train_index], y[valid_index]
-                if self.should_store_intermediate_result:
-                    intermediate_result = []
-                else:
-                    intermediate_result = None
-                try:
-                    procedure_result = model.procedure(self.ml_task, X_train, y_train, X_valid, y_valid, X_test, y_test,
-                                                       self.resource_manager, intermediate_result)
-                except Exception as e:
-                    failed_info = get_trance_back_msg()
+            intermediate_result = None
+            cache_stats = {"hits": 0, "misses": 0}
+            # cost of each step of the pipeline, for each fold
+            step_stats = []
+            # fold results keep the order of splitter.split, whatever executor is used
+            for fold_result in self.iter_fold_results(model, X, y, X_test, y_test, fold_indexes):
+                warning_info.write(fold_result.get("warning_info", ""))
+                intermediate_result = fold_result["intermediate_result"]
+                if fold_result["status"] == "FAILED":
+                    failed_info = fold_result["failed_info"]
                     status = "FAILED"
-                    if self.debug:
-                        self.logger.error("re-raise exception")
-                        raise sys.exc_info()[1]
                     break
-                models.append(model)
-                y_true_indexes.append(valid_index)
-                y_pred = procedure_result["pred_valid"]
-                y_test_pred = procedure_result["pred_test"]
+                models.append(fold_result["model"])
+                y_true_indexes.append(fold_result["valid_index"])
+                y_pred = fold_result["y_pred"]
                 y_preds.append(y_pred)
-                y_test_preds.append(y_test_pred)
-                loss, all_score = self.loss(y_valid, y_pred)
+                y_test_preds.append(fold_result["y_test_pred"])
+                loss, all_score = self.loss(fold_result["y_valid"], y_pred)
                 losses.append(float(loss))
                 all_scores.append(all_score)
-            if len(losses) > 0:
-                final_loss = float(np.array(losses).mean())
-            else:
-                final_loss = 65535
-            if len(all_scores) > 0 and all_scores[0]:
-                all_score = defaultdict(list)
-                for cur_all_score in all_scores:
-                    if isinstance(cur_all_score, dict):
-                        for key, value in cur_all_score.items():
-                            all_score[key].append(value)
-                    else:
-                        self.logger.warning(f"TypeError: cur_all_score is not dict.\ncur_all_score = {cur_all_score}")
-                for key in all_score.keys():
-                    all_score[key] = float(np.mean(all_score[key]))
-            else:
-                all_score = {}
-                all_scores = []
-            info = {
-                "loss": final_loss,
-                "losses": losses,
-                "all_score": all_score,
-                "all_scores": all_scores,
-                "models": models,
-                "y_true_indexes": y_true_indexes,
-                "y_preds": y_preds,
+                for key in cache_stats:
+                    cache_stats[key] += fold_result["cache_stats"][key]
+                step_stats.append(fold_result["step_stats"])
+            info = self.summarize_folds(losses, all_scores, models, y_true_indexes, y_preds, y_test_preds, y_test)
+            info.update({
                 "intermediate_result": intermediate_result,
                 "status": status,
-                "failed_info": failed_info
-            }
-            # todo
-            if y_test is not None:
-                # 验证集训练模型的组合去预测测试集的数据
-                if self.ml_task.mainTask == "classification":
-                    y_test_pred = vote_predicts(y_test_preds)
-                else:
-                    y_test_pred = mean_predicts(y_test_preds)
-                test_loss, test_all_score = self.loss(y_test, y_test_pred)
-                info.update({
-                    "test_loss": test_loss,
-                    "test_all_score": test_all_score,
-                    "y_test_true": y_test,
-                    "y_test_pred": y_test_pred
-                })
+                "failed_info": failed_info,
+                "preprocessing_cache_stats": cache_stats if self.cache is not None else {},
+                "step_stats": step_stats
+            })
         info["warning_info"] = warning_info.getvalue()
         return info
 
-    def __call__(self, shp: Configuration):
+    def summarize_folds(self, losses, all_scores, models, y_true_indexes, y_preds, y_test_preds, y_test):
+        if len(losses) > 0:
+            final_loss = float(np.array(losses).mean())
+        else:
+            final_loss = 65535
+        if len(all_scores) > 0 and all_scores[0]:
+            all_score = defaultdict(list)
+            for cur_all_score in all_scores:
+                if isinstance(cur_all_score, dict):
+                    for key, value in cur_all_score.items():
+                        all_score[key].append(value)
+                else:
+                    self.logger.warning(f"TypeError: cur_all_score is not dict.\ncur_all_score = {cur_all_score}")
+            for key in all_score.keys():
+                all_score[key] = float(np.mean(all_score[key]))
+        else:
+            all_score = {}
+            all_scores = []
+        info = {
+            "loss": final_loss,
+            "losses": losses,
+            "all_score": all_score,
+            "all_scores": all_scores,
+            "models": models,
+            "y_true_indexes": y_true_indexes,
+            "y_preds": y_preds,
+        }
+        # todo
+        if y_test is not None and len(y_test_preds) > 0:
+            # 验证集训练模型的组合去预测测试集的数据
+            if self.ml_task.mainTask == "classification":
+                y_test_pred = vote_predicts(y_test_preds)
+            else:
+                y_test_pred = mean_predicts(y_test_preds)
+            test_loss, test_all_score = self.loss(y_test, y_test_pred)
+            info.update({
+                "test_loss": test_loss,
+                "test_all_score": test_all_score,
+                "y_test_true": y_test,
+                "y_test_pred": y_test_pred
+            })
+        return info
+
+    def get_fold_instances(self, instance_id):
+        n_folds = self.splitter.get_n_splits(self.X_train, self.y_train)
+        return [f"{instance_id}-fold{fold_index}" for fold_index in range(n_folds)]
+
+    def parse_fold_instance(self, instance):
+        match = re.search(r"-fold(\d+)$", str(instance))
+        if match is None:
+            raise ValueError(f"Invalid fold instance '{instance}'.")
+        return int(match.group(1))
+
+    def get_budget_instances(self, instance_id, budgets):
+        return [f"{instance_id}-budget{budget:.6g}" for budget in budgets]
+
+    def parse_budget_instance(self, instance) -> float:
+        match = re.search(r"-budget([0-9.e+-]+)$", str(instance))
+        if match is None:
+            return 1.0
+        return float(match.group(1))
+
+    def get_budget_indexes(self, budget):
+        # rows of a smaller budget are also in larger ones, and classes keep their proportions.
+        # the random state is fixed, so that all tuner workers use the same rows.
+        if budget >= 1:
+            return None
+        rng = np.random.RandomState(0)
+        if self.ml_task.mainTask == "classification":
+            groups = [np.flatnonzero(self.y_train == label) for label in np.unique(self.y_train)]
+        else:
+            groups = [np.arange(self.y_train.shape[0])]
+        indexes = []
+        for group in groups:
+            n_samples = max(int(round(budget * group.size)), 1)
+            indexes.append(rng.permutation(group)[:n_samples])
+        return np.sort(np.hstack(indexes))
+
+    def __call__(self, shp: Configuration, seed=0, instance=None):
         # 1. 将php变成model
         config_id = get_id_of_config(shp)
         start = time()
         dhp, model = self.shp2model(shp)
-        # 2. 获取数据
-        X_train, y_train, X_test, y_test = self.get_Xy()
-        # 3. 进行评价
-        info = self.evaluate(model, X_train, y_train, X_test, y_test)  # todo : 考虑失败的情况
+        allocation_tracer = AllocationTracer() if self.trace_allocations else ExitStack()
+        with allocation_tracer:
+            # 2. 获取数据
+            X_train, y_train, X_test, y_test = self.get_Xy()
+            budget = self.parse_budget_instance(instance)
+            budget_indexes = self.get_budget_indexes(budget)
+            if budget_indexes is not None:
+                X_train = next(X_train.split([budget_indexes]))
+                if isinstance(y_train, pd.Series):
+                    y_train = y_train.iloc[budget_indexes].reset_index(drop=True)
+                else:
+                    y_train = y_train[budget_indexes]
+            # 3. 进行评价
+            if self.race_folds:
+                fold_index = self.parse_fold_instance(instance)
+                fold_indexes = [fold_index]
+            else:
+                fold_index = -1
+                fold_indexes = None
+            info = self.evaluate(model, X_train, y_train, X_test, y_test, fold_indexes)  # todo : 考虑失败的情况
+        if budget_indexes is not None:
+            # indexes of the full training set
+            info["y_true_indexes"] = [budget_indexes[index] for index in info["y_true_indexes"]]
         # 4. 持久化
         cost_time = time() - start
         info["config_id"] = config_id
@@ -202,12 +428,76 @@ class TrainEvaluator(BaseEvaluator):
         estimator = list(dhp.get(PHASE2, {"unk": ""}).keys())[0]
         info["estimator"] = estimator
         info["cost_time"] = cost_time
+        info["fold_index"] = fold_index
+        info["budget"] = budget
+        if self.trace_allocations:
+            info["allocation_stats"] = allocation_tracer.stats
         self.resource_manager.insert_to_trials_table(info)
+        if self.race_folds and info["status"] == "SUCCESS":
+            self.insert_complete_trial(config_id, shp, dhp, estimator)
         return {
             "loss": info["loss"],
             "status": info["status"]
         }
 
+    def insert_complete_trial(self, config_id, shp, dhp, estimator):
+        # folds of one configuration may be evaluated by different tuner workers,
+        # whoever finishes the last fold inserts the complete cross-validation trial,
+        # which is what ensemble and best-model queries are looking for.
+        # Workers which finish the last folds together race for a claim, only the winner inserts.
+        n_folds = self.splitter.get_n_splits(self.X_train, self.y_train)
+        self.resource_manager.flush_trials()
+        if self.resource_manager.exists_complete_trial(config_id):
+            return
+        fold_trials = self.resource_manager.get_fold_trials(config_id)
+        if len(fold_trials) < n_folds:
+            return
+        losses = []
+        all_scores = []
+        models = []
+        y_true_indexes = []
+        y_preds = []
+        y_test_preds = []
+        step_stats = []
+        cost_time = 0
+        for fold_index in range(n_folds):
+            record = fold_trials.get(fold_index)
+            if record is None or record.status != "SUCCESS":
+                return
+            fold_models = self.resource_manager.load_models_of_trial(record)
+            if fold_models is None or record.y_true_indexes is None:
+                self.logger.warning(f"Models of fold {fold_index} of config '{config_id}' have been deleted, "
+                                    f"complete trial will not be inserted.")
+                return
+            models.extend(fold_models)
+            losses.extend(record.losses)
+            all_scores.extend(record.all_scores)
+            y_true_indexes.extend(record.y_true_indexes)
+            y_preds.extend(record.y_preds)
+            if record.y_test_pred is not None:
+                y_test_preds.append(record.y_test_pred)
+            step_stats.extend(record.step_stats)
+            cost_time += record.cost_time
+        info = self.summarize_folds(losses, all_scores, models, y_true_indexes, y_preds, y_test_preds, self.y_test)
+        info.update({
+            "intermediate_result": None,
+            "status": "SUCCESS",
+            "config_id": config_id,
+            "program_hyper_param": shp,
+            "dict_hyper_param": dhp,
+            "estimator": estimator,
+            "cost_time": cost_time,
+            "fold_index": -1,
+            "step_stats": step_stats,
+        })
+        if not self.resource_manager.claim_complete_trial(config_id):
+            return
+        try:
+            self.resource_manager.insert_to_trials_table(info)
+        except Exception:
+            self.resource_manager.release_complete_trial(config_id)
+            raise
+
     def shp2model(self, shp):
         shp2dhp = SHP2DHP()
         dhp = shp2dhp(shp)
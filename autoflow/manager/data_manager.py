@@ -6,9 +6,10 @@ import numpy as np
 import pandas as pd
 
 from autoflow.pipeline.components.utils import stack_Xs
+from autoflow.manager.shared_dataframe import dump_shared_dataframe, load_shared_dataframe
 from autoflow.pipeline.dataframe import GenericDataFrame
 from autoflow.utils.data import is_nan, is_cat, is_highR_nan
-from autoflow.utils.dataframe import pop_if_exists
+from autoflow.utils.dataframe import pop_if_exists, rectify_dtypes
 from autoflow.utils.klass import StrSignatureMixin
 from autoflow.utils.logging import get_logger
 from autoflow.utils.ml_task import MLTask, get_ml_task_from_y
@@ -60,6 +61,8 @@ class DataManager(StrSignatureMixin):
             high ratio NaN threshold, you can find examples and practice in :class:`autoflow.hdl.hdl_constructor.HDL_Constructor`
         '''
         self.logger = get_logger(self)
+        self.shared_frames = {}
+        self.shared_descriptors = {}
         dataset_metadata = dict(dataset_metadata)
         self.highR_nan_threshold = highR_nan_threshold
         self.dataset_metadata = dataset_metadata
@@ -76,6 +79,10 @@ class DataManager(StrSignatureMixin):
         self.X_train = GenericDataFrame(X_train, feature_groups=feature_groups)
         self.y_train = y_train
         self.X_test = GenericDataFrame(X_test, feature_groups=feature_groups) if X_test is not None else None
+        # dtypes are normalized once here, so that components (and their folds) get valid dtypes already
+        rectify_dtypes(self.X_train)
+        if self.X_test is not None:
+            rectify_dtypes(self.X_test)
         self.y_test = y_test if y_test is not None else None
 
         # todo: 用户自定义验证集可以通过RandomShuffle 或者mlxtend指定
@@ -114,9 +121,11 @@ class DataManager(StrSignatureMixin):
         return X
 
     def parse_column_descriptions(self, column_descriptions, X_train, y_train, X_test, y_test):
-        # todo: 校验X是否存在重名列
         X_train = self.type_check(X_train)
         X_test = self.type_check(X_test)
+        for X in (X_train, X_test):
+            if X is not None and X.columns.duplicated().any():
+                raise ValueError(f"Duplicated columns: {X.columns[X.columns.duplicated()].tolist()}")
         both_set = False
         if X_train is not None and X_test is None:
             X = X_train
@@ -199,6 +208,7 @@ class DataManager(StrSignatureMixin):
             raise ValueError
         X = X[columns]
         X = GenericDataFrame(X, feature_groups=self.feature_groups)
+        rectify_dtypes(X)
         return X
 
     def set_data(self, X_train=None, y_train=None, X_test=None, y_test=None):
@@ -206,3 +216,41 @@ class DataManager(StrSignatureMixin):
         self.X_test = self.process_X(X_test)
         self.y_train = y_train
         self.y_test = y_test
+
+    def share_data(self, directory: str):
+        '''
+        Place ``X_train`` and ``X_test`` in memory-mapped files under ``directory``, and replace them by
+        read-only frames attached to these files.
+
+        After that, pickling (or deep-copying) the DataManager only carries the descriptions of the files,
+        so tuner workers attach the same files instead of holding their own copies of the dataset.
+        '''
+        for name in ("X_train", "X_test"):
+            X = getattr(self, name)
+            if X is None or self.shared_frames.get(name) is X:
+                continue
+            descriptor = dump_shared_dataframe(X, directory, name)
+            if descriptor is None:
+                continue
+            self.shared_descriptors[name] = descriptor
+            self.shared_frames[name] = load_shared_dataframe(descriptor)
+            setattr(self, name, self.shared_frames[name])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("shared_frames", None)
+        shared_descriptors = {}
+        for name, descriptor in self.__dict__.get("shared_descriptors", {}).items():
+            # frames which have been replaced (e.g. by ``set_data``) are pickled as usual
+            if state[name] is self.shared_frames[name]:
+                state[name] = None
+                shared_descriptors[name] = descriptor
+        state["shared_descriptors"] = shared_descriptors
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.shared_frames = {}
+        for name, descriptor in self.shared_descriptors.items():
+            self.shared_frames[name] = load_shared_dataframe(descriptor)
+            setattr(self, name, self.shared_frames[name])
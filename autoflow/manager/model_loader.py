@@ -0,0 +1,73 @@
+from collections import OrderedDict
+from collections.abc import Sequence
+from threading import Lock
+from typing import Callable, List, Any, Optional
+
+
+class ModelCache():
+    '''
+    Least recently used models of trials, keyed by their ``models_path``.
+
+    Parameters
+    ----------
+    maxsize: int
+        max number of trials whose models are kept, 0 disables the cache.
+    '''
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.models = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, path: str) -> Optional[List]:
+        with self.lock:
+            if path not in self.models:
+                return None
+            self.models.move_to_end(path)
+            return self.models[path]
+
+    def put(self, path: str, models: List):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.models[path] = models
+            self.models.move_to_end(path)
+            while len(self.models) > self.maxsize:
+                self.models.popitem(last=False)
+
+
+class LazyModels(Sequence):
+    '''
+    Models of a trial (one per fold), loaded the first time they are accessed, e.g. when the ensemble predicts.
+    A pickled proxy is a list of the loaded models.
+    '''
+
+    def __init__(self, path: str, load: Callable[[str], List]):
+        self.path = path
+        self.load = load
+        self.lock = Lock()
+        self._models = None
+
+    @property
+    def models(self) -> List[Any]:
+        if self._models is None:
+            with self.lock:
+                if self._models is None:
+                    self._models = self.load(self.path)
+        return self._models
+
+    def __getitem__(self, index):
+        return self.models[index]
+
+    def __len__(self):
+        return len(self.models)
+
+    def __iter__(self):
+        return iter(self.models)
+
+    def __reduce__(self):
+        return list, (list(self.models),)
+
+    def __repr__(self):
+        state = "loaded" if self._models is not None else "not loaded"
+        return f"LazyModels({self.path!r}, {state})"
@@ -0,0 +1,133 @@
+import fcntl
+import os
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+
+class OOFStore():
+    '''
+    Out-of-fold predictions of the trials of a task, in row order, in memory-mapped ``.npy`` files.
+
+    Predictions of a trial are scattered once (by their fold indexes) into a slot of shape ``(n_rows, n_classes)``.
+    Slots of the same shape and dtype are stacked in files of ``chunk_size`` slots, i.e. arrays of shape
+    ``(chunk_size, n_rows, n_classes)``, which are created (sparse, so unused slots take no disk space)
+    when the first slot is allocated in them. Slots are allocated under an exclusive ``flock``, so that
+    tuner workers of different processes can write concurrently. Slots of deleted trials are freed
+    (:meth:`free`) and allocated again.
+
+    A slot is referenced by a string ``"{key}/{index}"``, which is stored in the trials table.
+    :meth:`get` returns a slot as a read-only view of the file, :meth:`take` returns slots as a
+    ``(n_trials, n_rows, n_classes)`` array, which is a view if they are evenly spaced in one file.
+
+    Parameters
+    ----------
+    directory: str
+        local directory of the files of the task.
+    chunk_size: int
+        number of slots per file.
+    '''
+
+    def __init__(self, directory: str, chunk_size: int = 64):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        os.makedirs(self.directory, exist_ok=True)
+        self._maps: Dict[Tuple[str, int, str], np.memmap] = {}
+
+    @staticmethod
+    def get_key(shape: Tuple[int, ...], dtype: np.dtype) -> str:
+        return "x".join(map(str, shape)) + "-" + np.dtype(dtype).str.replace("<", "").replace(">", "")
+
+    def get_path(self, key: str, chunk: int) -> str:
+        return os.path.join(self.directory, f"oof-{key}-{chunk}.npy")
+
+    def _lock(self):
+        lock_file = open(os.path.join(self.directory, "slots.lock"), "a+")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        # closing the file releases the lock
+        return lock_file
+
+    def _read_indexes(self, path: str) -> List[int]:
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [int(index) for index in f.read().split()]
+
+    def _write_indexes(self, path: str, indexes: List[int]):
+        with open(path, "w") as f:
+            f.write(" ".join(map(str, indexes)))
+
+    def _allocate(self, key: str, shape: Tuple[int, ...], dtype: np.dtype) -> int:
+        with self._lock():
+            # slots freed by deleted trials are used first
+            free_path = os.path.join(self.directory, f"free-{key}.txt")
+            free = self._read_indexes(free_path)
+            if free:
+                self._write_indexes(free_path, free[1:])
+                return free[0]
+            counter_path = os.path.join(self.directory, f"slots-{key}.txt")
+            index = (self._read_indexes(counter_path) or [0])[0]
+            path = self.get_path(key, index // self.chunk_size)
+            if not os.path.exists(path):
+                np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(self.chunk_size,) + shape)
+            self._write_indexes(counter_path, [index + 1])
+        return index
+
+    def free(self, slots: List[str]):
+        '''
+        Free the slots of deleted trials, they are overwritten by the next trials. Views of these slots
+        must not be used anymore.
+        '''
+        key2indexes = {}
+        for slot in slots:
+            key, index = slot.rsplit("/", 1)
+            key2indexes.setdefault(key, []).append(int(index))
+        with self._lock():
+            for key, indexes in key2indexes.items():
+                free_path = os.path.join(self.directory, f"free-{key}.txt")
+                free = self._read_indexes(free_path)
+                self._write_indexes(free_path, free + sorted(set(indexes) - set(free)))
+
+    def _get_map(self, key: str, chunk: int, mode: str) -> np.memmap:
+        if (key, chunk, mode) not in self._maps:
+            self._maps[(key, chunk, mode)] = np.load(self.get_path(key, chunk), mmap_mode=mode)
+        return self._maps[(key, chunk, mode)]
+
+    def write(self, y_true_indexes: List[np.ndarray], y_preds: List[np.ndarray]) -> str:
+        '''
+        Write the predictions of the folds of a trial in row order, and return the reference of their slot.
+        Rows are as many as the predictions of all folds.
+        '''
+        n_rows = sum(len(y_pred) for y_pred in y_preds)
+        first = np.asarray(y_preds[0])
+        shape = (n_rows,) + first.shape[1:]
+        key = self.get_key(shape, first.dtype)
+        index = self._allocate(key, shape, first.dtype)
+        slot = self._get_map(key, index // self.chunk_size, "r+")[index % self.chunk_size]
+        for y_index, y_pred in zip(y_true_indexes, y_preds):
+            slot[y_index] = y_pred
+        slot.flush()
+        return f"{key}/{index}"
+
+    def get(self, slot: str) -> np.ndarray:
+        key, index = slot.rsplit("/", 1)
+        index = int(index)
+        return self._get_map(key, index // self.chunk_size, "r")[index % self.chunk_size]
+
+    def take(self, slots: List[str]) -> np.ndarray:
+        '''
+        Predictions of ``slots`` as a ``(n_trials, n_rows, n_classes)`` array, a view of the file if the slots
+        are in the same file and evenly spaced, otherwise they are gathered in a new array.
+        '''
+        parsed = [slot.rsplit("/", 1) for slot in slots]
+        keys = {key for key, _ in parsed}
+        indexes = np.array([int(index) for _, index in parsed])
+        if len(keys) == 1 and len(indexes) and len(set(indexes // self.chunk_size)) == 1:
+            array = self._get_map(keys.pop(), int(indexes[0]) // self.chunk_size, "r")
+            offsets = indexes % self.chunk_size
+            steps = np.diff(offsets)
+            if len(offsets) == 1:
+                return array[offsets[0]:offsets[0] + 1]
+            if steps[0] > 0 and np.all(steps == steps[0]):
+                return array[offsets[0]:offsets[-1] + 1:steps[0]]
+        return np.stack([self.get(slot) for slot in slots])
@@ -1,29 +1,37 @@
 import datetime
 import hashlib
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from copy import deepcopy
 from getpass import getuser
-from typing import Dict, Tuple, List, Union, Any
+from typing import Dict, Tuple, List, Union, Any, Optional, Type, Sequence
 
 # import json5 as json
 import peewee as pw
 from frozendict import frozendict
-from joblib import load
 from redis import Redis
 
 import generic_fs
 from generic_fs import FileSystem
+from generic_fs.codecs import get_suffix
 from generic_fs.utils import get_db_class_by_db_type
 from autoflow.ensemble.mean.regressor import MeanRegressor
 from autoflow.ensemble.vote.classifier import VoteClassifier
 from autoflow.manager.data_manager import DataManager
+from autoflow.manager.model_loader import ModelCache, LazyModels
+from autoflow.manager.oof_store import OOFStore
+from autoflow.manager.trials_writer import TrialsWriter
 from autoflow.metrics import Scorer
 from autoflow.utils.hash import get_hash_of_Xy, get_hash_of_str, get_hash_of_dict
 from autoflow.utils.klass import StrSignatureMixin
 from autoflow.utils.logging import get_logger
 from autoflow.utils.ml_task import MLTask
 from autoflow.utils.packages import find_components
-from autoflow.utils.peewee import PickleFiled
+from autoflow.utils.peewee import PickleFiled, get_shared_database, create_tables_once, release_shared_database, \
+    add_missing_columns, \
+    drop_columns
 
 
 class ResourceManager(StrSignatureMixin):
@@ -41,8 +49,16 @@ class ResourceManager(StrSignatureMixin):
             redis_params=frozendict(),
             max_persistent_estimators=50,
             persistent_mode="fs",
-            compress_suffix="bz2"
-
+            compress_suffix="bz2",
+            compress_suffixes=frozendict(),
+            async_persistence=False,
+            persistence_queue_size=16,
+            pooled_db=False,
+            lean_trials=False,
+            oof_store=False,
+            load_threads=8,
+            lazy_models=False,
+            model_cache_size=0
     ):
         '''
 
@@ -88,6 +104,52 @@ class ResourceManager(StrSignatureMixin):
                 * ``fs`` - serialize entity to bytes and form a pickle file upload to storage system or save in local.
         compress_suffix: str
             compress file's suffix, default is bz2
+        compress_suffixes: dict
+            Codec of each type of artifact (``models``, ``intermediate_results`` and ``datasets``), by name or suffix,
+            ``compress_suffix`` if not specified. Available codecs are ``none`` (pkl), ``gzip`` (gz), ``bz2``,
+            ``lzma`` (xz), ``lz4`` and ``zstd`` (zst), see :mod:`generic_fs.codecs`.
+            For example, ``{"models": "lz4", "datasets": "zstd"}``. With ``file_system_params["compress_threads"]``
+            greater than 1 (default 1, tuner workers are already parallel and threads count against their memory
+            limit), gzip, bz2 and lz4 are compressed by chunks in parallel, zstd with its own threads.
+            lz4 and zstd need the ``lz4`` and ``zstandard`` packages.
+        async_persistence: bool
+            Persist trials (dump models, insert records) in a background thread, so that evaluations do not wait
+            for the storage. Trials waiting in the queue are inserted in one transaction.
+
+            Queued trials are flushed when trials table is closed, at the end of each tuner worker,
+            and before fitting ensemble or loading the best estimator.
+            Only active if ``Tuner.limit_resource = False``, otherwise trials are evaluated in child processes
+            which can be killed with their queue.
+        persistence_queue_size: int
+            Max number of trials waiting to be persisted. If the queue is full, evaluations wait for the
+            background thread, so that fitted models do not pile up in memory.
+        pooled_db: bool
+            Share one long-lived database object between the experiments, tasks, hdls and trials tables
+            of a process, instead of opening a new one whenever a table is initialized.
+
+            ``sqlite`` databases are in WAL journal mode and wait for locks (``db_params["timeout"]``, default 60s),
+            ``postgresql`` and ``mysql`` connections are pooled (``db_params["max_connections"]``, default 8).
+            Tables are created once per process, or once before the tuner workers are forked.
+        lean_trials: bool
+            Keep only scalar columns (loss, cost_time, estimator, ...) in trials table, and store the pickled
+            artifacts (predictions, ``models_bin``, ...) of each trial in a separate ``trialblobs`` table,
+            so that ranking and deleting trials do not read them. Artifacts of a record are loaded when they are
+            accessed. This option should not change for a store.
+        oof_store: bool
+            Write the out-of-fold predictions of each complete trial once, in row order, in a memory-mapped
+            ``.npy`` store of the task (see :class:`autoflow.manager.oof_store.OOFStore`), instead of pickling
+            them per fold in trials table. Ensembles read them as views of the store, without unpickling
+            and reassembling the folds. Slots of deleted trials are reused. Only for the ``local`` file system.
+            This option should not change for a store.
+        load_threads: int
+            Max number of threads which load (read and unpickle) the models of the trials of an ensemble.
+        lazy_models: bool
+            Models of the trials of an ensemble, or of the best trial, are loaded the first time they predict,
+            instead of when the ensemble is built (e.g. a stacking ensemble is fitted on the out-of-fold
+            predictions only).
+        model_cache_size: int
+            Number of trials whose models are kept in an in-process LRU cache (keyed by ``models_path``),
+            so that building ensembles or predicting again does not load them again. 0 disables the cache.
         '''
         # --logger-------------------
         self.logger = get_logger(self)
@@ -120,6 +182,28 @@ class ResourceManager(StrSignatureMixin):
         assert self.persistent_mode in ("fs", "db")
         # ---compress_suffix------------
         self.compress_suffix = compress_suffix
+        self.compress_suffixes = {artifact: get_suffix(name) for artifact, name in dict(compress_suffixes).items()}
+        # ---async_persistence------------
+        self.async_persistence = async_persistence
+        self.persistence_queue_size = persistence_queue_size
+        self.trials_writer = None
+        # ---pooled_db------------
+        self.pooled_db = pooled_db
+        # ---lean_trials------------
+        self.lean_trials = lean_trials
+        # ---oof_store------------
+        self.oof_store = oof_store
+        if self.oof_store and self.file_system_type != "local":
+            # slots would be on the local disk of each host, while the trials table is shared
+            self.logger.warning(f"oof_store is not supported with file_system '{self.file_system_type}', "
+                                f"out-of-fold predictions are stored in trials table.")
+            self.oof_store = False
+        self.oof_stores: Dict[str, OOFStore] = {}
+        # ---model_loading------------
+        self.load_threads = load_threads
+        self.lazy_models = lazy_models
+        self.model_cache_size = model_cache_size
+        self.model_cache = None
         # ---post_process------------
         self.store_path = store_path
         self.file_system.mkdir(self.store_path)
@@ -150,11 +234,15 @@ class ResourceManager(StrSignatureMixin):
             self.JSONField = JSONField
 
     def __reduce__(self):
+        self.close_trials_writer()
         self.close_redis()
         self.close_experiments_table()
         self.close_tasks_table()
         self.close_hdls_table()
         self.close_trials_table()
+        # memory maps are opened again by each process, and the cache of models is in-process
+        self.oof_stores = {}
+        self.model_cache = None
         return super(ResourceManager, self).__reduce__()
 
     def update_db_params(self, database):
@@ -169,6 +257,23 @@ class ResourceManager(StrSignatureMixin):
             raise NotImplementedError
         return db_params
 
+    def get_database(self, database) -> pw.Database:
+        if self.pooled_db:
+            return get_shared_database(self.db_type, self.update_db_params(database))
+        return self.Datebase(**self.update_db_params(database))
+
+    def create_tables(self, database: pw.Database, models: List[Type[pw.Model]]):
+        if self.pooled_db:
+            create_tables_once(database, models)
+        else:
+            # stores created by an older version lack the new columns
+            add_missing_columns(database, models)
+            database.create_tables(models)
+
+    def close_database(self, database: Optional[pw.Database]):
+        if self.pooled_db and database is not None:
+            release_shared_database(database)
+
     def estimate_new_id(self, Dataset, id_field):
         # fixme : 用来预测下一个自增主键的ID，但是感觉有问题
         try:
@@ -185,13 +290,16 @@ class ResourceManager(StrSignatureMixin):
             estimated_id = 1
         return estimated_id
 
+    def get_compress_suffix(self, artifact) -> str:
+        return self.compress_suffixes.get(artifact, get_suffix(self.compress_suffix))
+
     def persistent_evaluated_model(self, info: Dict, trial_id) -> Tuple[str, str]:
         self.trial_dir = self.file_system.join(self.parent_trials_dir, self.task_id, self.hdl_id)
         self.file_system.mkdir(self.trial_dir)
-        model_path = self.file_system.join(self.trial_dir, f"{trial_id}.{self.compress_suffix}")
+        model_path = self.file_system.join(self.trial_dir, f"{trial_id}.{self.get_compress_suffix('models')}")
         if info["intermediate_result"] is not None:
-            intermediate_result_path = self.file_system.join(self.trial_dir,
-                                                             f"{trial_id}_inter-res.{self.compress_suffix}")
+            intermediate_result_path = self.file_system.join(
+                self.trial_dir, f"{trial_id}_inter-res.{self.get_compress_suffix('intermediate_results')}")
         else:
             intermediate_result_path = ""
         self.file_system.dump_pickle(info["models"], model_path)
@@ -221,9 +329,14 @@ class ResourceManager(StrSignatureMixin):
     def load_best_estimator(self, ml_task: MLTask):
         # todo: 最后调用分析程序？
         self.init_trials_table()
-        record = self.TrialsModel.select().group_by(self.TrialsModel.loss, self.TrialsModel.cost_time).limit(1)[0]
+        self.flush_trials()
+        fields = [self.TrialsModel.trial_id, self.TrialsModel.models_path]
+        if self.persistent_mode == "db" and not self.lean_trials:
+            fields.append(self.TrialsModel.models_bin)
+        record = self.TrialsModel.select(*fields).where(self.get_complete_trials_condition()). \
+            order_by(self.TrialsModel.loss, self.TrialsModel.cost_time).limit(1)[0]
         if self.persistent_mode == "fs":
-            models = self.file_system.load_pickle(record.models_path)
+            models = self.get_models(record.models_path)
         else:
             models = record.models_bin
         if ml_task.mainTask == "classification":
@@ -240,34 +353,145 @@ class ResourceManager(StrSignatureMixin):
     def get_best_k_trials(self, k):
         self.init_trials_table()
         trial_ids = []
-        records = self.TrialsModel.select().order_by(self.TrialsModel.loss, self.TrialsModel.cost_time).limit(k)
+        records = self.TrialsModel.select(self.TrialsModel.trial_id).where(self.get_complete_trials_condition()). \
+            order_by(self.TrialsModel.loss, self.TrialsModel.cost_time).limit(k)
         for record in records:
             trial_ids.append(record.trial_id)
         return trial_ids
 
     def load_estimators_in_trials(self, trials: Union[List, Tuple]) -> Tuple[List, List, List]:
         self.init_trials_table()
-        records = self.TrialsModel.select().where(self.TrialsModel.trial_id << trials)
+        with self.trials_db.atomic():
+            records = self.prefetch_trial_blobs(self.TrialsModel.select().where(self.TrialsModel.trial_id << trials))
+        if self.persistent_mode == "fs":
+            # models of deleted trials are skipped
+            models_list = self.get_models_list([record.models_path for record in records])
+        else:
+            models_list = [record.models_bin for record in records]
         estimator_list = []
         y_true_indexes_list = []
         y_preds_list = []
-        for record in records:
-            exists = True
-            if self.persistent_mode == "fs":
-                if not self.file_system.exists(record.models_path):
-                    exists = False
+        oof_slots = []
+        for record, models in zip(records, models_list):
+            if self.persistent_mode == "db" or models is not None:
+                estimator_list.append(models)
+                if self.oof_store and record.oof_slot:
+                    # predictions are already in row order, ``None`` indexes tell the ensemble to use them as is
+                    y_true_indexes_list.append(None)
+                    y_preds_list.append(None)
+                    oof_slots.append((len(y_preds_list) - 1, record.oof_slot))
                 else:
-                    estimator_list.append(load(record.models_path))
-            else:
-                estimator_list.append(record.models_bin)
-            if exists:
-                y_true_indexes_list.append(record.y_true_indexes)
-                y_preds_list.append(record.y_preds)
+                    y_true_indexes_list.append(record.y_true_indexes)
+                    y_preds_list.append(record.y_preds)
+        if oof_slots:
+            oofs = self.get_oof_store().take([slot for _, slot in oof_slots])
+            for (i, _), oof in zip(oof_slots, oofs):
+                y_preds_list[i] = oof
         return estimator_list, y_true_indexes_list, y_preds_list
 
+    def load_models(self, path: str) -> List:
+        if self.model_cache is None:
+            self.model_cache = ModelCache(self.model_cache_size)
+        models = self.model_cache.get(path)
+        if models is None:
+            models = self.file_system.load_pickle(path)
+            self.model_cache.put(path, models)
+        return models
+
+    def get_models(self, path: str) -> Sequence:
+        if self.lazy_models:
+            return LazyModels(path, self.load_models)
+        return self.load_models(path)
+
+    def get_models_list(self, paths: List[str]) -> List[Optional[Sequence]]:
+        # one listing per directory instead of one ``exists`` per trial, None for the paths which do not exist
+        existing = set()
+        for parent in {os.path.dirname(path) for path in paths}:
+            try:
+                existing.update(self.file_system.join(parent, name) for name in self.file_system.listdir(parent))
+            except Exception:
+                self.logger.warning(f"Can not list '{parent}', check its trials one by one.")
+                existing.update(path for path in paths
+                                if os.path.dirname(path) == parent and self.file_system.exists(path))
+        paths = [path if path in existing else None for path in paths]
+        to_load = [path for path in paths if path is not None]
+        if self.lazy_models or len(to_load) <= 1 or self.load_threads <= 1:
+            loaded = [self.get_models(path) for path in to_load]
+        else:
+            # reading files and decompressing release the GIL
+            with ThreadPoolExecutor(min(self.load_threads, len(to_load))) as executor:
+                loaded = list(executor.map(self.get_models, to_load))
+        path2models = dict(zip(to_load, loaded))
+        return [None if path is None else path2models[path] for path in paths]
+
+    def get_complete_trials_condition(self):
+        # trials which evaluate all folds on all training rows
+        return (self.TrialsModel.fold_index < 0) & (self.TrialsModel.budget >= 1)
+
+    def get_fold_trials(self, config_id) -> Dict[int, Any]:
+        # fold_index -> record, of the trials which evaluate one fold of the config
+        self.init_trials_table()
+        with self.trials_db.atomic():
+            records = self.prefetch_trial_blobs(self.TrialsModel.select().where(
+                (self.TrialsModel.config_id == config_id) & (self.TrialsModel.fold_index >= 0)).
+                                                order_by(self.TrialsModel.trial_id))
+        return {record.fold_index: record for record in records}
+
+    def prefetch_trial_blobs(self, records) -> List:
+        # artifacts of lean trials are loaded in one query, instead of one query per record
+        records = list(records)
+        if self.lean_trials and records:
+            blobs = {blob.trial_id: blob for blob in self.TrialBlobsModel.select().where(
+                self.TrialBlobsModel.trial_id << [record.trial_id for record in records])}
+            for record in records:
+                record.__dict__["_blobs"] = blobs.get(record.trial_id)
+        return records
+
+    def exists_complete_trial(self, config_id) -> bool:
+        self.init_trials_table()
+        return self.TrialsModel.select().where(
+            (self.TrialsModel.config_id == config_id) & (self.TrialsModel.fold_index < 0)).exists()
+
+    def claim_complete_trial(self, config_id) -> bool:
+        # only one worker inserts the complete trial of a config, the claim is a row with a unique key
+        self.init_trials_table()
+        try:
+            self.CompleteTrialClaimsModel.create(config_id=config_id)
+        except pw.IntegrityError:
+            return False
+        return True
+
+    def release_complete_trial(self, config_id):
+        self.init_trials_table()
+        self.CompleteTrialClaimsModel.delete().where(
+            self.CompleteTrialClaimsModel.config_id == config_id).execute()
+
+    def load_models_of_trial(self, record) -> Optional[List]:
+        if self.persistent_mode == "fs":
+            if not record.models_path or not self.file_system.exists(record.models_path):
+                return None
+            return self.load_models(record.models_path)
+        else:
+            return record.models_bin
+
+    def get_oof_store(self) -> OOFStore:
+        if self.task_id not in self.oof_stores:
+            self.oof_stores[self.task_id] = OOFStore(os.path.join(self.store_path, "oofs", self.task_id))
+        return self.oof_stores[self.task_id]
+
     def set_is_master(self, is_master):
         self.is_master = is_master
 
+    def get_local_cache_dir(self, name) -> str:
+        # caches are always on the local disk, even if the file_system is remote
+        if self.file_system_type == "local":
+            parent_dir = self.store_path
+        else:
+            parent_dir = os.path.join(tempfile.gettempdir(), "autoflow")
+        cache_dir = os.path.join(parent_dir, "caches", name)
+        os.makedirs(cache_dir, exist_ok=True)
+        return cache_dir
+
     # ----------runhistory------------------------------------------------------------------
     @property
     def runhistory_db_params(self):
@@ -364,7 +588,7 @@ class ResourceManager(StrSignatureMixin):
             class Meta:
                 database = self.experiments_db
 
-        self.experiments_db.create_tables([Experiments])
+        self.create_tables(self.experiments_db, [Experiments])
         return Experiments
 
     def get_experiment_id_by_task_id(self, task_id):
@@ -419,7 +643,8 @@ class ResourceManager(StrSignatureMixin):
             self.experiment_dir = self.file_system.join(self.parent_experiments_dir, str(experiment_id))
             self.file_system.mkdir(self.experiment_dir)
             data_manager_bin = 0
-            data_manager_path = self.file_system.join(self.experiment_dir, f"data_manager.{self.compress_suffix}")
+            data_manager_path = self.file_system.join(
+                self.experiment_dir, f"data_manager.{self.get_compress_suffix('datasets')}")
             self.file_system.dump_pickle(data_manager, data_manager_path)
         else:
             data_manager_path = ""
@@ -457,10 +682,11 @@ class ResourceManager(StrSignatureMixin):
         if self.is_init_experiments_db:
             return
         self.is_init_experiments_db = True
-        self.experiments_db: pw.Database = self.Datebase(**self.update_db_params(self.meta_records_db_name))
+        self.experiments_db: pw.Database = self.get_database(self.meta_records_db_name)
         self.ExperimentsModel = self.get_experiments_model()
 
     def close_experiments_table(self):
+        self.close_database(getattr(self, "experiments_db", None))
         self.is_init_experiments_db = False
         self.experiments_db = None
         self.ExperimentsModel = None
@@ -486,7 +712,7 @@ class ResourceManager(StrSignatureMixin):
             class Meta:
                 database = self.tasks_db
 
-        self.tasks_db.create_tables([Tasks])
+        self.create_tables(self.tasks_db, [Tasks])
         return Tasks
 
     def insert_to_tasks_table(self, data_manager: DataManager, metric: Scorer, splitter, specific_task_token):
@@ -514,7 +740,7 @@ class ResourceManager(StrSignatureMixin):
             Xy_test = [data_manager.X_test, data_manager.y_test]
             if self.persistent_mode == "fs":
                 Xy_train_path = self.file_system.join(self.datasets_dir,
-                                                      f"{Xy_train_hash}.{self.compress_suffix}")
+                                                      f"{Xy_train_hash}.{self.get_compress_suffix('datasets')}")
                 self.file_system.dump_pickle(Xy_train, Xy_train_path)
                 Xy_train_bin = 0
             else:
@@ -523,7 +749,7 @@ class ResourceManager(StrSignatureMixin):
             if Xy_test_hash:
                 if self.persistent_mode == "fs":
                     Xy_test_path = self.file_system.join(self.datasets_dir,
-                                                         f"{Xy_test_hash}.{self.compress_suffix}")
+                                                         f"{Xy_test_hash}.{self.get_compress_suffix('datasets')}")
                     self.file_system.dump_pickle(Xy_test, Xy_test_path)
                     Xy_test_bin = 0
                 else:
@@ -556,10 +782,11 @@ class ResourceManager(StrSignatureMixin):
         if self.is_init_tasks_db:
             return
         self.is_init_tasks_db = True
-        self.tasks_db: pw.Database = self.Datebase(**self.update_db_params(self.meta_records_db_name))
+        self.tasks_db: pw.Database = self.get_database(self.meta_records_db_name)
         self.TasksModel = self.get_tasks_model()
 
     def close_tasks_table(self):
+        self.close_database(getattr(self, "tasks_db", None))
         self.is_init_tasks_db = False
         self.tasks_db = None
         self.TasksModel = None
@@ -573,7 +800,7 @@ class ResourceManager(StrSignatureMixin):
             class Meta:
                 database = self.hdls_db
 
-        self.hdls_db.create_tables([HDLs])
+        self.create_tables(self.hdls_db, [HDLs])
         return HDLs
 
     def insert_to_hdls_table(self, hdl):
@@ -592,20 +819,51 @@ class ResourceManager(StrSignatureMixin):
         if self.is_init_hdls_db:
             return
         self.is_init_hdls_db = True
-        self.hdls_db: pw.Database = self.Datebase(**self.update_db_params(self.current_tasks_db_name))
+        self.hdls_db: pw.Database = self.get_database(self.current_tasks_db_name)
         self.HDLsModel = self.get_hdls_model()
 
     def close_hdls_table(self):
+        self.close_database(getattr(self, "hdls_db", None))
         self.is_init_hdls_db = False
         self.hdls_db = None
         self.HDLsModel = None
 
     # ----------trials_model------------------------------------------------------------------
 
+    def get_trial_blob_fields(self) -> Dict[str, pw.Field]:
+        # pickled artifacts of a trial, they are in trialblobs table if ``lean_trials``
+        return dict(
+            models_bin=PickleFiled(default=0),
+            y_true_indexes=PickleFiled(default=0),
+            y_preds=PickleFiled(default=0),
+            y_test_true=PickleFiled(default=0),
+            y_test_pred=PickleFiled(default=0),
+            smac_hyper_param=PickleFiled(default=0),
+            intermediate_result_bin=PickleFiled(default=b''),
+        )
+
+    def get_trial_blobs_model(self) -> pw.Model:
+        class TrialBlobs(pw.Model):
+            trial_id = pw.IntegerField(primary_key=True)
+
+            class Meta:
+                database = self.trials_db
+
+        for name, field in self.get_trial_blob_fields().items():
+            TrialBlobs._meta.add_field(name, field)
+        self.create_tables(self.trials_db, [TrialBlobs])
+        return TrialBlobs
+
     def get_trials_model(self) -> pw.Model:
+        TrialBlobs = self.TrialBlobsModel
+
         class Trials(pw.Model):
             trial_id = pw.IntegerField(primary_key=True)
             config_id = pw.CharField(default="")
+            # -1 means all cross-validation folds are evaluated in this trial
+            fold_index = pw.IntegerField(default=-1)
+            # fraction of training rows used in this trial
+            budget = pw.FloatField(default=1)
             task_id = pw.CharField(default="")
             hdl_id = pw.CharField(default="")
             experiment_id = pw.IntegerField(default=0)
@@ -616,49 +874,194 @@ class ResourceManager(StrSignatureMixin):
             all_score = self.JSONField(default={})
             all_scores = self.JSONField(default=[])
             test_all_score = self.JSONField(default={})
-            models_bin = PickleFiled(default=0)
             models_path = pw.TextField(default="")
-            y_true_indexes = PickleFiled(default=0)
-            y_preds = PickleFiled(default=0)
-            y_test_true = PickleFiled(default=0)
-            y_test_pred = PickleFiled(default=0)
-            smac_hyper_param = PickleFiled(default=0)
             dict_hyper_param = self.JSONField(default={})  # todo: json field
             cost_time = pw.FloatField(default=65535)
             status = pw.CharField(default="SUCCESS")
             failed_info = pw.TextField(default="")
             warning_info = pw.TextField(default="")
-            intermediate_result_path = pw.TextField(default=""),
-            intermediate_result_bin = PickleFiled(default=b''),
+            intermediate_result_path = pw.TextField(default="")
+            preprocessing_cache_stats = self.JSONField(default={})
+            allocation_stats = self.JSONField(default={})
+            # wall time, CPU time, peak RSS delta and shapes of each step of the pipeline, for each fold
+            step_stats = self.JSONField(default=[])
             timestamp = pw.DateTimeField(default=datetime.datetime.now)
             user = pw.CharField(default=getuser)
             pid = pw.IntegerField(default=os.getpid)
 
             class Meta:
                 database = self.trials_db
-
-        self.trials_db.create_tables([Trials])
+                indexes = (
+                    (("loss", "cost_time"), False),
+                    (("estimator",), False),
+                )
+
+            def __getattr__(self, name):
+                # artifacts of lean trials are loaded when they are accessed
+                if TrialBlobs is None or name not in TrialBlobs._meta.fields or name == "trial_id":
+                    raise AttributeError(name)
+                if "_blobs" not in self.__dict__:
+                    self.__dict__["_blobs"] = TrialBlobs.get_or_none(TrialBlobs.trial_id == self.trial_id)
+                blobs = self.__dict__["_blobs"]
+                return None if blobs is None else getattr(blobs, name)
+
+        if TrialBlobs is None:
+            for name, field in self.get_trial_blob_fields().items():
+                Trials._meta.add_field(name, field)
+        if self.oof_store:
+            # "{key}/{index}" of the predictions in the oof store, empty if they are in ``y_preds``
+            Trials._meta.add_field("oof_slot", pw.CharField(default=""))
+        self.create_tables(self.trials_db, [Trials])
+        self.migrate_trial_blobs(Trials)
         return Trials
 
+    def migrate_trial_blobs(self, Trials: pw.Model):
+        '''
+        Move the artifacts of the trials of a store created with the other ``lean_trials`` setting:
+        from the trials table to the trialblobs table if ``lean_trials``, back to the trials table otherwise.
+        '''
+        names = list(self.get_trial_blob_fields())
+        table_name = Trials._meta.table_name
+        if self.lean_trials:
+            TrialBlobs = self.TrialBlobsModel
+            columns = {column.name for column in self.trials_db.get_columns(table_name)}
+            names = [name for name in names if name in columns]
+            if not names:
+                return
+            self.logger.info(f"Move artifacts of trials from table '{table_name}' to table "
+                             f"'{TrialBlobs._meta.table_name}'.")
+            trials = pw.Table(table_name, ["trial_id"] + names).bind(self.trials_db)
+            with self.trials_db.atomic():
+                TrialBlobs.insert_from(
+                    trials.select(trials.trial_id, *[getattr(trials, name) for name in names]).
+                        where(trials.trial_id.not_in(TrialBlobs.select(TrialBlobs.trial_id))),
+                    [TrialBlobs.trial_id] + [getattr(TrialBlobs, name) for name in names]).execute()
+            # columns of the artifacts have no default value, inserts of lean trials would fail
+            drop_columns(self.trials_db, table_name, names)
+        elif self.trials_db.table_exists("trialblobs"):
+            blobs = pw.Table("trialblobs", ["trial_id"] + names).bind(self.trials_db)
+            if not blobs.select().exists():
+                return
+            self.logger.info(f"Move artifacts of trials from table 'trialblobs' to table '{table_name}'.")
+            with self.trials_db.atomic():
+                Trials.update({
+                    getattr(Trials, name): blobs.select(getattr(blobs, name)).where(blobs.trial_id == Trials.trial_id)
+                    for name in names
+                }).where(Trials.trial_id.in_(blobs.select(blobs.trial_id))).execute()
+                blobs.delete().execute()
+
+    def get_complete_trial_claims_model(self) -> pw.Model:
+        class CompleteTrialClaims(pw.Model):
+            config_id = pw.CharField(primary_key=True)
+            pid = pw.IntegerField(default=os.getpid)
+            timestamp = pw.DateTimeField(default=datetime.datetime.now)
+
+            class Meta:
+                database = self.trials_db
+
+        self.create_tables(self.trials_db, [CompleteTrialClaims])
+        return CompleteTrialClaims
+
     def init_trials_table(self):
         if self.is_init_trials_db:
             return
         self.is_init_trials_db = True
-        self.trials_db: pw.Database = self.Datebase(**self.update_db_params(self.current_tasks_db_name))
+        self.trials_db: pw.Database = self.get_database(self.current_tasks_db_name)
+        self.TrialBlobsModel = self.get_trial_blobs_model() if self.lean_trials else None
         self.TrialsModel = self.get_trials_model()
+        self.CompleteTrialClaimsModel = self.get_complete_trial_claims_model()
 
     def close_trials_table(self):
+        self.close_trials_writer()
+        self.close_database(getattr(self, "trials_db", None))
         self.is_init_trials_db = False
         self.trials_db = None
         self.TrialsModel = None
+        self.TrialBlobsModel = None
+        self.CompleteTrialClaimsModel = None
+
+    def get_trials_writer(self) -> TrialsWriter:
+        if self.trials_writer is None:
+            self.trials_writer = TrialsWriter(self, self.persistence_queue_size)
+        return self.trials_writer
+
+    def flush_trials(self) -> List[Dict]:
+        # make sure all queued trials are in trials table, return (and log) the trials which could not be persisted
+        if self.trials_writer is not None:
+            return self.trials_writer.flush()
+        return []
+
+    def close_trials_writer(self) -> List[Dict]:
+        failed = []
+        if self.trials_writer is not None:
+            failed = self.trials_writer.close()
+            self.trials_writer = None
+        return failed
 
     def insert_to_trials_table(self, info: Dict):
         self.init_trials_table()
+        if self.async_persistence:
+            # time of evaluation, not time of writing
+            info.setdefault("timestamp", datetime.datetime.now())
+            self.get_trials_writer().put(info)
+        else:
+            self.create_trial(self.get_trial_record(info))
+
+    def insert_many_to_trials_table(self, infos: List[Dict]):
+        self.init_trials_table()
+        records = [self.get_trial_record(info) for info in infos]
+        with self.write_oof_slots(records) as records, self.trials_db.atomic():
+            if self.lean_trials:
+                for record in records:
+                    self.create_trial(record)
+            else:
+                self.TrialsModel.insert_many(records).execute()
+
+    def create_trial(self, record: Dict):
+        with self.write_oof_slots([record]) as (record,):
+            if not self.lean_trials:
+                self.TrialsModel.create(**record)
+                return
+            blobs = {name: record.pop(name) for name in self.get_trial_blob_fields()}
+            with self.trials_db.atomic():
+                trial = self.TrialsModel.create(**record)
+                self.TrialBlobsModel.create(trial_id=trial.trial_id, **blobs)
+
+    @contextmanager
+    def write_oof_slots(self, records: List[Dict]):
+        '''
+        Write the predictions of the complete trials of ``records`` to the oof store, and yield the records
+        which reference their slots. The slots are freed if the records are not inserted.
+        '''
+        slots = []
+        try:
+            if self.oof_store:
+                records = list(records)
+                for i, record in enumerate(records):
+                    # predictions of fold trials are assembled by the complete trial, they stay pickled
+                    if record["fold_index"] < 0 and record["budget"] >= 1 and record["y_preds"] \
+                            and not record["oof_slot"]:
+                        slot = self.get_oof_store().write(record["y_true_indexes"], record["y_preds"])
+                        slots.append(slot)
+                        records[i] = dict(record, oof_slot=slot, y_true_indexes=None, y_preds=None)
+            yield records
+        except BaseException:
+            if slots:
+                self.get_oof_store().free(slots)
+            raise
+
+    def get_trial_record(self, info: Dict) -> Dict:
+        # persist artifacts of the trial, and return the fields of its record
         config_id = info.get("config_id")
+        fold_index = info.get("fold_index", -1)
         if self.persistent_mode == "fs":
             # todo: 考虑更特殊的情况，不同的任务下，相同的配置
+            budget = info.get("budget", 1)
+            trial_name = config_id if fold_index < 0 else f"{config_id}_fold{fold_index}"
+            if budget < 1:
+                trial_name += f"_budget{budget:.6g}"
             models_path, intermediate_result_path = \
-                self.persistent_evaluated_model(info, config_id)
+                self.persistent_evaluated_model(info, trial_name)
             models_bin = None
             intermediate_result_bin = None
         else:
@@ -666,8 +1069,12 @@ class ResourceManager(StrSignatureMixin):
             intermediate_result_path = ""
             models_bin = info["models"]
             intermediate_result_bin = info["intermediate_result"]
-        self.TrialsModel.create(
+        # predictions are written to the oof store when the record is inserted, see ``write_oof_slots``
+        oof_slot = {"oof_slot": ""} if self.oof_store else {}
+        return dict(
             config_id=config_id,
+            fold_index=info.get("fold_index", -1),
+            budget=info.get("budget", 1),
             task_id=self.task_id,
             hdl_id=self.hdl_id,
             experiment_id=self.experiment_id,
@@ -692,6 +1099,11 @@ class ResourceManager(StrSignatureMixin):
             warning_info=info.get("warning_info", ""),
             intermediate_result_path=intermediate_result_path,
             intermediate_result_bin=intermediate_result_bin,
+            preprocessing_cache_stats=info.get("preprocessing_cache_stats", {}),
+            allocation_stats=info.get("allocation_stats", {}),
+            step_stats=info.get("step_stats", []),
+            timestamp=info.get("timestamp", datetime.datetime.now()),
+            **oof_slot
         )
 
     def delete_models(self):
@@ -708,19 +1120,30 @@ class ResourceManager(StrSignatureMixin):
             return True
         self.init_trials_table()
         estimators = []
-        for record in self.TrialsModel.select().group_by(self.TrialsModel.estimator):
+        for record in self.TrialsModel.select(self.TrialsModel.estimator).group_by(self.TrialsModel.estimator):
             estimators.append(record.estimator)
         for estimator in estimators:
-            should_delete = self.TrialsModel.select().where(self.TrialsModel.estimator == estimator).order_by(
-                self.TrialsModel.loss, self.TrialsModel.cost_time).offset(self.max_persistent_estimators)
-            if len(should_delete):
-                if self.persistent_mode == "fs":
-                    for record in should_delete:
-                        models_path = record.models_path
-                        self.logger.info(f"Delete expire Model in path : {models_path}")
-                        self.file_system.delete(models_path)
-                self.TrialsModel.delete().where(
-                    self.TrialsModel.trial_id.in_(should_delete.select(self.TrialsModel.trial_id))).execute()
+            # complete trials, single fold trials and subsample trials are ranked separately
+            for condition in (self.get_complete_trials_condition(), self.TrialsModel.fold_index >= 0,
+                              self.TrialsModel.budget < 1):
+                fields = [self.TrialsModel.trial_id, self.TrialsModel.models_path]
+                if self.oof_store:
+                    fields.append(self.TrialsModel.oof_slot)
+                should_delete = self.TrialsModel.select(*fields). \
+                    where((self.TrialsModel.estimator == estimator) & condition).order_by(
+                    self.TrialsModel.loss, self.TrialsModel.cost_time).offset(self.max_persistent_estimators)
+                if len(should_delete):
+                    if self.persistent_mode == "fs":
+                        for record in should_delete:
+                            models_path = record.models_path
+                            self.logger.info(f"Delete expire Model in path : {models_path}")
+                            self.file_system.delete(models_path)
+                    trial_ids = [record.trial_id for record in should_delete]
+                    if self.lean_trials:
+                        self.TrialBlobsModel.delete().where(self.TrialBlobsModel.trial_id.in_(trial_ids)).execute()
+                    self.TrialsModel.delete().where(self.TrialsModel.trial_id.in_(trial_ids)).execute()
+                    if self.oof_store:
+                        self.get_oof_store().free([record.oof_slot for record in should_delete if record.oof_slot])
         return True
 
 
@@ -0,0 +1,105 @@
+import os
+from typing import Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from autoflow.pipeline.dataframe import GenericDataFrame
+from autoflow.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def _save_array(path: str, array: np.ndarray):
+    # a reader never sees a partial file, and processes which still map an old file keep its content
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _make_dataframe(blocks, columns: pd.Index, index: pd.Index) -> pd.DataFrame:
+    # pandas has no public constructor which takes 2-D blocks without consolidating (copying) them,
+    # so the block manager is built directly, as pyarrow does in ``to_pandas``.
+    try:
+        from pandas.core.internals.api import make_block  # pandas >= 1.3
+    except ImportError:
+        from pandas.core.internals import make_block
+    from pandas.core.internals import BlockManager
+    manager = BlockManager([make_block(values, placement=placement) for values, placement in blocks],
+                           [columns, index])
+    if hasattr(pd.DataFrame, "_from_mgr"):  # pandas >= 2.1
+        return pd.DataFrame._from_mgr(manager, axes=manager.axes)
+    return pd.DataFrame(manager)
+
+
+def dump_shared_dataframe(df: GenericDataFrame, directory: str, name: str) -> Optional[Dict[str, Any]]:
+    '''
+    Dump the columns of ``df`` to ``.npy`` files in ``directory``, one file per dtype.
+
+    Numerical columns are stored as they are, object columns are stored as the codes of categoricals
+    (in the integer dtype pandas uses for their number of categories, so that codes are not cast when attached).
+    Files are laid out as pandas blocks, i.e. ``(n_columns, n_rows)``, so that they can be memory-mapped
+    as the blocks of a frame without any copy.
+
+    Returns
+    -------
+    descriptor: dict or None
+        light-weight description of the frame, which is passed to :func:`load_shared_dataframe`.
+        ``None`` if some columns have a dtype which can not be shared (e.g. pandas extension dtypes).
+    '''
+    os.makedirs(directory, exist_ok=True)
+    dtypes = df.dtypes.tolist()
+    unsupported = [column for column, dtype in zip(df.columns, dtypes)
+                   if not isinstance(dtype, np.dtype) or dtype.kind not in "biufO"]
+    if unsupported:
+        logger.warning(f"Columns {unsupported} of '{name}' have dtypes which can not be shared, "
+                       f"'{name}' will be copied to every worker.")
+        return None
+    blocks = []
+    categoricals = []
+    for dtype in pd.unique(np.array(dtypes, dtype=object)):
+        placement = [i for i, x in enumerate(dtypes) if x == dtype]
+        if dtype.kind == "O":
+            for ix in placement:
+                # missing values are coded -1
+                codes, categories = pd.factorize(df.iloc[:, ix].values)
+                categoricals.append((ix, pd.Categorical.from_codes(codes, categories=categories)))
+            continue
+        path = os.path.join(directory, f"{name}-{dtype.name}.npy")
+        _save_array(path, np.ascontiguousarray(df.iloc[:, placement].values.T))
+        blocks.append({"path": path, "placement": placement})
+    codes_dtypes = [categorical.codes.dtype for _, categorical in categoricals]
+    for codes_dtype in pd.unique(np.array(codes_dtypes, dtype=object)):
+        columns = [(ix, categorical) for ix, categorical in categoricals if categorical.codes.dtype == codes_dtype]
+        path = os.path.join(directory, f"{name}-codes-{codes_dtype.name}.npy")
+        _save_array(path, np.vstack([categorical.codes for _, categorical in columns]))
+        blocks.append({"path": path, "placement": [ix for ix, _ in columns],
+                       "categories": [categorical.categories for _, categorical in columns]})
+    return {
+        "blocks": blocks,
+        "columns": df.columns,
+        "index": df.index,
+        "feature_groups": df.feature_groups,
+        "columns_metadata": df.columns_metadata,
+    }
+
+
+def load_shared_dataframe(descriptor: Dict[str, Any]) -> GenericDataFrame:
+    '''
+    Attach the files of :func:`dump_shared_dataframe` as read-only memory maps.
+
+    Numerical blocks and the codes of object columns are shared by all processes through the page cache,
+    object columns are attached as categoricals, only their categories are held by current process.
+    '''
+    blocks = []
+    for block in descriptor["blocks"]:
+        values = np.load(block["path"], mmap_mode="r")
+        if "categories" in block:
+            for ix, categories, codes in zip(block["placement"], block["categories"], values):
+                blocks.append((pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories)), [ix]))
+        else:
+            blocks.append((values, block["placement"]))
+    df = _make_dataframe(blocks, descriptor["columns"], descriptor["index"])
+    return GenericDataFrame(df, feature_groups=descriptor["feature_groups"],
+                            columns_metadata=descriptor["columns_metadata"])
@@ -0,0 +1,83 @@
+import threading
+from queue import Queue, Empty
+from typing import Dict, List
+
+from autoflow.utils.logging import get_logger
+from autoflow.utils.sys import get_trance_back_msg
+
+
+class TrialsWriter():
+    '''
+    Background thread which persists the trials of a ``ResourceManager``, off the hot path of evaluations.
+
+    Artifacts (models, intermediate results) of a trial are dumped and compressed in the thread,
+    and all the trials waiting in the queue are inserted into the trials table in one transaction.
+
+    The queue is bounded: when it is full, ``put`` blocks until the thread catches up,
+    so a slow storage throttles the evaluations instead of piling up fitted models in memory.
+
+    If the insertion of a batch fails, its trials are inserted again one by one. Trials which still fail
+    are kept in ``failed`` and returned (and logged) by the next :meth:`flush` or :meth:`close`.
+    '''
+
+    def __init__(self, resource_manager, queue_size: int = 16):
+        self.resource_manager = resource_manager
+        self.queue = Queue(maxsize=queue_size)
+        self.logger = get_logger(self)
+        self.failed: List[Dict] = []
+        self.thread = threading.Thread(target=self.run, name="TrialsWriter", daemon=True)
+        self.thread.start()
+
+    def put(self, info: Dict):
+        self.queue.put(info)
+
+    def run(self):
+        is_closed = False
+        while not is_closed:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+            if batch[-1] is None:
+                is_closed = True
+            infos = [info for info in batch if info is not None]
+            try:
+                if infos:
+                    self.insert(infos)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def insert(self, infos: List[Dict]):
+        try:
+            self.resource_manager.insert_many_to_trials_table(infos)
+            return
+        except Exception:
+            self.logger.warning(f"Failed to persist a batch of {len(infos)} trials, persist them one by one:\n"
+                                f"{get_trance_back_msg()}")
+        for info in infos:
+            try:
+                self.resource_manager.insert_many_to_trials_table([info])
+            except Exception:
+                self.logger.error(f"Failed to persist trial of config {info.get('config_id')} "
+                                  f"(fold_index = {info.get('fold_index', -1)}):\n{get_trance_back_msg()}")
+                self.failed.append(info)
+
+    def pop_failed(self) -> List[Dict]:
+        failed, self.failed = self.failed, []
+        if failed:
+            self.logger.error(f"{len(failed)} trials could not be persisted: " + ", ".join(
+                f"{info.get('config_id')} (fold_index = {info.get('fold_index', -1)})" for info in failed))
+        return failed
+
+    def flush(self) -> List[Dict]:
+        # wait until all the queued trials are persisted, and return the trials which failed
+        self.queue.join()
+        return self.pop_failed()
+
+    def close(self) -> List[Dict]:
+        self.queue.put(None)
+        self.thread.join()
+        return self.pop_failed()
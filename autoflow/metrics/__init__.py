@@ -1,4 +1,3 @@
-import copy
 from abc import ABCMeta, abstractmethod
 from functools import partial
 
@@ -9,6 +8,7 @@ from sklearn.utils.multiclass import type_of_target
 
 from autoflow.utils.ml_task import MLTask
 from autoflow.metrics import classification_metrics
+from autoflow.metrics.engine import calculate_all_classification_scores, calculate_all_regression_scores
 from autoflow.utils.array import sanitize_array
 
 
@@ -274,51 +274,55 @@ for name, metric in [
         CLASSIFICATION_METRICS[qualified_name] = globals()[qualified_name]
 
 
+def _calculate_all_scores_by_scorers(solution, prediction, ml_task: MLTask):
+    score = dict()
+    if ml_task.mainTask == "regression":
+        for metric_ in REGRESSION_METRICS:
+            func = REGRESSION_METRICS[metric_]
+            score[func.name] = func(solution, prediction)
+    else:
+        for metric_ in CLASSIFICATION_METRICS:
+            func = CLASSIFICATION_METRICS[metric_]
+
+            # TODO maybe annotate metrics to define which cases they can
+            # handle?
+
+            try:
+                score[func.name] = float(func(solution, prediction))
+            except ValueError as e:
+                if e.args[0] == 'multiclass format is not supported':
+                    continue
+                elif e.args[0] == "Samplewise metrics are not available " \
+                                  "outside of multilabel classification.":
+                    continue
+                elif e.args[0] == "Target is multiclass but " \
+                                  "average='binary'. Please choose another average " \
+                                  "setting, one of [None, 'micro', 'macro', 'weighted'].":
+                    continue
+                # else:
+                #     raise e
+    return score
+
+
 def calculate_score(solution, prediction, ml_task: MLTask, metric,
                     should_calc_all_metric=False):
     if isinstance(solution, (pd.Series, pd.DataFrame)):
         solution = solution.values
+    if ml_task.mainTask == "regression":
+        # TODO put this into the regression metric itself
+        prediction = sanitize_array(prediction)
     if should_calc_all_metric:
-        score = dict()
+        # metrics are derived from statistics shared by all of them,
+        # scorers are called one by one only for corner cases
         if ml_task.mainTask == "regression":
-            # TODO put this into the regression metric itself
-            cprediction = sanitize_array(prediction)
-            metric_dict = copy.copy(REGRESSION_METRICS)
-            metric_dict[metric.name] = metric
-            for metric_ in REGRESSION_METRICS:
-                func = REGRESSION_METRICS[metric_]
-                score[func.name] = func(solution, cprediction)
-
+            score = calculate_all_regression_scores(solution, prediction)
         else:
-            metric_dict = copy.copy(CLASSIFICATION_METRICS)
-            metric_dict[metric.name] = metric
-            for metric_ in metric_dict:
-                func = CLASSIFICATION_METRICS[metric_]
-
-                # TODO maybe annotate metrics to define which cases they can
-                # handle?
-
-                try:
-                    score[func.name] = float(func(solution, prediction))
-                except ValueError as e:
-                    if e.args[0] == 'multiclass format is not supported':
-                        continue
-                    elif e.args[0] == "Samplewise metrics are not available " \
-                                      "outside of multilabel classification.":
-                        continue
-                    elif e.args[0] == "Target is multiclass but " \
-                                      "average='binary'. Please choose another average " \
-                                      "setting, one of [None, 'micro', 'macro', 'weighted'].":
-                        continue
-                    # else:
-                    #     raise e
-
+            score = calculate_all_classification_scores(solution, prediction)
+        if score is None:
+            score = _calculate_all_scores_by_scorers(solution, prediction, ml_task)
+        if metric.name not in score:
+            score[metric.name] = float(metric(solution, prediction))
     else:
-        if ml_task.mainTask == "regression":
-            # TODO put this into the regression metric itself
-            cprediction = sanitize_array(prediction)
-            score = metric(solution, cprediction)
-        else:
-            score = metric(solution, prediction)
+        score = metric(solution, prediction)
 
     return score
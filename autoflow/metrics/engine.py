@@ -0,0 +1,255 @@
+from inspect import signature
+from itertools import combinations
+from typing import Dict, Optional
+
+import numpy as np
+import sklearn.metrics
+
+# ``log_loss`` clips probabilities by ``eps``, whose default changed between scikit-learn versions
+_log_loss_eps = signature(sklearn.metrics.log_loss).parameters["eps"].default
+_averages = ('macro', 'micro', 'weighted')
+
+
+def _supports_ovr_micro_roc_auc():
+    try:
+        sklearn.metrics.roc_auc_score([0, 1, 2], np.eye(3), multi_class="ovr", average="micro")
+    except ValueError:
+        return False
+    return True
+
+
+_ovr_micro_roc_auc = _supports_ovr_micro_roc_auc()
+
+
+def _divide(numerator, denominator):
+    # zero division is 0, as ``zero_division="warn"`` in scikit-learn
+    denominator = np.asarray(denominator, dtype="float64")
+    result = np.zeros(np.broadcast(numerator, denominator).shape)
+    np.divide(numerator, denominator, out=result, where=denominator != 0)
+    return result
+
+
+def _binary_curve(sorted_score, sorted_true):
+    '''
+    Cumulative false and true positives at each distinct threshold,
+    ``sorted_score`` is sorted in descending order, as ``_binary_clf_curve`` in scikit-learn.
+    '''
+    threshold_idxs = np.r_[np.flatnonzero(np.diff(sorted_score)), sorted_score.size - 1]
+    tps = np.cumsum(sorted_true, dtype="float64")[threshold_idxs]
+    fps = 1 + threshold_idxs - tps
+    return fps, tps
+
+
+def _roc_auc(fps, tps):
+    fpr = np.r_[0, fps] / fps[-1]
+    tpr = np.r_[0, tps] / tps[-1]
+    return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1])) / 2)
+
+
+def _average_precision(fps, tps):
+    precision = tps / (tps + fps)
+    recall = tps / tps[-1]
+    precision = np.r_[precision[::-1], 1]
+    recall = np.r_[recall[::-1], 0]
+    return float(-np.sum(np.diff(recall) * precision[:-1]))
+
+
+def _precision_recall_f1(tp, pred_sum, true_sum):
+    precision = _divide(tp, pred_sum)
+    recall = _divide(tp, true_sum)
+    denominator = precision + recall
+    denominator[denominator == 0.0] = 1
+    f1 = 2 * precision * recall / denominator
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+def _check_labels(solution, prediction) -> Optional[np.ndarray]:
+    '''
+    Encoded labels if the fold is "regular": predictions are probabilities, labels are
+    ``0, ..., n_classes - 1`` and every class is present in ``solution``, so that no scikit-learn metric has a corner case to treat.
+    '''
+    if not isinstance(prediction, np.ndarray) or prediction.ndim != 2 or prediction.shape[1] < 2 \
+            or prediction.dtype.kind != "f" or not (np.all(prediction >= 0) and np.all(prediction <= 1)):
+        return None
+    solution = np.asarray(solution)
+    if solution.ndim == 2 and solution.shape[1] == 1:
+        solution = solution.ravel()
+    if solution.ndim != 1 or solution.shape[0] != prediction.shape[0] or solution.dtype.kind not in "biuf":
+        return None
+    y_true = solution.astype("int64")
+    if solution.dtype.kind == "f" and not np.array_equal(y_true, solution):
+        return None
+    n_classes = prediction.shape[1]
+    if y_true.min() != 0 or y_true.max() != n_classes - 1 or \
+            np.count_nonzero(np.bincount(y_true, minlength=n_classes)) != n_classes:
+        return None
+    return y_true
+
+
+def calculate_all_classification_scores(solution, prediction) -> Optional[Dict[str, float]]:
+    '''
+    Compute all the ``CLASSIFICATION_METRICS`` which are defined for the fold, in a single pass.
+
+    Confusion matrix, per-class counts and descending order of every score column are computed once,
+    each metric is derived from them. Values (and the set of metrics which are defined) are the same
+    as calling each scorer.
+
+    Parameters
+    ----------
+    solution: np.ndarray
+        true labels, shape ``(n_samples, )``
+    prediction: np.ndarray
+        predicted probabilities, shape ``(n_samples, n_classes)``
+
+    Returns
+    -------
+    score: dict or None
+        ``None`` if the fold has a corner case (e.g. absent classes, labels which are not encoded),
+        scorers should be called one by one.
+    '''
+    y_true = _check_labels(solution, prediction)
+    if y_true is None:
+        return None
+    n_samples, n_classes = prediction.shape
+    is_binary = n_classes == 2
+    y_pred = np.argmax(prediction, axis=1)
+    confusion_matrix = np.bincount(y_true * n_classes + y_pred, minlength=n_classes ** 2) \
+        .reshape(n_classes, n_classes).astype("float64")
+    tp = np.diag(confusion_matrix)
+    true_sum = confusion_matrix.sum(axis=1)
+    pred_sum = confusion_matrix.sum(axis=0)
+    score = dict()
+
+    score["accuracy"] = float(tp.sum() / n_samples)
+
+    # balanced_accuracy of ``classification_metrics``, bounded by eps
+    eps = 1e-15
+    tp_ = np.maximum(eps, tp)
+    tpr = tp_ / np.maximum(eps, tp_ + (true_sum - tp))
+    if is_binary:
+        tn_ = np.maximum(eps, tp[0])
+        tnr = tn_ / np.maximum(eps, tn_ + confusion_matrix[0, 1])
+        score["balanced_accuracy"] = float(0.5 * (tpr[1] + tnr))
+    else:
+        score["balanced_accuracy"] = float(np.mean(tpr))
+
+    cov_ytyp = tp.sum() * n_samples - np.dot(true_sum, pred_sum)
+    cov_ypyp = n_samples ** 2 - np.dot(pred_sum, pred_sum)
+    cov_ytyt = n_samples ** 2 - np.dot(true_sum, true_sum)
+    if cov_ypyp * cov_ytyt == 0:
+        score["mcc"] = 0.0
+    else:
+        score["mcc"] = float(cov_ytyp / np.sqrt(cov_ytyt * cov_ypyp))
+
+    per_class = _precision_recall_f1(tp, pred_sum, true_sum)
+    micro = _precision_recall_f1(tp.sum(keepdims=True), pred_sum.sum(keepdims=True),
+                                 true_sum.sum(keepdims=True))
+    for name, values in per_class.items():
+        if is_binary:
+            score[name] = float(values[1])
+        score[f"{name}_macro"] = float(np.average(values))
+        score[f"{name}_micro"] = float(micro[name][0])
+        score[f"{name}_weighted"] = float(np.average(values, weights=true_sum))
+
+    # log_loss of scikit-learn: clip, renormalize and pick the probability of the true class
+    clip_eps = np.finfo(prediction.dtype).eps if _log_loss_eps == "auto" else _log_loss_eps
+    proba = np.clip(prediction, clip_eps, 1 - clip_eps)
+    proba = proba / proba.sum(axis=1)[:, np.newaxis]
+    score["log_loss"] = -float(np.average(-np.log(proba[np.arange(n_samples), y_true])))
+
+    # pac_score of ``classification_metrics``
+    solution_binary = np.zeros((n_samples, n_classes))
+    solution_binary[np.arange(n_samples), y_true] = 1
+    proba = np.minimum(1, np.maximum(0, prediction))
+    pac_eps = 0.00000003
+    frac_pos = solution_binary.sum(axis=0) / n_samples
+    if is_binary:
+        solution_binary, proba, frac_pos = solution_binary[:, 1:], proba[:, 1:], frac_pos[1:]
+        proba = np.minimum(1 - pac_eps, np.maximum(pac_eps, proba))
+        the_log_loss = -np.mean(solution_binary * np.log(proba), axis=0) - \
+                       np.mean((1 - solution_binary) * np.log(1 - proba), axis=0)
+        frac_neg = 1 - frac_pos
+        the_base_log_loss = -frac_pos * np.log(np.maximum(eps, frac_pos)) - \
+                            frac_neg * np.log(np.maximum(eps, frac_neg))
+    else:
+        proba = proba / np.maximum(proba.sum(axis=1), pac_eps)[:, np.newaxis]
+        proba = np.minimum(1 - pac_eps, np.maximum(pac_eps, proba))
+        the_log_loss = np.sum(-np.mean(solution_binary * np.log(proba), axis=0))
+        frac_pos_ = np.maximum(eps, frac_pos)
+        the_base_log_loss = np.sum(-frac_pos * np.log(frac_pos_ / np.sum(frac_pos_)))
+    pac = np.mean(np.exp(-the_log_loss))
+    base_pac = np.mean(np.exp(-the_base_log_loss))
+    score["pac_score"] = float((pac - base_pac) / np.maximum(1e-7, (1 - base_pac)))
+
+    # every ranking metric shares the descending order of each score column
+    orders = np.argsort(prediction, axis=0, kind="mergesort")[::-1]
+    if is_binary:
+        order = orders[:, 1]
+        fps, tps = _binary_curve(prediction[order, 1], y_true[order] == 1)
+        score["average_precision"] = _average_precision(fps, tps)
+        roc_auc = _roc_auc(fps, tps)
+        for average in _averages + ('samples',):
+            score[f"roc_auc_{average}"] = roc_auc
+        # ``roc_auc`` scorer ranks the predicted labels, i.e. a ROC curve with a single threshold
+        tpr = tp[1] / true_sum[1]
+        fpr = confusion_matrix[0, 1] / true_sum[0]
+        score["roc_auc"] = float((1 + tpr - fpr) / 2)
+    elif np.allclose(1, prediction.sum(axis=1)):
+        ovr = np.empty(n_classes)
+        for c in range(n_classes):
+            order = orders[:, c]
+            ovr[c] = _roc_auc(*_binary_curve(prediction[order, c], y_true[order] == c))
+        score["roc_auc_ovr_macro"] = float(np.average(ovr))
+        score["roc_auc_ovr_weighted"] = float(np.average(ovr, weights=true_sum))
+        if _ovr_micro_roc_auc:
+            flat_order = np.argsort(prediction.ravel(), kind="mergesort")[::-1]
+            score["roc_auc_ovr_micro"] = _roc_auc(*_binary_curve(
+                prediction.ravel()[flat_order], solution_binary.ravel()[flat_order]))
+        pairs = list(combinations(range(n_classes), 2))
+        pair_scores = np.empty(len(pairs))
+        prevalence = np.empty(len(pairs))
+        for ix, (a, b) in enumerate(pairs):
+            pair_score = 0
+            for positive in (a, b):
+                # restricting a sorted column to two classes keeps it sorted
+                order = orders[:, positive]
+                sorted_true = y_true[order]
+                mask = (sorted_true == a) | (sorted_true == b)
+                pair_score += _roc_auc(*_binary_curve(
+                    prediction[order[mask], positive], sorted_true[mask] == positive))
+            pair_scores[ix] = pair_score / 2
+            prevalence[ix] = (true_sum[a] + true_sum[b]) / n_samples
+        score["roc_auc_ovo_macro"] = float(np.average(pair_scores))
+        score["roc_auc_ovo_weighted"] = float(np.average(pair_scores, weights=prevalence))
+    return score
+
+
+def calculate_all_regression_scores(solution, prediction) -> Optional[Dict[str, float]]:
+    '''
+    Compute all the ``REGRESSION_METRICS`` from the residuals, in a single pass.
+
+    Returns
+    -------
+    score: dict or None
+        ``None`` if the fold has a corner case (e.g. multi-output, constant target),
+        scorers should be called one by one.
+    '''
+    y_true = np.asarray(solution)
+    y_pred = np.asarray(prediction)
+    if y_pred.ndim == 2 and y_pred.shape[1] == 1:
+        y_pred = y_pred.ravel()
+    if y_true.ndim != 1 or y_pred.shape != y_true.shape or \
+            y_true.dtype.kind not in "biuf" or y_pred.dtype.kind not in "biuf":
+        return None
+    residual = y_true - y_pred
+    numerator = (residual ** 2).sum(dtype="float64")
+    denominator = ((y_true - np.average(y_true)) ** 2).sum(dtype="float64")
+    if denominator == 0:
+        return None
+    absolute_error = np.abs(residual)
+    return {
+        "r2": float(1 - numerator / denominator),
+        "mean_squared_error": -float(np.average(residual ** 2)),
+        "mean_absolute_error": -float(np.average(absolute_error)),
+        "median_absolute_error": -float(np.median(absolute_error)),
+    }
@@ -0,0 +1,245 @@
+from collections import OrderedDict
+from typing import List, Union, Optional, Dict
+
+import numpy as np
+import pandas as pd
+
+from autoflow.pipeline.dataframe import GenericDataFrame
+from autoflow.utils.array import get_rows_indexer
+from autoflow.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def _compose_rows(rows: Union[None, slice, np.ndarray], n_rows: int, index) -> Union[slice, np.ndarray]:
+    if rows is None:
+        return get_rows_indexer(index)
+    if isinstance(rows, slice):
+        return get_rows_indexer(np.arange(n_rows)[rows][index])
+    return get_rows_indexer(rows[index])
+
+
+class FeatureBlock():
+    '''
+    Columns of one feature group, stored as a contiguous read-only 2-D array.
+
+    ``rows`` selects the rows of ``values`` which belong to the frame (``None`` means all rows),
+    a block is never modified after construction, so it can be shared by many frames.
+    '''
+
+    def __init__(self, values: np.ndarray, columns: List[str], columns_metadata: List[dict],
+                 rows: Union[None, slice, np.ndarray] = None):
+        values = np.ascontiguousarray(values)
+        if values.ndim == 1:
+            values = values.reshape(-1, 1)
+        assert values.shape[1] == len(columns) == len(columns_metadata)
+        values = values.view()
+        values.flags.writeable = False
+        self.values = values
+        self.columns = list(columns)
+        self.columns_metadata = list(columns_metadata)
+        self.rows = rows
+
+    @property
+    def n_rows(self):
+        if self.rows is None:
+            return self.values.shape[0]
+        if isinstance(self.rows, slice):
+            return len(range(*self.rows.indices(self.values.shape[0])))
+        return self.rows.size
+
+    @property
+    def n_columns(self):
+        return self.values.shape[1]
+
+    def get_values(self) -> np.ndarray:
+        if self.rows is None:
+            return self.values
+        # a slice gives a (read-only) view, an index array gives a copy
+        return self.values[self.rows]
+
+    def take_rows(self, index) -> "FeatureBlock":
+        return FeatureBlock(self.values, self.columns, self.columns_metadata,
+                            _compose_rows(self.rows, self.values.shape[0], index))
+
+
+class BlockDataFrame():
+    '''
+    Block-backed alternative of ``GenericDataFrame``: one ``FeatureBlock`` per feature group.
+
+    Looking up a feature group is a dict lookup, ``replace_feature_groups`` swaps blocks and leaves
+    the others shared (copy-on-write), and ``split`` returns frames of row views, so the cost of a
+    preprocessing step scales with the width of the groups it touches instead of the total width.
+
+    Columns are ordered by feature group, in order of appearance; replaced groups are appended at the
+    end, as ``GenericDataFrame.replace_feature_groups`` does.
+    '''
+
+    def __init__(self, blocks: Dict[str, FeatureBlock], index: Optional[pd.Index] = None):
+        self.blocks = OrderedDict(blocks)
+        n_rows = {block.n_rows for block in self.blocks.values()}
+        assert len(n_rows) <= 1, "All the blocks should have the same number of rows."
+        if index is None:
+            index = pd.RangeIndex(n_rows.pop() if n_rows else 0)
+        self.index = index
+
+    @classmethod
+    def from_dataframe(cls, df: Union[pd.DataFrame, np.ndarray],
+                       feature_groups: Union[List[str], pd.Series, None] = None,
+                       columns_metadata: Union[List[dict], pd.Series, None] = None) -> "BlockDataFrame":
+        if isinstance(df, np.ndarray):
+            df = pd.DataFrame(df)
+        if isinstance(df, GenericDataFrame):
+            if feature_groups is None:
+                feature_groups = df.feature_groups
+            if columns_metadata is None:
+                columns_metadata = df.columns_metadata
+        if feature_groups is None:
+            logger.debug("feature_groups is None, set it all to 'cat' feature group.")
+            feature_groups = ["cat"] * df.shape[1]
+        if columns_metadata is None:
+            columns_metadata = [{}] * df.shape[1]
+        feature_groups = list(feature_groups)
+        columns_metadata = list(columns_metadata)
+        assert len(feature_groups) == len(columns_metadata) == df.shape[1]
+        blocks = OrderedDict()
+        for feature_group in pd.unique(np.array(feature_groups)):
+            columns_index = [i for i, x in enumerate(feature_groups) if x == feature_group]
+            blocks[feature_group] = FeatureBlock(
+                df.iloc[:, columns_index].values,
+                df.columns[columns_index].tolist(),
+                [columns_metadata[i] for i in columns_index],
+            )
+        return cls(blocks, df.index)
+
+    def to_generic_dataframe(self) -> GenericDataFrame:
+        df = pd.DataFrame(OrderedDict(
+            (column, values) for block in self.blocks.values()
+            for column, values in zip(block.columns, block.get_values().T)
+        ), index=self.index)
+        # keep the dtypes of the columns, as they were before being packed in an object block
+        df = df.infer_objects()
+        return GenericDataFrame(df, feature_groups=self.feature_groups, columns_metadata=self.columns_metadata)
+
+    @property
+    def feature_groups(self) -> pd.Series:
+        return pd.Series([feature_group for feature_group, block in self.blocks.items()
+                          for _ in range(block.n_columns)], dtype=object)
+
+    @property
+    def columns_metadata(self) -> pd.Series:
+        return pd.Series([metadata for block in self.blocks.values() for metadata in block.columns_metadata],
+                         dtype=object)
+
+    @property
+    def columns(self) -> pd.Index:
+        return pd.Index([column for block in self.blocks.values() for column in block.columns])
+
+    @property
+    def shape(self):
+        return len(self.index), sum(block.n_columns for block in self.blocks.values())
+
+    @property
+    def values(self) -> np.ndarray:
+        blocks = [block.get_values() for block in self.blocks.values()]
+        if not blocks:
+            return np.zeros([len(self.index), 0])
+        return np.hstack(blocks)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(shape={self.shape}, " \
+               f"feature_groups={ {k: v.n_columns for k, v in self.blocks.items()} })"
+
+    def _parse_feature_groups(self, feature_group: Union[List, str]) -> List[str]:
+        if feature_group == "all":
+            feature_group = list(self.blocks.keys())
+        if isinstance(feature_group, str):
+            feature_group = [feature_group]
+        return list(feature_group)
+
+    def get_values(self, feature_group: Union[List, str]) -> np.ndarray:
+        feature_group = self._parse_feature_groups(feature_group)
+        blocks = [self.blocks[x].get_values() for x in feature_group if x in self.blocks]
+        if len(blocks) == 1:
+            return blocks[0]
+        if not blocks:
+            return np.zeros([len(self.index), 0])
+        return np.hstack(blocks)
+
+    def filter_feature_groups(self, feature_group: Union[List, str], isin=True) -> "BlockDataFrame":
+        feature_group = set(self._parse_feature_groups(feature_group))
+        return BlockDataFrame(OrderedDict(
+            (k, v) for k, v in self.blocks.items() if (k in feature_group) == isin
+        ), self.index)
+
+    def concat_two(self, df1: "BlockDataFrame", df2: "BlockDataFrame") -> "BlockDataFrame":
+        assert isinstance(df1, BlockDataFrame)
+        assert isinstance(df2, BlockDataFrame)
+        blocks = OrderedDict(df1.blocks)
+        for feature_group, block in df2.blocks.items():
+            if feature_group in blocks:
+                old_block = blocks[feature_group]
+                block = FeatureBlock(np.hstack([old_block.get_values(), block.get_values()]),
+                                     old_block.columns + block.columns,
+                                     old_block.columns_metadata + block.columns_metadata)
+            blocks[feature_group] = block
+        return BlockDataFrame(blocks, df1.index)
+
+    def replace_feature_groups(self, old_feature_group: Union[List[str], str],
+                               values: Union[np.ndarray, pd.DataFrame],
+                               new_feature_group: Union[str, List[str], pd.Series],
+                               new_columns_metadata: Union[str, List[dict], None, pd.Series] = None
+                               ) -> "BlockDataFrame":
+        old_feature_group = self._parse_feature_groups(old_feature_group)
+        if new_columns_metadata is None:
+            new_columns_metadata = [{}] * values.shape[1]
+        new_columns_metadata = list(new_columns_metadata)
+        assert len(new_columns_metadata) == values.shape[1]
+        if isinstance(new_feature_group, str):
+            new_feature_group = [new_feature_group] * values.shape[1]
+        new_feature_group = list(new_feature_group)
+        assert len(new_feature_group) == values.shape[1]
+        if isinstance(values, pd.DataFrame):
+            columns = values.columns.tolist()
+            values = values.values
+        else:
+            replaced_columns = [column for x in old_feature_group if x in self.blocks
+                                for column in self.blocks[x].columns]
+            if len(replaced_columns) == values.shape[1]:
+                columns = replaced_columns
+            else:
+                columns = [f"{x}_{i}" for i, x in enumerate(new_feature_group)]
+        assert values.shape[0] == len(self.index)
+        new_blocks = OrderedDict()
+        for feature_group in pd.unique(np.array(new_feature_group, dtype=object)):
+            columns_index = [i for i, x in enumerate(new_feature_group) if x == feature_group]
+            if len(columns_index) == len(new_feature_group):
+                new_blocks[feature_group] = FeatureBlock(values, columns, new_columns_metadata)
+            else:
+                new_blocks[feature_group] = FeatureBlock(
+                    values[:, columns_index], [columns[i] for i in columns_index],
+                    [new_columns_metadata[i] for i in columns_index])
+        deleted_df = self.filter_feature_groups(old_feature_group, isin=False)
+        return self.concat_two(deleted_df, BlockDataFrame(new_blocks, self.index))
+
+    def split(self, indexes, type="iloc"):
+        assert type in ("loc", "iloc")
+        for index in indexes:
+            if type == "loc":
+                index = self.index.get_indexer(index)
+                assert np.all(index >= 0), "Some labels are not in index."
+            index = get_rows_indexer(index)
+            yield BlockDataFrame(OrderedDict(
+                (k, v.take_rows(index)) for k, v in self.blocks.items()
+            ), self.index[index])
+
+    def copy(self, deep=True) -> "BlockDataFrame":
+        # blocks are read-only, so a shallow copy is safe, a deep copy releases the memory of unused rows
+        if not deep:
+            return BlockDataFrame(self.blocks, self.index)
+        return BlockDataFrame(OrderedDict(
+            (k, FeatureBlock(v.get_values().copy(), v.columns, v.columns_metadata)) for k, v in self.blocks.items()
+        ), self.index.copy())
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from autoflow.utils.hash import get_hash_of_str, get_hash_of_dict
+from autoflow.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def get_step_cache_key(prefix_key: str, name: str, transformer) -> str:
+    '''
+    Key of a fitted pipeline prefix. It is chained from the key of the previous prefix,
+    so it identifies the whole DHP sub-tree before (and including) current step.
+    '''
+    m = hashlib.md5()
+    get_hash_of_str(prefix_key, m)
+    get_hash_of_str(name, m)
+    get_hash_of_str(transformer.__class__.__name__, m)
+    get_hash_of_str(f"{getattr(transformer, 'in_feature_groups', None)}->"
+                    f"{getattr(transformer, 'out_feature_groups', None)}", m)
+    hyperparams = getattr(transformer, "hyperparams", None)
+    if hyperparams is None:
+        hyperparams = transformer.get_params(deep=False)
+    return get_hash_of_dict(hyperparams, m)
+
+
+class PreprocessingCache():
+    '''
+    Cache of fitted preprocessing prefixes, shared across trials.
+
+    A value is the ``(result, fitted_transformer)`` tuple returned by ``_fit_transform_one``,
+    it is pickled when stored, so every ``get`` returns a fresh copy.
+    '''
+
+    def __init__(self, max_size_mb: float = 1024):
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.logger = get_logger(self)
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryPreprocessingCache(PreprocessingCache):
+    '''
+    Least-recently-used cache in the memory of current process.
+
+    It is shared by the trials (and fold threads) of one tuner worker.
+    Entries are not carried over when the cache is pickled.
+    '''
+
+    def __init__(self, max_size_mb: float = 1024):
+        super(MemoryPreprocessingCache, self).__init__(max_size_mb)
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                return None
+            self.entries.move_to_end(key)
+        return pickle.loads(value)
+
+    def set(self, key, value):
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(value) > self.max_size:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_size:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("lock")
+        state["entries"] = OrderedDict()
+        state["size"] = 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+
+class DiskPreprocessingCache(PreprocessingCache):
+    '''
+    Least-recently-used cache in a local directory, one file per entry.
+
+    It is shared by all processes (tuner workers) which use the same ``cache_dir``.
+    Files are written to a temporary path and renamed, so a reader never sees a partial entry.
+    '''
+    suffix = ".pkl"
+
+    def __init__(self, cache_dir: str, max_size_mb: float = 1024):
+        super(DiskPreprocessingCache, self).__init__(max_size_mb)
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def get(self, key):
+        path = self.get_path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            # modify time is used as the recently-used time
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (EOFError, pickle.UnpicklingError):
+            self.logger.warning(f"Broken cache file '{path}', ignore it.")
+            return None
+        return value
+
+    def set(self, key, value):
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(value) > self.max_size:
+            return
+        path = self.get_path(key)
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        size = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(self.suffix):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # evicted by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            size += stat.st_size
+        if size <= self.max_size:
+            return
+        entries.sort()
+        for _, file_size, path in entries:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= file_size
+            if size <= self.max_size:
+                break
+
+    def clear(self):
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(self.suffix):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
@@ -11,7 +11,6 @@ from sklearn.base import BaseEstimator
 
 from autoflow.pipeline.dataframe import GenericDataFrame
 from autoflow.utils.data import densify
-from autoflow.utils.dataframe import rectify_dtypes
 from autoflow.utils.hash import get_hash_of_Xy, get_hash_of_dict
 from autoflow.utils.logging import get_logger
 
@@ -110,10 +109,10 @@ class AutoFlowComponent(BaseEstimator):
         elif isinstance(X, GenericDataFrame):
             from autoflow.pipeline.components.feature_engineer_base import AutoFlowFeatureEngineerAlgorithm
             if issubclass(self.__class__, AutoFlowFeatureEngineerAlgorithm):
-                df = X.filter_feature_groups(self.in_feature_groups)
+                # the filtered frame is a new frame, no need to copy it again
+                df = X.filter_feature_groups(self.in_feature_groups, copy=False)
             else:
                 df = X
-            rectify_dtypes(df)
             if extract_info:
                 return df, df.feature_groups, df.columns_metadata
             else:
@@ -2,6 +2,7 @@ import pandas as pd
 
 from autoflow.pipeline.components.base import AutoFlowComponent
 from autoflow.pipeline.dataframe import GenericDataFrame
+from autoflow.utils.dataframe import rectify_dtypes
 
 
 class AutoFlowDataProcessAlgorithm(AutoFlowComponent):
@@ -35,7 +36,10 @@ class AutoFlowDataProcessAlgorithm(AutoFlowComponent):
         feature_groups = X.feature_groups
         columns_metadata = X.columns_metadata
         X_, y_ = self._transform_proc(X, y)
-        X = GenericDataFrame(pd.DataFrame(X_, columns=columns), feature_groups=feature_groups, columns_metadata=columns_metadata)
+        X_ = pd.DataFrame(X_, columns=columns)
+        # resampled rows may be an object array if the columns have mixed types
+        rectify_dtypes(X_)
+        X = GenericDataFrame(X_, feature_groups=feature_groups, columns_metadata=columns_metadata)
         return X, y_
 
     def _transform_proc(self, X_train, y_train):
@@ -70,12 +70,15 @@ class BaseSplit(AutoFlowFeatureEngineerAlgorithm):
             collection[keyname]["columns_metadata"].append(columns_metadata)
         dfs = []
         for feature_groups_name, dict_ in collection.items():
-            X = np.array(dict_["X"]).T
             columns_metadata = dict_["columns_metadata"]
             feature_groups = [feature_groups_name] * len(columns_metadata)
-            if X.shape == (0,):
-                X = np.zeros([X_origin.shape[0], 0])
-            df = GenericDataFrame(pd.DataFrame(X, columns= dict_["col_name"]), feature_groups=feature_groups, columns_metadata=columns_metadata)
+            if dict_["X"]:
+                # column by column, so that numerical columns are not turned into objects by categorical ones
+                X = pd.DataFrame(dict(zip(dict_["col_name"], [col.values for col in dict_["X"]])),
+                                 columns=dict_["col_name"])
+            else:
+                X = pd.DataFrame(np.zeros([X_origin.shape[0], 0]))
+            df = GenericDataFrame(X, feature_groups=feature_groups, columns_metadata=columns_metadata)
             dfs.append(df)
         assert len(dfs) == 2
         df = dfs[0].concat_two(dfs[0], dfs[1])
@@ -1,4 +1,3 @@
-from copy import deepcopy
 from typing import List, Union
 
 import numpy as np
@@ -6,6 +5,8 @@ import pandas as pd
 from pandas._typing import FrameOrSeries
 from pandas.core.generic import bool_t
 
+from autoflow.utils.array import get_rows_indexer
+from autoflow.utils.dataframe import rectify_dtypes
 from autoflow.utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -55,19 +56,15 @@ class GenericDataFrame(pd.DataFrame):
         # 用于过滤feature_groups
         if isinstance(feature_group, str):
             feature_group = [feature_group]
-        if copy:
-            result = deepcopy(self)
-            result = GenericDataFrame(result, feature_groups=self.feature_groups,
-                                      columns_metadata=self.columns_metadata)
-        else:
-            result = self
-        loc = result.feature_groups.isin(feature_group)
+        loc = self.feature_groups.isin(feature_group)
         if not isin:
             loc = (~loc)
-        result.set_feature_groups(result.feature_groups[loc])
-        result.set_columns_metadata(result.columns_metadata[loc])
-        loc_df = result.loc[:, result.columns[loc]]
-        return GenericDataFrame(loc_df, feature_groups=result.feature_groups, columns_metadata=result.columns_metadata)
+        # only the selected columns are copied, instead of deep-copying the whole frame
+        loc_df = self.loc[:, self.columns[loc]]
+        if copy:
+            loc_df = loc_df.copy()
+        return GenericDataFrame(loc_df, feature_groups=self.feature_groups[loc],
+                                columns_metadata=self.columns_metadata[loc])
 
     def concat_two(self, df1, df2):
         assert isinstance(df1, GenericDataFrame)
@@ -108,7 +105,11 @@ class GenericDataFrame(pd.DataFrame):
 
         # 开始构造df
         if isinstance(values, np.ndarray):
+            is_object = values.dtype == object
             values = pd.DataFrame(values, columns=columns)
+            if is_object:
+                # an object array of the new columns may hold numbers
+                rectify_dtypes(values)
         deleted_df = self.filter_feature_groups(old_feature_group, True, False)
         new_df = GenericDataFrame(values, feature_groups=new_feature_group,
                                   columns_metadata=new_columns_metadata)
@@ -119,7 +120,8 @@ class GenericDataFrame(pd.DataFrame):
         assert type in ("loc", "iloc")
         for index in indexes:
             if type == "iloc":
-                yield GenericDataFrame(self.iloc[index, :], feature_groups=self.feature_groups,
+                # contiguous rows are sliced, which gives a view instead of a copy
+                yield GenericDataFrame(self.iloc[get_rows_indexer(index), :], feature_groups=self.feature_groups,
                                        columns_metadata=self.columns_metadata)
             elif type == "loc":
                 yield GenericDataFrame(self.loc[index, :], feature_groups=self.feature_groups,
@@ -6,6 +6,8 @@ from sklearn.utils import _print_elapsed_time
 from sklearn.utils.metaestimators import if_delegate_has_method
 from sklearn.utils.validation import check_memory
 
+from autoflow.pipeline.cache import get_step_cache_key
+from autoflow.utils.memory import StepProfiler
 from autoflow.utils.ml_task import MLTask
 
 
@@ -32,6 +34,9 @@ def _fit_transform_one(transformer,
 class GenericPipeline(Pipeline):
     # 可以当做Transformer，又可以当做estimator！
     resource_manager = None
+    # cross-trial cache of fitted prefixes, and the key of the data (task and fold) they are fitted on
+    preprocessing_cache = None
+    cache_key = ""
 
     # todo: 适配当做普通Pipeline的情况
     def _fit(self, X_train, y_train, X_valid=None, y_valid=None, X_test=None, y_test=None, intermediate_result=None):
@@ -42,6 +47,10 @@ class GenericPipeline(Pipeline):
         memory = check_memory(self.memory)
 
         fit_transform_one_cached = memory.cache(_fit_transform_one)
+        cache_key = self.cache_key
+        self.cache_stats = {"hits": 0, "misses": 0}
+        # cost of each step, in order of execution
+        self.step_stats = []
         for (step_idx,
              name,
              transformer) in self._iter(with_final=False,
@@ -68,11 +77,25 @@ class GenericPipeline(Pipeline):
             else:
                 cloned_transformer = clone(transformer)
             # Fit or load from cache the current transformer
-
-            result, fitted_transformer = fit_transform_one_cached(
-                cloned_transformer, X_train, y_train, X_valid, y_valid, X_test, y_test, self.resource_manager,
-                message_clsname='Pipeline',
-                message=self._log_message(step_idx))
+            cached = None
+            if self.preprocessing_cache is not None:
+                cache_key = get_step_cache_key(cache_key, name, transformer)
+                cached = self.preprocessing_cache.get(cache_key)
+            with StepProfiler(name, "fit", X_train) as profiler:
+                if cached is None:
+                    result, fitted_transformer = fit_transform_one_cached(
+                        cloned_transformer, X_train, y_train, X_valid, y_valid, X_test, y_test, self.resource_manager,
+                        message_clsname='Pipeline',
+                        message=self._log_message(step_idx))
+                    if self.preprocessing_cache is not None:
+                        self.cache_stats["misses"] += 1
+                        self.preprocessing_cache.set(cache_key, (result, fitted_transformer))
+                else:
+                    result, fitted_transformer = cached
+                    self.cache_stats["hits"] += 1
+            profiler.set_output(result["X_train"])
+            profiler.stats["cached"] = cached is not None
+            self.step_stats.append(profiler.stats)
             X_train = result["X_train"]
             X_valid = result.get("X_valid")
             X_test = result.get("X_test")
@@ -98,18 +121,22 @@ class GenericPipeline(Pipeline):
         y_train = result.get("y_train")
         self.last_data = result
         with _print_elapsed_time('Pipeline',
-                                 self._log_message(len(self.steps) - 1)):
+                                 self._log_message(len(self.steps) - 1)), \
+                StepProfiler(self.steps[-1][0], "fit", X_train) as profiler:
             self._final_estimator.resource_manager = self.resource_manager
             self._final_estimator.fit(X_train, y_train, X_valid, y_valid, X_test, y_test)
             self._final_estimator.resource_manager = None
+        self.step_stats.append(profiler.stats)
         return self
 
     def fit_transform(self, X_train, y_train=None, X_valid=None, y_valid=None, X_test=None, y_test=None,intermediate_result=None):
         return self.fit(X_train, y_train, X_valid, y_valid, X_test, y_test,intermediate_result).transform(X_train, X_valid, X_test, y_train)
 
     def procedure(self, ml_task: MLTask, X_train, y_train, X_valid=None, y_valid=None, X_test=None, y_test=None,
-                  resource_manager=None,intermediate_result=None):
+                  resource_manager=None,intermediate_result=None, preprocessing_cache=None, cache_key=""):
         self.resource_manager = resource_manager
+        self.preprocessing_cache = preprocessing_cache
+        self.cache_key = cache_key
         self.fit(X_train, y_train, X_valid, y_valid, X_test, y_test,intermediate_result)
         X_train = self.last_data["X_train"]
         y_train = self.last_data["y_train"]
@@ -117,16 +144,27 @@ class GenericPipeline(Pipeline):
         X_test = self.last_data.get("X_test")
         self.last_data = None  # GC
         if ml_task.mainTask == "classification":
-            pred_valid = self._final_estimator.predict_proba(X_valid)
-            pred_test = self._final_estimator.predict_proba(X_test) if X_test is not None else None
+            predict = self._final_estimator.predict_proba
         else:
-            pred_valid = self._final_estimator.predict(X_valid)
-            pred_test = self._final_estimator.predict(X_test) if X_test is not None else None
+            predict = self._final_estimator.predict
+        with StepProfiler(self.steps[-1][0], "predict", X_valid) as profiler:
+            pred_valid = predict(X_valid)
+        profiler.set_output(pred_valid)
+        self.step_stats.append(profiler.stats)
+        pred_test = None
+        if X_test is not None:
+            with StepProfiler(self.steps[-1][0], "predict", X_test) as profiler:
+                pred_test = predict(X_test)
+            profiler.set_output(pred_test)
+            self.step_stats.append(profiler.stats)
         self.resource_manager = None
+        self.preprocessing_cache = None
         return {
             "pred_valid": pred_valid,
             "pred_test": pred_test,
-            "y_train": y_train  # todo: evaluator 中做相应的改变
+            "y_train": y_train,  # todo: evaluator 中做相应的改变
+            "cache_stats": self.cache_stats,
+            "step_stats": self.step_stats
         }
 
     def transform(self, X_train, X_valid=None, X_test=None, y_train=None,
@@ -1,23 +1,34 @@
 import inspect
+import math
 import os
+import time
+from collections import OrderedDict
+from queue import Empty
 from typing import Dict, Optional, Callable, Union
 
 import numpy as np
-from ConfigSpace import ConfigurationSpace
+from ConfigSpace import ConfigurationSpace, Configuration
 from frozendict import frozendict
 
 from dsmac.facade.smac_hpo_facade import SMAC4HPO
+from dsmac.intensification.hyperband import Hyperband
+from dsmac.runhistory.columnar_runhistory import ColumnarRunHistory
+from dsmac.runhistory.utils import get_id_of_config
 from dsmac.scenario.scenario import Scenario
+from dsmac.tae.execute_func import AbstractTAFunc
+from dsmac.tae.execute_ta_run import BudgetExhaustedException
+from autoflow.evaluation.base import BaseEvaluator
 from autoflow.evaluation.ensemble_evaluator import EnsembleEvaluator
 from autoflow.evaluation.train_evaluator import TrainEvaluator
 from autoflow.hdl2shps.hdl2shps import HDL2SHPS
 from autoflow.manager.data_manager import DataManager
 from autoflow.manager.resource_manager import ResourceManager
-from autoflow.utils.concurrence import parse_n_jobs
+from autoflow.utils.concurrence import parse_n_jobs, WorkQueue
 from autoflow.utils.config_space import get_random_initial_configs, get_grid_initial_configs
 from autoflow.utils.klass import StrSignatureMixin
 from autoflow.utils.logging import get_logger
 from autoflow.utils.ml_task import MLTask
+from autoflow.utils.sys import get_trance_back_msg
 
 class Tuner(StrSignatureMixin):
     '''
@@ -36,6 +47,9 @@ class Tuner(StrSignatureMixin):
             per_run_time_limit: float = 60,
             per_run_memory_limit: float = 3072,
             time_left_for_this_task: float = None,
+            ensemble_time_fraction: float = 0.1,
+            persistent_worker: bool = False,
+            work_stealing: bool = False,
             debug=False
     ):
         '''
@@ -54,16 +68,25 @@ class Tuner(StrSignatureMixin):
 
             As default,  "TrainEvaluator" is the string-indicator of :class:`autoflow.evaluation.train_evaluator.TrainEvaluator` .
 
+            You can also pass an evaluator instance, such as ``TrainEvaluator(n_fold_jobs=5)``, to configure it.
+
         search_method: str
-            Specific searching method, ``random``, ``smac``, ``grid`` are available.
+            Specific searching method, ``random``, ``smac``, ``grid``, ``hyperband``, ``bohb`` are available.
 
-                * ``random`` Random Search Algorithm,
-                * ``grid``   Grid   Search Algorithm,
-                * ``smac``   Bayes Search by SMAC Algorithm.
+                * ``random``    Random Search Algorithm,
+                * ``grid``      Grid   Search Algorithm,
+                * ``smac``      Bayes Search by SMAC Algorithm,
+                * ``hyperband`` Hyperband over the budget of training rows,
+                  configurations are evaluated on stratified subsamples of ``X_train``,
+                  only top ``1 / eta`` of them are promoted to larger subsamples,
+                * ``bohb``      like ``hyperband``, but configurations are sampled by SMAC's surrogate model
+                  trained on the largest budget which has enough runs.
 
         run_limit: int
             Limitation of running step.
 
+            For ``hyperband`` and ``bohb``, it is the limitation of evaluations (on all budgets).
+
         initial_runs: int
             If you choose ``smac`` algorithm,
 
@@ -76,6 +99,29 @@ class Tuner(StrSignatureMixin):
         search_method_params: dict
             Configuration for specific search method.
 
+            For ``hyperband`` and ``bohb``:
+
+                * ``min_budget``, the smallest fraction of training rows, default is ``1 / 9``.
+                * ``eta``, default is ``3``. Budgets are ``min_budget``, ``min_budget * eta``, ... , ``1``.
+
+            For all the methods based on SMAC:
+
+                * ``columnar_runhistory``, default is ``False``. If ``True``, runs are stored in
+                  :class:`dsmac.runhistory.columnar_runhistory.ColumnarRunHistory`, which takes less memory
+                  and time per run for long searches (100k+ runs).
+                * ``retrain_every``, ``retrain_time_fraction``, ``partial_retrain``, the retraining policy of
+                  the surrogate model, see :class:`dsmac.optimizer.smbo.SMBO`. As default, the surrogate model
+                  is retrained on every iteration.
+                * ``array_local_search``, default is ``False``. If ``True``, the acquisition function is maximized by
+                  :class:`dsmac.optimizer.ei_optimization.ArrayLocalSearch`, which searches the neighbourhoods
+                  of the configurations as arrays.
+                * ``batch_size``, default is ``None``. If set and ``n_jobs > 1``, ``smac`` runs in batch mode:
+                  instead of ``n_jobs`` independent SMAC loops, one optimizer keeps the surrogate model and proposes
+                  ``batch_size`` configurations at once to ``n_jobs`` evaluating processes.
+                * ``liar``, default is ``"min"``, the cost fantasized for the configurations of a batch which are not
+                  evaluated yet: ``"min"``, ``"mean"``, ``"max"`` of the observed costs (constant liar), or
+                  ``"believer"``, the cost predicted by the surrogate model (kriging believer).
+
         n_jobs: int
             ``n_jobs`` searching process will start.
 
@@ -94,9 +140,34 @@ class Tuner(StrSignatureMixin):
             a searching trial will be killed if it use memory more than ``per_run_memory_limit``.
 
         time_left_for_this_task: float
+            wall time (in seconds) of the search, counted from its start and shared by all the searching processes.
+
+            a trial is not started if it is predicted (by the mean wall time of the previous trials of the process)
+            to end after the deadline, and if ``limit_resource = True``, the time limit of a trial is capped
+            by the time left, so that the search ends in time.
+
+        ensemble_time_fraction: float
+            will active if ``time_left_for_this_task`` is not None.
+
+            fraction of ``time_left_for_this_task`` which is not used by the search,
+            so that the ensemble step (or the loading of the best model) starts with this time left.
+
+        persistent_worker: bool
             will active if ``limit_resource = True``.
 
-            a searching task will be killed if it's totally run time more than ``time_left_for_this_task``.
+            trials are evaluated one after the other in a long-lived worker process which already holds the data,
+            instead of a new process per trial. ``per_run_time_limit`` and ``per_run_memory_limit`` still apply
+            to every trial, the worker is replaced only after a trial hit one of them.
+            In-process caches of the evaluator (``preprocessing_cache = 'memory'``, the model cache of the
+            resource manager) are disabled in the worker, as they would count against ``per_run_memory_limit``
+            of the next trials, ``preprocessing_cache = 'disk'`` is still shared.
+
+        work_stealing: bool
+            will active if ``n_jobs > 1`` and ``search_method`` is "smac", "random" or "grid".
+
+            instead of splitting the initial configurations and ``run_limit`` evenly between the searching processes,
+            they are put in a shared queue and counter, and each process pulls the next trial as soon as it is idle.
+            Utilization of the processes is logged at the end of the search.
 
         debug: bool
             For debug mode.
@@ -106,8 +177,14 @@ class Tuner(StrSignatureMixin):
         self.debug = debug
         self.per_run_memory_limit = per_run_memory_limit
         self.time_left_for_this_task = time_left_for_this_task
+        self.ensemble_time_fraction = ensemble_time_fraction
+        self.deadline = None
+        # wall times of the trials of the process, recorded by the target algorithm runner
+        self.trial_times = []
         self.per_run_time_limit = per_run_time_limit
         self.limit_resource = limit_resource
+        self.persistent_worker = persistent_worker
+        self.work_stealing = work_stealing
         self.logger = get_logger(self)
         if self.debug and self.limit_resource:
             self.logger.warning(
@@ -123,13 +200,13 @@ class Tuner(StrSignatureMixin):
                 raise NotImplementedError
         assert callable(evaluator)
         self.evaluator_prototype = evaluator
-        if inspect.isfunction(evaluator):
+        if inspect.isfunction(evaluator) or isinstance(evaluator, BaseEvaluator):
             self.evaluator = evaluator
         else:
             self.evaluator = evaluator()
         self.evaluator.debug = self.debug
         self.search_method_params = search_method_params
-        assert search_method in ("smac", "grid", "random")
+        assert search_method in ("smac", "grid", "random", "hyperband", "bohb")
         if search_method in ("grid", "random"):
             initial_runs = 0
         self.initial_runs = initial_runs
@@ -176,7 +253,7 @@ class Tuner(StrSignatureMixin):
         self.ml_task = data_manager.ml_task
 
     def design_initial_configs(self, n_jobs):
-        if self.search_method == "smac":
+        if self.search_method in ("smac", "hyperband", "bohb"):
             return get_random_initial_configs(self.shps, max(self.initial_runs, n_jobs), self.random_state)
         elif self.search_method == "grid":
             return get_grid_initial_configs(self.shps, self.run_limit, self.random_state)
@@ -185,12 +262,72 @@ class Tuner(StrSignatureMixin):
         else:
             raise NotImplementedError
 
+    def is_work_stealing(self) -> bool:
+        return self.work_stealing and self.n_jobs > 1 and self.search_method in ("smac", "random", "grid")
+
     def get_run_limit(self):
-        if self.search_method == "smac":
+        if self.search_method in ("smac", "hyperband", "bohb"):
             return self.run_limit
         else:
             return 0
 
+    def set_deadline(self):
+        '''
+        Start the clock of ``time_left_for_this_task``. It is called before the searching processes are started,
+        so that all of them share the same deadline.
+        '''
+        if self.time_left_for_this_task is None:
+            self.deadline = None
+        else:
+            self.deadline = time.time() + self.time_left_for_this_task * (1 - self.ensemble_time_fraction)
+
+    def get_time_left(self) -> float:
+        if self.deadline is None:
+            return np.inf
+        return self.deadline - time.time()
+
+    def cap_cutoff(self, smac: SMAC4HPO, time_left: float):
+        # the time left caps the time limit of the next trials
+        if np.isfinite(time_left):
+            cutoff = max(math.floor(min(self.per_run_time_limit, time_left)), 1)
+            smac.solver.scenario.cutoff = cutoff
+            smac.solver.intensifier.cutoff = cutoff
+
+    def get_trial_time_left(self) -> float:
+        '''
+        Wall time left for the next trial (inf without ``time_left_for_this_task``), 0 if it can not be started
+        before the deadline: the wall time of a trial is predicted by the mean wall time of the previous trials
+        of the process.
+
+        It is called by the target algorithm runner before each run (see ``build_smac``), including the runs of
+        the initial design and the several runs of an intensification, which cap their time limit by it.
+        '''
+        time_left = self.get_time_left()
+        predicted_time = np.mean(self.trial_times) if self.trial_times else 0
+        if time_left <= 0 or time_left < predicted_time:
+            self.logger.info(f"PID = {os.getpid()} stops searching: {max(time_left, 0):.2f}s left, "
+                             f"a trial is predicted to take {predicted_time:.2f}s.")
+            return 0
+        return time_left
+
+    def start_trial(self, smac: SMAC4HPO) -> bool:
+        '''
+        Whether the next iteration of the search can be started before the deadline of ``time_left_for_this_task``,
+        see ``get_trial_time_left``. If it can, the time limit of its trials is capped by the time left.
+        '''
+        time_left = self.get_trial_time_left()
+        if time_left <= 0:
+            return False
+        self.cap_cutoff(smac, time_left)
+        return True
+
+    def get_budgets(self):
+        min_budget = self.search_method_params.get("min_budget", 1 / 9)
+        eta = self.search_method_params.get("eta", 3)
+        assert 0 < min_budget <= 1 and eta > 1
+        n_budgets = int(math.floor(math.log(1 / min_budget, eta) + 1e-8)) + 1
+        return [eta ** (i - n_budgets + 1) for i in range(n_budgets)]
+
     def run(
             self,
             initial_configs,
@@ -198,20 +335,238 @@ class Tuner(StrSignatureMixin):
             instance_id="",
             rh_db_type="sqlite",
             rh_db_params=frozendict(),
-            rh_db_table_name="runhistory"
+            rh_db_table_name="runhistory",
+            work_queue: Optional[WorkQueue] = None
     ):
         # time.sleep(random.random())
+        if work_queue is not None:
+            smac = self.build_smac([], evaluator_params, instance_id, rh_db_type, rh_db_params, rh_db_table_name)
+            try:
+                self.run_work_queue(smac, work_queue)
+            finally:
+                self.close_smac(smac)
+            return
         if not initial_configs:
             self.logger.warning("Haven't initial_configs. Return.")
             return
+        smac = self.build_smac(initial_configs, evaluator_params, instance_id, rh_db_type, rh_db_params,
+                               rh_db_table_name)
+        try:
+            if self.search_method in ("hyperband", "bohb"):
+                hyperband = Hyperband(
+                    smac.solver,
+                    instances=list(smac.solver.scenario.train_insts),
+                    eta=self.search_method_params.get("eta", 3),
+                    use_model=self.search_method == "bohb"
+                )
+                if not self.start_trial(smac):
+                    return
+                hyperband.run(initial_configs, self.get_run_limit(),
+                              callback=lambda: self.evaluator.resource_manager.delete_models() is not False
+                                               and self.start_trial(smac))
+                return
+            smac.solver.initial_configurations = initial_configs
+            if not self.start_trial(smac):
+                return
+            try:
+                smac.solver.start_()
+            except BudgetExhaustedException:
+                # the first configuration of the initial design could not be started
+                return
+            run_limit = self.get_run_limit()
+            for i in range(run_limit):
+                if not self.start_trial(smac):
+                    break
+                try:
+                    smac.solver.run_()
+                except BudgetExhaustedException:
+                    break
+                should_continue = self.evaluator.resource_manager.delete_models()
+                if not should_continue:
+                    self.logger.info(f"PID = {os.getpid()} is exiting.")
+                    break
+        finally:
+            self.close_smac(smac)
+
+    def run_work_queue(self, smac: SMAC4HPO, work_queue: WorkQueue):
+        '''
+        Pulls trials from ``work_queue``, which is shared with the other searching processes:
+        the initial configurations (as ``(vector, origin)``) are evaluated first, then each run is an iteration
+        of the search.
+        '''
+        smac.solver.stats.start_timing()
+        work_queue.start_worker()
+        while self.start_trial(smac):
+            work = work_queue.get()
+            if work is None:
+                break
+            start_time = time.time()
+            kind, item = work
+            try:
+                if kind == "item":
+                    vector, origin = item
+                    config = Configuration(self.shps, vector=vector)
+                    config.origin = origin
+                    smac.solver.evaluate_([config])
+                else:
+                    smac.solver.run_()
+            except BudgetExhaustedException:
+                self.logger.info(f"Skip {kind} {item}: no time left.")
+            except Exception:
+                self.logger.error(f"Failed to run {kind} {item}:\n{get_trance_back_msg()}")
+            work_queue.record(time.time() - start_time)
+            if not self.evaluator.resource_manager.delete_models():
+                self.logger.info(f"PID = {os.getpid()} is exiting.")
+                break
 
+    def is_batch_mode(self) -> bool:
+        return self.search_method == "smac" and self.n_jobs > 1 and \
+               bool(self.search_method_params.get("batch_size"))
+
+    def run_batch_optimizer(
+            self,
+            initial_configs,
+            proposal_queue,
+            result_queue,
+            n_workers,
+            workers_alive: Optional[Callable[[], bool]] = None,
+            evaluator_params=frozendict(),
+            instance_id="",
+            rh_db_type="sqlite",
+            rh_db_params=frozendict(),
+            rh_db_table_name="runhistory"
+    ):
+        '''
+        Optimizer of the batch mode: keeps the surrogate model and puts the configurations to evaluate in
+        ``proposal_queue``, ``batch_size`` configurations at once (see :meth:`dsmac.optimizer.smbo.SMBO.propose_`).
+        The configurations are evaluated by ``n_workers`` processes running :meth:`run_batch_worker`,
+        which put the ids of the evaluated configurations in ``result_queue``. The optimizer stops if
+        ``workers_alive()`` becomes False while it waits for them.
+
+        A new batch is proposed as soon as ``batch_size`` workers are idle, the configurations which are still
+        being evaluated are fantasized, so that the new batch is spread away from them.
+        '''
+        smac = self.build_smac(initial_configs, evaluator_params, instance_id, rh_db_type, rh_db_params,
+                               rh_db_table_name)
+        smac.solver.stats.start_timing()
+        batch_size = self.search_method_params["batch_size"]
+        liar = self.search_method_params.get("liar", "min")
+        pending = OrderedDict()
+        start_times = {}
+
+        def propose(configs):
+            for config in configs:
+                if config.origin is None:
+                    config.origin = "Initial design"
+                config_id = get_id_of_config(config)
+                pending[config_id] = config
+                start_times[config_id] = time.time()
+                proposal_queue.put((config.get_array(), config.origin))
+
+        propose(initial_configs)
+        run_limit = self.get_run_limit()
+        n_proposed = 0
+        while n_proposed < run_limit:
+            # wait until enough workers are idle
+            while len(pending) > max(n_workers - batch_size, 0):
+                try:
+                    config_id = result_queue.get(timeout=1)
+                    pending.pop(config_id, None)
+                    if config_id in start_times:
+                        self.trial_times.append(time.time() - start_times.pop(config_id))
+                except Empty:
+                    if workers_alive is not None and not workers_alive():
+                        self.logger.error("All the workers exited, stop proposing configurations.")
+                        return
+            time_left = self.get_time_left()
+            if time_left <= 0 or (self.trial_times and time_left < np.mean(self.trial_times)):
+                self.logger.info(f"Stop proposing configurations: {max(time_left, 0):.2f}s left.")
+                break
+            n_configs = min(batch_size, run_limit - n_proposed)
+            propose(smac.solver.propose_(n_configs, list(pending.values()), liar))
+            n_proposed += n_configs
+            self.evaluator.resource_manager.delete_models()
+        for _ in range(n_workers):
+            proposal_queue.put(None)
+        smac.solver.stats.print_stats(debug_out=True)
+
+    def run_batch_worker(
+            self,
+            proposal_queue,
+            result_queue,
+            evaluator_params=frozendict(),
+            instance_id="",
+            rh_db_type="sqlite",
+            rh_db_params=frozendict(),
+            rh_db_table_name="runhistory"
+    ):
+        '''
+        Evaluator of the batch mode: evaluates the configurations of ``proposal_queue`` until it gets ``None``,
+        see :meth:`run_batch_optimizer`.
+        '''
+        smac = self.build_smac([], evaluator_params, instance_id, rh_db_type, rh_db_params, rh_db_table_name)
+        smac.solver.stats.start_timing()
+        while True:
+            proposal = proposal_queue.get()
+            if proposal is None:
+                break
+            vector, origin = proposal
+            config = Configuration(self.shps, vector=vector)
+            config.origin = origin
+            time_left = self.get_time_left()
+            try:
+                if time_left <= 0:
+                    self.logger.info(f"Skip {config}: no time left.")
+                    continue
+                self.cap_cutoff(smac, time_left)
+                smac.solver.evaluate_([config])
+            except BudgetExhaustedException:
+                self.logger.info(f"Skip {config}: no time left.")
+            except Exception:
+                self.logger.error(f"Failed to evaluate {config}:\n{get_trance_back_msg()}")
+            finally:
+                result_queue.put(get_id_of_config(config))
+        self.close_smac(smac)
+
+    def close_smac(self, smac: SMAC4HPO):
+        # a process started by multiprocessing waits for its children when it exits,
+        # the persistent worker of the target algorithm has to be stopped before.
+        tae_runner = smac.get_tae_runner()
+        if isinstance(tae_runner, AbstractTAFunc):
+            tae_runner.close()
+
+    def build_smac(
+            self,
+            initial_configs,
+            evaluator_params=frozendict(),
+            instance_id="",
+            rh_db_type="sqlite",
+            rh_db_params=frozendict(),
+            rh_db_table_name="runhistory"
+    ) -> SMAC4HPO:
         self.evaluator.init_data(**evaluator_params)
+        if self.limit_resource and self.evaluator.resource_manager.async_persistence:
+            # trials are evaluated in child processes which exit as soon as the trial is evaluated,
+            # a background writer in the child would be killed with its queue.
+            self.logger.warning("ResourceManager.async_persistence is not supported if Tuner.limit_resource = True, "
+                                "trials will be persisted synchronously.")
+            self.evaluator.resource_manager.async_persistence = False
+        if self.search_method in ("hyperband", "bohb"):
+            assert not getattr(self.evaluator, "race_folds", False), \
+                "TrainEvaluator.race_folds is not supported by hyperband."
+            # every budget is an instance, so that runhistory records the fidelity of each run
+            instances = [[instance] for instance in self.evaluator.get_budget_instances(instance_id, self.get_budgets())]
+        elif getattr(self.evaluator, "race_folds", False):
+            # every fold is an instance, so intensification can race configurations fold by fold
+            instances = [[instance] for instance in self.evaluator.get_fold_instances(instance_id)]
+        else:
+            instances = [[instance_id]]
         senario_dict = {
             "run_obj": "quality",
             "runcount-limit": 1000,
             "cs": self.shps,  # configuration space
             "deterministic": "true",
-            "instances": [[instance_id]],
+            "instances": instances,
             "cutoff_time": self.per_run_time_limit,
             "memory_limit": self.per_run_memory_limit
             # todo : 如果是local，存在experiment，如果是其他文件系统，不输出smac
@@ -231,14 +586,18 @@ class Tuner(StrSignatureMixin):
             scenario=self.scenario,
             rng=np.random.RandomState(self.random_state),
             tae_runner=self.evaluator,
-            initial_configurations=initial_configs
+            initial_configurations=initial_configs,
+            tae_runner_kwargs={"persistent_worker": self.persistent_worker,
+                               "worker_initializer": getattr(self.evaluator, "disable_memory_caches", None)},
+            runhistory=ColumnarRunHistory if self.search_method_params.get("columnar_runhistory") else None,
+            smbo_kwargs={key: self.search_method_params[key] for key in
+                         ("retrain_every", "retrain_time_fraction", "partial_retrain")
+                         if key in self.search_method_params},
+            acquisition_function_optimizer_kwargs={
+                "array_local_search": self.search_method_params.get("array_local_search", False)}
         )
-        smac.solver.initial_configurations = initial_configs
-        smac.solver.start_()
-        run_limit = self.get_run_limit()
-        for i in range(run_limit):
-            smac.solver.run_()
-            should_continue = self.evaluator.resource_manager.delete_models()
-            if not should_continue:
-                self.logger.info(f"PID = {os.getpid()} is exiting.")
-                break
+        # every run checks the deadline, and its wall time predicts the next ones
+        tae_runner = smac.get_tae_runner()
+        tae_runner.before_run = self.get_trial_time_left
+        tae_runner.after_run = self.trial_times.append
+        return smac
@@ -39,4 +39,18 @@ def binarization(array):
 
 def multilabel_to_multiclass(array):
     array = binarization(array)
-    return np.array([np.nonzero(array[i, :])[0][0] for i in range(len(array))])
\ No newline at end of file
+    return np.array([np.nonzero(array[i, :])[0][0] for i in range(len(array))])
+
+def get_rows_indexer(rows):
+    '''
+    Express contiguous ascending row indexes as a slice, so that indexing returns a view instead of a copy.
+    '''
+    if isinstance(rows, slice):
+        return rows
+    rows = np.asarray(rows)
+    if rows.dtype == bool:
+        rows = np.flatnonzero(rows)
+    rows = rows.astype("int64", copy=False)
+    if rows.size and rows[-1] - rows[0] == rows.size - 1 and np.all(np.diff(rows) == 1):
+        return slice(int(rows[0]), int(rows[-1]) + 1)
+    return rows
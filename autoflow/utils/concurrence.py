@@ -1,4 +1,8 @@
 import multiprocessing as mp
+import os
+import time
+from queue import Empty
+from typing import Dict
 
 
 def parse_n_jobs(n_jobs):
@@ -13,4 +17,73 @@ def parse_n_jobs(n_jobs):
 def get_chunks(iterable, chunks=1):
     # This is from http://stackoverflow.com/a/2136090/2073595
     lst = list(iterable)
-    return [lst[i::chunks] for i in range(chunks)]
\ No newline at end of file
+    return [lst[i::chunks] for i in range(chunks)]
+
+
+class WorkQueue():
+    '''
+    Work shared by the searching processes, pulled one unit at a time by whichever process is idle.
+
+    Work is first the items of the queue (e.g. initial configurations), then ``n_runs`` runs counted by a global
+    counter (e.g. iterations of the search). Queue, counter and the statistics of the workers live in a
+    ``multiprocessing.Manager``, the object is passed to the processes.
+
+    Parameters
+    ----------
+    manager: multiprocessing.managers.SyncManager
+    items: list
+        items put in the queue, they have to be picklable.
+    n_runs: int
+        number of runs after the items.
+    '''
+
+    def __init__(self, manager, items, n_runs):
+        self.items = manager.Queue()
+        for item in items:
+            self.items.put(item)
+        self.n_runs = n_runs
+        self.counter = manager.Value("i", 0)
+        self.lock = manager.Lock()
+        self.workers = manager.dict()
+
+    def get(self):
+        '''
+        Returns
+        -------
+        work: tuple or None
+            ``("item", item)`` while the queue is not empty, then ``("run", index)``, ``None`` if all the work is taken.
+        '''
+        try:
+            return "item", self.items.get_nowait()
+        except Empty:
+            pass
+        with self.lock:
+            index = self.counter.value
+            if index >= self.n_runs:
+                return None
+            self.counter.value = index + 1
+        return "run", index
+
+    def start_worker(self):
+        self.workers[os.getpid()] = {"start": time.time(), "end": time.time(), "n_works": 0, "busy_time": 0.}
+
+    def record(self, busy_time):
+        # every worker only updates its own entry
+        stats = self.workers[os.getpid()]
+        stats["n_works"] += 1
+        stats["busy_time"] += busy_time
+        stats["end"] = time.time()
+        self.workers[os.getpid()] = stats
+
+    def get_utilization(self) -> Dict[int, Dict[str, float]]:
+        '''
+        Statistics of each worker: number of works, busy time, and utilization, i.e. the fraction of the wall time
+        (from the start of the first worker to the end of the last one) the worker was busy.
+        '''
+        workers = dict(self.workers)
+        if not workers:
+            return {}
+        wall_time = max(stats["end"] for stats in workers.values()) - min(stats["start"] for stats in workers.values())
+        return {pid: {"n_works": stats["n_works"], "busy_time": stats["busy_time"],
+                      "utilization": stats["busy_time"] / wall_time if wall_time > 0 else 1.}
+                for pid, stats in workers.items()}
@@ -2,6 +2,7 @@ from typing import Optional, List, Union
 
 import numpy as np
 import pandas as pd
+from pandas.api.types import infer_dtype
 
 
 def pop_if_exists(df: pd.DataFrame, col: str) -> Optional[pd.DataFrame]:
@@ -17,7 +18,15 @@ def rectify_dtypes(df: pd.DataFrame):
     # make sure: only (str, int, float, bool) is valid
     object_columns = get_object_columns(df)
     for object_column in object_columns:
-        if not np.any(df[object_column].apply(lambda x: isinstance(x, str))):
+        # ``infer_dtype`` scans the column in C, ``apply`` is only used for ambiguous columns
+        inferred_dtype = infer_dtype(df[object_column].values, skipna=False)
+        if inferred_dtype == "string":
+            continue
+        elif inferred_dtype in ("floating", "mixed-integer-float"):
+            df[object_column] = df[object_column].astype(float)
+        elif inferred_dtype in ("integer", "boolean", "empty"):
+            df[object_column] = df[object_column].astype(int)
+        elif not np.any(df[object_column].apply(lambda x: isinstance(x, str))):
             if np.any(df[object_column].apply(lambda x: isinstance(x, float))):
                 df[object_column] = df[object_column].astype(float)
             else:
@@ -0,0 +1,100 @@
+import sys
+import tracemalloc
+from time import time, process_time
+from typing import Dict, Any
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+import psutil
+
+
+def get_peak_rss() -> int:
+    '''Peak resident set size of current process, in bytes.'''
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on linux, bytes on macOS
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+    memory_info = psutil.Process().memory_info()
+    return getattr(memory_info, "peak_wset", memory_info.rss)
+
+
+def get_shape(X):
+    shape = getattr(X, "shape", None)
+    return list(shape) if shape is not None else None
+
+
+class AllocationTracer():
+    '''
+    Trace the memory allocated in a ``with`` block by tracemalloc, which also traces NumPy's data buffers.
+
+    Only allocations of current process are traced, and tracing slows down allocations,
+    so it should be opt-in.
+    '''
+
+    def __init__(self):
+        self.stats: Dict[str, int] = {}
+        self.started = False
+        self.start_bytes = 0
+
+    def __enter__(self):
+        self.started = not tracemalloc.is_tracing()
+        if self.started:
+            tracemalloc.start()
+        elif hasattr(tracemalloc, "reset_peak"):  # python >= 3.9
+            tracemalloc.reset_peak()
+        self.start_bytes = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        if self.started:
+            tracemalloc.stop()
+        self.stats = {
+            # peak of memory allocated in the block, over the memory allocated before it
+            "peak_bytes": max(peak_bytes - self.start_bytes, 0),
+            # memory allocated in the block and not freed yet
+            "retained_bytes": current_bytes - self.start_bytes,
+        }
+
+
+class StepProfiler():
+    '''
+    Measure the cost of one step of a pipeline: wall time, CPU time and peak RSS delta.
+
+    CPU time is the time of the whole process, so it includes the threads spawned by the step
+    (and other steps running concurrently in threads).
+    Peak RSS is a high-water mark, its delta is how much the step raised the peak of the process,
+    a step which stays under a former peak has a delta of 0.
+    Overhead is a few system calls, so profiling is always active.
+
+    Parameters
+    ----------
+    name: str
+        name of the step.
+    phase: str
+        ``fit`` or ``predict``.
+    X: array-like
+        input of the step, its shape is recorded.
+    '''
+
+    def __init__(self, name: str, phase: str, X=None):
+        self.stats: Dict[str, Any] = {"name": name, "phase": phase, "input_shape": get_shape(X),
+                                      "output_shape": None}
+
+    def set_output(self, X):
+        self.stats["output_shape"] = get_shape(X)
+
+    def __enter__(self):
+        self.start_time = time()
+        self.start_cpu_time = process_time()
+        self.start_peak_rss = get_peak_rss()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stats.update({
+            "wall_time": time() - self.start_time,
+            "cpu_time": process_time() - self.start_cpu_time,
+            "peak_rss_delta": get_peak_rss() - self.start_peak_rss,
+        })
@@ -1,6 +1,9 @@
+import os
 import pickle
+from typing import Dict, Tuple, Set, Any, List, Type
 
 import peewee as pw
+from playhouse.migrate import SchemaMigrator, migrate
 
 from autoflow.utils.logging import get_logger
 
@@ -23,3 +26,111 @@ class PickleFiled(pw.BitField):
             return pickle.loads(value)
         except Exception as e:
             logger.warning(f"Failed in PickleFiled: \n{e}")
+
+
+# databases shared by the callers of each process, and tables already created
+_databases: Dict[Tuple[int, str, str], pw.Database] = {}
+_created_tables: Set[Tuple[str, str, str]] = set()
+
+
+def get_shared_database(db_type: str, db_params: Dict[str, Any]) -> pw.Database:
+    '''
+    Long-lived database of ``db_params``, shared by all the callers of current process.
+
+    * ``sqlite`` - the database is in WAL journal mode, so that readers do not block the writer,
+      and waits ``timeout`` seconds (default 60) for a lock instead of failing with "database is locked".
+    * ``postgresql``, ``mysql`` - connections are pooled (``playhouse.pool``), ``max_connections``
+      (default 8) and ``stale_timeout`` (default 300 seconds) can be set in ``db_params``.
+
+    Databases are not shared with forked processes, which would share the connections.
+    '''
+    db_params = dict(db_params)
+    key = (os.getpid(), db_type, repr(sorted(db_params.items())))
+    if key in _databases:
+        return _databases[key]
+    if db_type == "sqlite":
+        db_params.setdefault("timeout", 60)
+        pragmas = dict(db_params.pop("pragmas", {}))
+        pragmas.setdefault("journal_mode", "wal")
+        database = pw.SqliteDatabase(pragmas=pragmas, **db_params)
+    elif db_type in ("postgresql", "mysql"):
+        from playhouse.pool import PooledPostgresqlDatabase, PooledMySQLDatabase
+        db_params.setdefault("max_connections", 8)
+        db_params.setdefault("stale_timeout", 300)
+        if db_type == "postgresql":
+            database = PooledPostgresqlDatabase(**db_params)
+        else:
+            database = PooledMySQLDatabase(**db_params)
+    else:
+        raise NotImplementedError
+    _databases[key] = database
+    return database
+
+
+def create_tables_once(database: pw.Database, models: List[Type[pw.Model]]):
+    '''
+    Create the tables of ``models`` which were not created yet by current process (or by its parent before forking).
+    '''
+    host = database.connect_params.get("host", "")
+    models = [model for model in models if (host, database.database, model._meta.table_name) not in _created_tables]
+    if not models:
+        return
+    add_missing_columns(database, models)
+    database.create_tables(models)
+    for model in models:
+        _created_tables.add((host, database.database, model._meta.table_name))
+
+
+def release_shared_database(database: pw.Database):
+    '''
+    Forget the tables created in ``database`` by current process, and close the connection of current thread,
+    when a store closes its tables. The store may be removed before it is opened again (e.g. a temporary store),
+    its tables are then created again, in a new file for ``sqlite``.
+    '''
+    host = database.connect_params.get("host", "")
+    _created_tables.difference_update([key for key in _created_tables if key[:2] == (host, database.database)])
+    # the database connects again on the next query
+    if not database.is_closed() and not database.in_transaction():
+        database.close()
+
+
+def add_missing_columns(database: pw.Database, models: List[Type[pw.Model]]):
+    '''
+    Add the columns of ``models`` which are missing in their existing tables (tables created by an older version
+    of AutoFlow), filled with the default values of the fields. ``create_tables`` never alters an existing table.
+    Columns are added before the tables are created, so that new indexes can be created on them.
+    '''
+    for model in models:
+        table_name = model._meta.table_name
+        if not database.table_exists(table_name):
+            continue
+        columns = {column.name for column in database.get_columns(table_name)}
+        missing = [field for field in model._meta.sorted_fields if field.column_name not in columns]
+        if not missing:
+            continue
+        logger.info(f"Add columns {[field.column_name for field in missing]} to table '{table_name}'.")
+        migrator = SchemaMigrator.from_database(database)
+        for field in missing:
+            try:
+                with database.atomic():
+                    migrate(migrator.add_column(table_name, field.column_name, field))
+            except pw.DatabaseError:
+                # another process added it first
+                if field.column_name not in {column.name for column in database.get_columns(table_name)}:
+                    raise
+
+
+def drop_columns(database: pw.Database, table_name: str, column_names: List[str]):
+    '''
+    Drop the columns ``column_names`` of an existing table, e.g. columns moved to another table.
+    '''
+    logger.info(f"Drop columns {column_names} of table '{table_name}'.")
+    migrator = SchemaMigrator.from_database(database)
+    for column_name in column_names:
+        try:
+            with database.atomic():
+                migrate(migrator.drop_column(table_name, column_name))
+        except pw.DatabaseError:
+            # another process dropped it first
+            if column_name in {column.name for column in database.get_columns(table_name)}:
+                raise
@@ -0,0 +1,191 @@
+import typing
+
+import numpy as np
+from ConfigSpace.conditions import (
+    AndConjunction,
+    EqualsCondition,
+    GreaterThanCondition,
+    InCondition,
+    LessThanCondition,
+    NotEqualsCondition,
+    OrConjunction,
+)
+from ConfigSpace.forbidden import ForbiddenAndConjunction, ForbiddenEqualsClause, ForbiddenInClause
+from ConfigSpace.hyperparameters import (
+    CategoricalHyperparameter,
+    OrdinalHyperparameter,
+    UniformFloatHyperparameter,
+)
+
+from dsmac.configspace import Configuration, ConfigurationSpace
+
+
+class ArrayNeighbourhood(object):
+
+    """One-exchange neighbourhoods of configurations in their vector representation.
+
+    ``get_one_exchange_neighbourhood`` yields the neighbors one ``Configuration`` at a time and checks each of them
+    on its own. Here, all the neighbors of many vectors are generated as the rows of one array: each active
+    hyperparameter is changed to its neighboring values (all the other choices of a categorical, the adjacent
+    values of an ordinal, ``num_neighbors`` gaussian steps in ``[0, 1]`` for numerical hyperparameters).
+    Then, for all the rows at once, the conditional hyperparameters are activated (with their default value)
+    or deactivated (NaN) in topological order, and the rows which match a forbidden clause are dropped.
+
+    Parameters
+    ----------
+    config_space : ~dsmac.configspace.ConfigurationSpace
+    num_neighbors : int
+        Number of neighbors of a numerical hyperparameter
+    stdev : float
+        Standard deviation of the steps of numerical hyperparameters, in the unit interval
+    """
+
+    def __init__(self, config_space: ConfigurationSpace, num_neighbors: int = 8, stdev: float = 0.05):
+        self.config_space = config_space
+        self.num_neighbors = num_neighbors
+        self.stdev = stdev
+        self.hyperparameters = config_space.get_hyperparameters()
+
+        # categorical hyperparameters and (not quantized) uniform floats have their neighbors drawn
+        # for all the vectors at once, the other hyperparameters use ``get_neighbors``
+        self.categoricals = []  # type: typing.List[typing.Tuple[int, int]]
+        self.floats = []  # type: typing.List[int]
+        self.others = []  # type: typing.List[int]
+        for idx, hp in enumerate(self.hyperparameters):
+            if not hp.has_neighbors():
+                continue
+            if isinstance(hp, CategoricalHyperparameter):
+                self.categoricals.append((idx, hp.num_choices))
+            elif isinstance(hp, UniformFloatHyperparameter) and hp.q is None:
+                self.floats.append(idx)
+            else:
+                self.others.append(idx)
+
+        # conditional hyperparameters, in topological order (the order of ``get_hyperparameters``)
+        self.conditionals = []  # type: typing.List[typing.Tuple[int, float, typing.List[int], typing.List]]
+        for idx, hp in enumerate(self.hyperparameters):
+            conditions = config_space.get_parent_conditions_of(hp.name)
+            if not conditions:
+                continue
+            parents = sorted({config_space.get_idx_by_hyperparameter_name(parent.name)
+                              for parent in config_space.get_parents_of(hp.name)})
+            self.conditionals.append((idx, hp.normalized_default_value, parents, conditions))
+        self.forbiddens = config_space.get_forbiddens()
+
+    def get_neighbours(
+            self, vectors: np.ndarray, rng: np.random.RandomState
+    ) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """Valid one-exchange neighbors of each vector.
+
+        Parameters
+        ----------
+        vectors : np.ndarray [n_vectors, n_hyperparameters]
+            Vector representations of configurations (NaN for inactive hyperparameters)
+        rng : np.random.RandomState
+
+        Returns
+        -------
+        neighbours : np.ndarray [n_neighbours, n_hyperparameters]
+            Neighbors of the first vector, then neighbors of the second one, ...
+        origins : np.ndarray [n_neighbours]
+            Index of the vector of each neighbor
+        """
+        vectors = np.atleast_2d(vectors)
+        origins, columns, values = [], [], []
+
+        for idx, num_choices in self.categoricals:
+            current = vectors[:, idx]
+            rows = np.flatnonzero(~np.isnan(current))
+            # all the other choices
+            choices = np.tile(np.arange(num_choices - 1, dtype=np.float64), (rows.size, 1))
+            choices += choices >= current[rows, np.newaxis]
+            origins.append(np.repeat(rows, num_choices - 1))
+            columns.append(np.full(choices.size, idx))
+            values.append(choices.ravel())
+
+        if self.floats:
+            current = vectors[:, self.floats]
+            rows, hps = np.nonzero(~np.isnan(current))
+            # gaussian steps in the unit interval, steps out of it are drawn again
+            # (as ``UniformFloatHyperparameter.get_neighbors``)
+            centers = np.repeat(current[rows, hps], self.num_neighbors)
+            steps = rng.normal(centers, self.stdev)
+            outside = np.flatnonzero((steps < 0) | (steps > 1))
+            while outside.size:
+                steps[outside] = rng.normal(centers[outside], self.stdev)
+                outside = outside[(steps[outside] < 0) | (steps[outside] > 1)]
+            origins.append(np.repeat(rows, self.num_neighbors))
+            columns.append(np.repeat(np.array(self.floats)[hps], self.num_neighbors))
+            values.append(steps)
+
+        for idx in self.others:
+            hp = self.hyperparameters[idx]
+            for row in np.flatnonzero(~np.isnan(vectors[:, idx])):
+                if isinstance(hp, OrdinalHyperparameter):
+                    neighbors = hp.get_neighbors(vectors[row, idx], rng)
+                else:
+                    neighbors = hp.get_neighbors(vectors[row, idx], rng, number=self.num_neighbors, std=self.stdev)
+                origins.append(np.full(len(neighbors), row))
+                columns.append(np.full(len(neighbors), idx))
+                values.append(np.asarray(neighbors, dtype=np.float64))
+
+        if not origins:
+            return np.zeros((0, vectors.shape[1])), np.zeros(0, dtype=np.int64)
+        origins = np.concatenate(origins).astype(np.int64)
+        order = np.argsort(origins, kind="stable")
+        origins = origins[order]
+        neighbours = vectors[origins]
+        neighbours[np.arange(origins.size), np.concatenate(columns)[order]] = np.concatenate(values)[order]
+        self.impute_conditions(neighbours)
+        valid = ~self.is_forbidden(neighbours)
+        return neighbours[valid], origins[valid]
+
+    def impute_conditions(self, X: np.ndarray) -> np.ndarray:
+        """Activate (with the default value) or deactivate (with NaN) the conditional hyperparameters of each row,
+        given the values of their parents. ``X`` is modified in place and returned."""
+        for idx, default, parents, conditions in self.conditionals:
+            active = ~np.isnan(X[:, parents]).any(axis=1)
+            for condition in conditions:
+                active &= self._evaluate_condition(condition, X)
+            column = X[:, idx]
+            column[active & np.isnan(column)] = default
+            column[~active] = np.nan
+        return X
+
+    def is_forbidden(self, X: np.ndarray) -> np.ndarray:
+        """Whether each row matches one of the forbidden clauses, inactive hyperparameters never match."""
+        forbidden = np.zeros(X.shape[0], dtype=bool)
+        for clause in self.forbiddens:
+            forbidden |= self._evaluate_forbidden(clause, X)
+        return forbidden
+
+    def to_configurations(self, X: np.ndarray) -> typing.List[Configuration]:
+        return [Configuration(self.config_space, vector=x) for x in X]
+
+    def _evaluate_condition(self, condition, X: np.ndarray) -> np.ndarray:
+        if isinstance(condition, AndConjunction):
+            return np.logical_and.reduce([self._evaluate_condition(c, X) for c in condition.components])
+        if isinstance(condition, OrConjunction):
+            return np.logical_or.reduce([self._evaluate_condition(c, X) for c in condition.components])
+        # comparisons with NaN (inactive parents) are False, the parents are checked by the caller
+        values = X[:, condition.parent_vector_id]
+        if isinstance(condition, EqualsCondition):
+            return values == condition.vector_value
+        if isinstance(condition, NotEqualsCondition):
+            return values != condition.vector_value
+        if isinstance(condition, InCondition):
+            return np.isin(values, condition.vector_values)
+        if isinstance(condition, GreaterThanCondition):
+            return values > condition.vector_value
+        if isinstance(condition, LessThanCondition):
+            return values < condition.vector_value
+        return np.array([bool(condition.evaluate_vector(x)) for x in X], dtype=bool)
+
+    def _evaluate_forbidden(self, clause, X: np.ndarray) -> np.ndarray:
+        if isinstance(clause, ForbiddenAndConjunction):
+            return np.logical_and.reduce([self._evaluate_forbidden(c, X) for c in clause.components])
+        if isinstance(clause, ForbiddenEqualsClause):
+            return X[:, clause.vector_id] == clause.vector_value
+        if isinstance(clause, ForbiddenInClause):
+            return np.isin(X[:, clause.vector_id], list(clause.vector_values))
+        return np.array([bool(clause.is_forbidden_vector(x, False)) for x in X], dtype=bool)
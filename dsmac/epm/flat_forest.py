@@ -0,0 +1,212 @@
+import math
+import typing
+
+import numpy as np
+from pyrfr import regression
+
+from dsmac.utils.constants import VERY_SMALL_NUMBER
+
+
+class FlatForest(object):
+
+    """Trees of a fitted pyrfr forest, flattened into NumPy arrays.
+
+    pyrfr only predicts one feature vector per call, so predicting the thousands of neighbors
+    of a local search is dominated by the Python loop around the native calls. Here, the nodes
+    of all the trees are exported once after training, and all the rows are routed through all the
+    trees together, one tree level per step, with vectorized lookups.
+
+    Rows fall into the same leaves as in pyrfr: numerical features go to the left child if
+    ``x <= split value``, categorical features go to the left child if ``x`` is in the categorical split.
+    Means and variances are computed with the same running statistics as pyrfr, so that
+    ``predict_mean_var`` returns exactly the values of ``binary_rss_forest.predict_mean_var``
+    for a fitted forest (a local search compares acquisition values for equality to walk on plateaus).
+    After ``pseudo_update``, values agree up to floating point rounding.
+
+    Attributes
+    ----------
+    num_trees : int
+    roots : np.ndarray [num_trees]
+        Index of the root node of each tree
+    feature : np.ndarray [n_nodes]
+    threshold : np.ndarray [n_nodes]
+        Numerical split value, NaN for categorical splits
+    children : np.ndarray [2 * n_nodes]
+        Left children of all the nodes, then their right children, leaves are their own children
+    is_categorical : np.ndarray [n_nodes]
+    cat_left : np.ndarray [n_nodes, n_categories] or None
+        Whether a category goes to the left child, None if there is no categorical split
+    max_depth : int
+    leaf_mean : np.ndarray [n_nodes]
+        Weighted mean of the responses in each leaf, as the leaf statistic of pyrfr
+    leaf_log_mean : np.ndarray [n_nodes]
+        ``log(mean(exp(responses)))`` of each leaf, for ``log_y``
+    leaf_count, leaf_sum, leaf_exp_sum : np.ndarray [n_nodes]
+        Number, sum and sum of ``exp`` of the (unweighted) responses in each leaf, as ``all_leaf_values``
+    """
+
+    def __init__(self, rf: regression.binary_rss_forest):
+        # the tuple owns the trees, it is kept alive while the nodes are read
+        trees = rf.get_all_trees()
+        self.num_trees = len(trees)
+        n_nodes = sum(tree.number_of_nodes() for tree in trees)
+        self.roots = np.empty(self.num_trees, dtype=np.int64)
+        self.feature = np.zeros(n_nodes, dtype=np.int64)
+        self.threshold = np.full(n_nodes, np.inf)
+        children = np.empty((2, n_nodes), dtype=np.int64)
+        depth = np.zeros(n_nodes, dtype=np.int64)
+        self.leaf_mean = np.zeros(n_nodes)
+        cat_splits = {}  # type: typing.Dict[int, typing.List[float]]
+        leaves = []  # type: typing.List[int]
+        counts = []  # type: typing.List[int]
+        responses = []  # type: typing.List[float]
+
+        offset = 0
+        for tree_id, tree in enumerate(trees):
+            self.roots[tree_id] = offset
+            for node_id in range(tree.number_of_nodes()):
+                node = tree.get_node(node_id)
+                index = offset + node_id
+                depth[index] = node.get_depth()
+                if node.is_a_leaf():
+                    children[:, index] = index
+                    leaf_responses = node.responses()
+                    # weighted running mean, as ``weighted_running_statistics`` of pyrfr
+                    mean_, sum_of_weights = 0., 0.
+                    for response, weight in zip(leaf_responses, node.weights()):
+                        sum_of_weights += weight
+                        mean_ += (response - mean_) * weight / sum_of_weights
+                    self.leaf_mean[index] = mean_
+                    leaves.append(index)
+                    counts.append(len(leaf_responses))
+                    responses.extend(leaf_responses)
+                    continue
+                self.feature[index] = node.get_feature_index()
+                self.threshold[index] = node.get_num_split_value()
+                children[0, index] = offset + node.get_child_index(0)
+                children[1, index] = offset + node.get_child_index(1)
+                if math.isnan(self.threshold[index]):
+                    cat_splits[index] = list(node.get_cat_split())
+            offset += tree.number_of_nodes()
+
+        # statistics of the unweighted responses, as ``all_leaf_values``, computed for all the leaves at once
+        self.leaf_count = np.zeros(n_nodes)
+        self.leaf_sum = np.zeros(n_nodes)
+        self.leaf_exp_sum = np.zeros(n_nodes)
+        self.leaf_log_mean = np.zeros(n_nodes)
+        if leaves:
+            leaves = np.array(leaves)
+            counts = np.array(counts)
+            # responses of each leaf in a row padded with NaN, reduced as the ``log_y`` branch of
+            # ``RandomForestWithInstances._predict`` does, so that rounding is the same
+            rows = np.repeat(np.arange(len(leaves)), counts)
+            columns = np.arange(rows.size) - np.repeat(np.cumsum(counts) - counts, counts)
+            padded = np.full((len(leaves), counts.max()), np.nan)
+            padded[rows, columns] = responses
+            exp_padded = np.exp(padded)
+            self.leaf_count[leaves] = counts
+            self.leaf_sum[leaves] = np.nansum(padded, axis=1)
+            self.leaf_exp_sum[leaves] = np.nansum(exp_padded, axis=1)
+            self.leaf_log_mean[leaves] = np.log(np.nanmean(exp_padded, axis=1) + VERY_SMALL_NUMBER)
+        self.children = children.ravel()
+        self.max_depth = int(depth.max()) if n_nodes else 0
+
+        self.is_categorical = np.isnan(self.threshold)
+        self.cat_left = None
+        if cat_splits:
+            n_categories = int(max(max(split, default=0) for split in cat_splits.values())) + 1
+            self.cat_left = np.zeros((n_nodes, n_categories), dtype=bool)
+            for index, split in cat_splits.items():
+                self.cat_left[index, np.array(split, dtype=np.int64)] = True
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Leaf of each row in each tree.
+
+        Parameters
+        ----------
+        X : np.ndarray [n_samples, n_features]
+            Imputed input data points
+
+        Returns
+        -------
+        leaves : np.ndarray [n_samples, num_trees]
+        """
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        n_nodes = self.feature.size
+        # flat indexes of the first feature of each (row, tree) and of the current nodes
+        row_offsets = np.repeat(np.arange(X.shape[0]) * X.shape[1], self.num_trees)
+        nodes = np.tile(self.roots, X.shape[0])
+        X = X.ravel()
+        for _ in range(self.max_depth):
+            values = X.take(row_offsets + self.feature.take(nodes))
+            go_right = ~(values <= self.threshold.take(nodes))
+            if self.cat_left is not None:
+                categorical = np.flatnonzero(self.is_categorical.take(nodes))
+                if categorical.size:
+                    categories = values[categorical]
+                    codes = np.clip(categories, 0, self.cat_left.shape[1] - 1).astype(np.int64)
+                    # categories which are not in the split (e.g. imputed values) go to the right child
+                    go_left = self.cat_left[nodes[categorical], codes] & (categories == codes)
+                    go_right[categorical] = ~go_left
+            nodes = self.children.take(go_right * n_nodes + nodes)
+        return nodes.reshape((-1, self.num_trees))
+
+    def predict_mean_var(self, X: np.ndarray, log_y: bool = False) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """Mean and variance across trees of the leaf predictions of each row.
+
+        Parameters
+        ----------
+        X : np.ndarray [n_samples, n_features]
+            Imputed input data points
+        log_y : bool
+            If True, each leaf predicts ``log(mean(exp(responses)))``, and variance is the population variance,
+            as the ``log_y`` branch of ``RandomForestWithInstances._predict``; otherwise mean and
+            (sample) variance are the ones of ``binary_rss_forest.predict_mean_var``.
+
+        Returns
+        -------
+        means : np.ndarray [n_samples]
+        vars : np.ndarray [n_samples]
+        """
+        leaves = self.apply(X)
+        if log_y:
+            preds = self.leaf_log_mean[leaves]
+            return preds.mean(axis=1), preds.var(axis=1)
+        # Welford's algorithm over the trees, as ``running_statistics`` of pyrfr
+        preds = self.leaf_mean[leaves]
+        means = preds[:, 0].copy()
+        sdm = np.zeros(X.shape[0])
+        for tree_id in range(1, self.num_trees):
+            delta = preds[:, tree_id] - means
+            means += delta / (tree_id + 1)
+            sdm += delta * (preds[:, tree_id] - means)
+        if self.num_trees < 2:
+            return means, sdm
+        return means, sdm / (self.num_trees - 1)
+
+    def predict_marginalized_over_instances(
+            self, X: np.ndarray, instance_features: np.ndarray, log_y: bool = False
+    ) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """Mean and variance across trees of the leaf values pooled over all instances.
+
+        Parameters
+        ----------
+        X : np.ndarray [n_samples, n_features (config)]
+            Imputed configurations
+        instance_features : np.ndarray [n_instances, n_features (instance)]
+        log_y : bool
+
+        Returns
+        -------
+        means : np.ndarray [n_samples]
+        vars : np.ndarray [n_samples]
+        """
+        n_instances = instance_features.shape[0]
+        X_ = np.hstack([np.repeat(X, n_instances, axis=0), np.tile(instance_features, (X.shape[0], 1))])
+        leaves = self.apply(X_).reshape((X.shape[0], n_instances, self.num_trees))
+        counts = self.leaf_count[leaves].sum(axis=1)
+        if log_y:
+            preds = np.log(self.leaf_exp_sum[leaves].sum(axis=1) / counts)
+        else:
+            preds = self.leaf_sum[leaves].sum(axis=1) / counts
+        return preds.mean(axis=1), preds.var(axis=1)
@@ -6,6 +6,7 @@ from pyrfr import regression
 
 from dsmac.configspace import ConfigurationSpace
 from dsmac.epm.base_rf import BaseModel
+from dsmac.epm.flat_forest import FlatForest
 from dsmac.utils.constants import N_TREES, VERY_SMALL_NUMBER
 
 
@@ -31,6 +32,9 @@ class RandomForestWithInstances(BaseModel):
     hypers: list
         List of random forest hyperparameters
     unlog_y: bool
+    batch_predict: bool
+    flat_forest : FlatForest
+        Arrays of the trees of ``rf``, built on the first batch prediction after training
     seed : int
     types : np.ndarray
     bounds : list
@@ -38,6 +42,9 @@ class RandomForestWithInstances(BaseModel):
     logger : logging.logger
     """
 
+    # below this number of rows, a pyrfr call per row is faster than walking the flattened trees
+    min_batch_rows = 64
+
     def __init__(
         self,
         configspace: ConfigurationSpace,
@@ -54,6 +61,7 @@ class RandomForestWithInstances(BaseModel):
         max_depth: int = 2**20,
         eps_purity: float = 1e-8,
         max_num_nodes: int = 2**20,
+        batch_predict: bool = True,
         **kwargs
     ):
         """
@@ -92,6 +100,10 @@ class RandomForestWithInstances(BaseModel):
             different
         max_num_nodes : int
             The maxmimum total number of nodes in a tree
+        batch_predict : bool
+            Predict all the rows of X at once, with the trees flattened into NumPy arrays
+            (see :class:`~dsmac.epm.flat_forest.FlatForest`), instead of one pyrfr call per row.
+            Batches of less than ``min_batch_rows`` rows are still predicted by pyrfr.
         """
         super().__init__(configspace, types, bounds, seed, **kwargs)
 
@@ -113,6 +125,8 @@ class RandomForestWithInstances(BaseModel):
 
         self.n_points_per_tree = n_points_per_tree
         self.rf = None  # type: regression.binary_rss_forest
+        self.batch_predict = batch_predict
+        self.flat_forest = None  # type: typing.Optional[FlatForest]
 
         # This list well be read out by save_iteration() in the solver
         self.hypers = [num_trees, max_num_nodes, do_bootstrapping,
@@ -148,8 +162,46 @@ class RandomForestWithInstances(BaseModel):
         self.rf.options = self.rf_opts
         data = self._init_data_container(self.X, self.y)
         self.rf.fit(data, rng=self.rng)
+        self.flat_forest = None
+        return self
+
+    def partial_train(self, X: np.ndarray, Y: np.ndarray) -> 'RandomForestWithInstances':
+        """Adds new data points to the trained forest, without growing its trees again.
+
+        Each point is added to the leaf it falls into in every tree (``pseudo_update`` of pyrfr),
+        so the splits are the ones learnt on the data of the last call to ``train``.
+        It is much cheaper than ``train``, and meant to be used between two calls to it.
+
+        Parameters
+        ----------
+        X : np.ndarray [n_samples, n_features (config + instance features)]
+            New input data points.
+        Y : np.ndarray [n_samples, 1]
+            The corresponding target values.
+
+        Returns
+        -------
+        self
+        """
+        if self.rf is None:
+            return self.train(X, Y)
+        if self.pca and hasattr(self.pca, "components_"):
+            X_feats = np.nan_to_num(self.scaler.transform(X[:, -self.n_feats:]))
+            X = np.hstack((X[:, :self.n_params], self.pca.transform(X_feats)))
+        X = self._impute_inactive(X)
+        y = Y.flatten()
+        for row_X, row_y in zip(X.tolist(), y.tolist()):
+            self.rf.pseudo_update(row_X, row_y, 1.)
+        self.X = np.vstack((self.X, X))
+        self.y = np.concatenate((self.y, y))
+        self.flat_forest = None
         return self
 
+    def _get_flat_forest(self) -> FlatForest:
+        if self.flat_forest is None:
+            self.flat_forest = FlatForest(self.rf)
+        return self.flat_forest
+
     def _init_data_container(self, X: np.ndarray, y: np.ndarray):
         """Fills a pyrfr default data container, s.t. the forest knows
         categoricals and bounds for continous data
@@ -175,7 +227,8 @@ class RandomForestWithInstances(BaseModel):
             else:
                 data.set_bounds_of_feature(i, mn, mx)
 
-        for row_X, row_y in zip(X, y):
+        # lists are converted to std::vector faster than rows of an array
+        for row_X, row_y in zip(X.tolist(), y.tolist()):
             data.add_data_point(row_X, row_y)
         return data
 
@@ -202,7 +255,9 @@ class RandomForestWithInstances(BaseModel):
 
         X = self._impute_inactive(X)
 
-        if self.log_y:
+        if self.batch_predict and X.shape[0] >= self.min_batch_rows:
+            means, vars_ = self._get_flat_forest().predict_mean_var(X, log_y=self.log_y)
+        elif self.log_y:
             all_preds = []
             third_dimension = 0
 
@@ -281,6 +336,12 @@ class RandomForestWithInstances(BaseModel):
 
         X = self._impute_inactive(X)
 
+        if self.batch_predict:
+            mean_, var = self._get_flat_forest().predict_marginalized_over_instances(
+                X, self.instance_features, log_y=self.log_y)
+            var[var < self.var_threshold] = self.var_threshold
+            return mean_.reshape((-1, 1)), var.reshape((-1, 1))
+
         mean_ = np.zeros(X.shape[0])
         var = np.zeros(X.shape[0])
         for i, x in enumerate(X):
@@ -179,6 +179,7 @@ class RandomForestWithInstancesHPO(RandomForestWithInstances):
         self.rf.options = self.rf_opts
         data = self._init_data_container(self.X, self.y)
         self.rf.fit(data, rng=self.rng)
+        self.flat_forest = None
 
         return self
 
@@ -91,6 +91,7 @@ class SMAC4AC(object):
                  restore_incumbent: Optional[Configuration] = None,
                  rng: Optional[Union[np.random.RandomState, int]] = None,
                  smbo_class: Optional[SMBO] = None,
+                 smbo_kwargs: Optional[dict] = None,
                  run_id: Optional[int] = None,
                  random_configuration_chooser: Optional[Type[RandomConfigurationChooser]] = None,
                  random_configuration_chooser_kwargs: Optional[dict] = None,
@@ -165,6 +166,8 @@ class SMAC4AC(object):
         smbo_class : ~dsmac.optimizer.smbo.SMBO
             Class implementing the SMBO interface which will be used to
             instantiate the optimizer class.
+        smbo_kwargs : Optional[dict]
+            arguments passed to constructor of '~smbo_class', e.g. the retraining policy of the model
         run_id : int (optional)
             Run ID will be used as subfolder for output_dir. If no ``run_id`` is given, a random ``run_id`` will be
             chosen.
@@ -226,8 +229,8 @@ class SMAC4AC(object):
         runhistory_def_kwargs = {'aggregate_func': aggregate_func}
         if runhistory_kwargs is not None:
             runhistory_def_kwargs.update(runhistory_kwargs)
-        if runhistory is None:
-            runhistory = RunHistory(
+        if runhistory is None or inspect.isclass(runhistory):
+            runhistory = (runhistory or RunHistory)(
                 **runhistory_def_kwargs,
                 config_space=self.scenario.cs,
                 file_system=scenario.file_system,
@@ -235,8 +238,6 @@ class SMAC4AC(object):
                 db_params=scenario.db_params,
                 db_table_name=scenario.db_table_name
             )
-        elif inspect.isclass(runhistory):
-            runhistory = runhistory(**runhistory_def_kwargs)
         else:
             if runhistory.aggregate_func is None:
                 runhistory.aggregate_func = aggregate_func
@@ -535,6 +536,8 @@ class SMAC4AC(object):
             'restore_incumbent': restore_incumbent,
             'random_configuration_chooser': random_configuration_chooser
         }
+        if smbo_kwargs is not None:
+            smbo_args.update(smbo_kwargs)
 
         if smbo_class is None:
             self.solver = SMBO(**smbo_args)
@@ -0,0 +1,140 @@
+import logging
+import math
+import typing
+
+import numpy as np
+
+from dsmac.configspace import Configuration
+from dsmac.optimizer.smbo import SMBO
+from dsmac.tae.execute_ta_run import BudgetExhaustedException, StatusType
+
+
+class Hyperband(object):
+    """Hyperband (Li et al. 2017) on top of a SMBO object, and BOHB (Falkner et al. 2018) if ``use_model``.
+
+    Budgets are represented by instances, every run of a configuration on a budget is a run
+    on the corresponding instance, so that the runhistory records the fidelity of each run.
+
+    Parameters
+    ----------
+    solver: SMBO
+        provides tae_runner, runhistory, stats and (for BOHB) the surrogate model
+    instances: typing.List[str]
+        instances ordered by increasing budget, consecutive budgets differ by factor ``eta``
+    eta: float
+        only top ``1 / eta`` configurations of a stage are promoted to the next budget
+    use_model: bool
+        sample configurations by the EPM trained on the largest budget which has enough runs (BOHB),
+        instead of sampling them randomly
+    min_points_in_model: int
+        minimum number of runs on a budget to train the EPM on it, number of hyperparameters + 1 by default
+    """
+
+    def __init__(self, solver: SMBO, instances: typing.List[str], eta: float = 3,
+                 use_model: bool = False, min_points_in_model: int = None):
+        self.logger = logging.getLogger(
+            self.__module__ + "." + self.__class__.__name__)
+        self.solver = solver
+        self.runhistory = solver.runhistory
+        self.tae_runner = solver.intensifier.tae_runner
+        self.config_space = solver.config_space
+        self.instances = list(instances)
+        self.eta = eta
+        self.use_model = use_model
+        if min_points_in_model is None:
+            min_points_in_model = len(self.config_space.get_hyperparameters()) + 1
+        self.min_points_in_model = min_points_in_model
+        self.s_max = len(self.instances) - 1
+        self.n_runs = 0
+
+    def run(self, initial_configurations: typing.List[Configuration] = None, run_limit: int = 100,
+            callback: typing.Callable = None):
+        """Runs brackets of successive halving until ``run_limit`` target algorithm runs are done.
+
+        Parameters
+        ----------
+        initial_configurations: typing.List[Configuration]
+            configurations to start with, before sampling new ones
+        run_limit: int
+            maximum number of target algorithm runs
+        callback: typing.Callable
+            called after each run, stop running if it returns False
+        """
+        self.solver.stats.start_timing()
+        self.runhistory.db.fetch_new_runhistory(True)
+        pending_configs = list(initial_configurations or [])
+        self.n_runs = 0
+        s = self.s_max
+        try:
+            while self.n_runs < run_limit:
+                n_configs = int(math.ceil((self.s_max + 1) / (s + 1) * self.eta ** s))
+                configs = pending_configs[:n_configs]
+                pending_configs = pending_configs[n_configs:]
+                configs += self.sample_configurations(n_configs - len(configs), self.instances[self.s_max - s])
+                if not self.successive_halving(configs, s, run_limit, callback):
+                    break
+                # s_max, s_max - 1, ..., 0, s_max, ...
+                s = s - 1 if s > 0 else self.s_max
+        except BudgetExhaustedException:
+            self.logger.debug("Budget exhausted; stop Hyperband")
+
+    def successive_halving(self, configs: typing.List[Configuration], s: int, run_limit: int,
+                           callback: typing.Callable = None) -> bool:
+        n_configs = len(configs)
+        for i in range(s + 1):
+            instance = self.instances[self.s_max - s + i]
+            self.logger.info(f"Successive halving: evaluate {len(configs)} configurations on instance '{instance}'.")
+            costs = []
+            for config in configs:
+                if self.n_runs >= run_limit:
+                    return False
+                costs.append(self.get_cost(config, instance))
+                if callback is not None and callback() is False:
+                    return False
+            n_promoted = int(math.floor(n_configs * self.eta ** (-i - 1)))
+            if i == s or n_promoted < 1:
+                break
+            configs = [configs[ix] for ix in np.argsort(costs, kind="stable")[:n_promoted]]
+        return True
+
+    def get_cost(self, config: Configuration, instance: str) -> float:
+        self.runhistory.db.fetch_new_runhistory(False)
+        # maybe evaluated by another worker
+        cost = self.runhistory.get_instance_costs_for_config(config).get(instance)
+        if cost is not None:
+            return cost
+        status, cost, _, _ = self.tae_runner.start(
+            config=config, instance=instance, seed=0, cutoff=self.solver.intensifier.cutoff,
+            instance_specific="0")
+        self.n_runs += 1
+        if status != StatusType.SUCCESS:
+            return np.inf
+        return cost
+
+    def sample_configurations(self, n_configs: int, instance: str) -> typing.List[Configuration]:
+        configs = []
+        if n_configs <= 0:
+            return configs
+        challengers = self.get_model_challengers() if self.use_model else None
+        if challengers is not None:
+            for config in challengers:
+                if len(configs) >= n_configs:
+                    break
+                if config in configs or instance in self.runhistory.get_instance_costs_for_config(config):
+                    continue
+                configs.append(config)
+        while len(configs) < n_configs:
+            config = self.config_space.sample_configuration()
+            config.origin = "Random Search"
+            configs.append(config)
+        return configs
+
+    def get_model_challengers(self):
+        self.runhistory.db.fetch_new_runhistory(False)
+        # EPM is trained on runs of only one budget, the largest one which has enough runs
+        for instance in reversed(self.instances):
+            X, Y = self.solver.rh2EPM.transform(self.runhistory, instances=[instance])
+            if X.shape[0] >= self.min_points_in_model:
+                self.logger.debug(f"Sample configurations by EPM trained on {X.shape[0]} runs of '{instance}'.")
+                return self.solver.choose_next(X, Y, incumbent_value=float(np.min(Y)))
+        return None
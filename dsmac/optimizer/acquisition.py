@@ -1,7 +1,8 @@
 # encoding=utf8
 import abc
 import copy
-from typing import List
+import time
+from typing import List, Union
 
 import numpy as np
 from scipy.stats import norm
@@ -23,8 +24,12 @@ class AbstractAcquisitionFunction(object, metaclass=abc.ABCMeta):
     ----------
     model
     logger
+    compute_time : float
+        Total time spent in ``_compute`` (mostly predictions of the model)
     """
 
+    compute_time = 0.
+
     def __str__(self):
         return type(self).__name__ + " (" + self.long_name + ")"
 
@@ -56,25 +61,31 @@ class AbstractAcquisitionFunction(object, metaclass=abc.ABCMeta):
         for key in kwargs:
             setattr(self, key, kwargs[key])
 
-    def __call__(self, configurations: List[Configuration]):
+    def __call__(self, configurations: Union[List[Configuration], np.ndarray]):
         """Computes the acquisition value for a given X
 
         Parameters
         ----------
-        configurations : list
+        configurations : list or np.ndarray
             The configurations where the acquisition function
-            should be evaluated.
+            should be evaluated, or their vector representations
+            (e.g. the neighbors of an array-space local search).
 
         Returns
         -------
         np.ndarray(N, 1)
             acquisition values for X
         """
-        X = convert_configurations_to_array(configurations)
+        if isinstance(configurations, np.ndarray):
+            X = configurations
+        else:
+            X = convert_configurations_to_array(configurations)
         if len(X.shape) == 1:
             X = X[np.newaxis, :]
 
+        start_time = time.time()
         acq = self._compute(X)
+        self.compute_time += time.time() - start_time
         if np.any(np.isnan(acq)):
             idx = np.where(np.isnan(acq))[0]
             acq[idx, :] = -np.finfo(np.float).max
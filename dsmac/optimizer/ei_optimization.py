@@ -12,6 +12,7 @@ from dsmac.configspace import (
     ConfigurationSpace,
     convert_configurations_to_array,
 )
+from dsmac.configspace.array_neighbourhood import ArrayNeighbourhood
 from dsmac.runhistory.runhistory import RunHistory
 from dsmac.stats.stats import Stats
 from dsmac.optimizer.acquisition import AbstractAcquisitionFunction
@@ -433,6 +434,112 @@ class LocalSearch(AcquisitionFunctionMaximizer):
         return [(a, i) for a, i in zip(acq_val_incumbents, incumbents)]
 
 
+class ArrayLocalSearch(LocalSearch):
+
+    """SMAC's local search on the vector representation of the configurations.
+
+    ``LocalSearch`` draws the neighbors of each incumbent one ``Configuration`` at a time, and converts them back to
+    arrays for the acquisition function. Here, the whole one-exchange neighbourhood of every running local search
+    is generated as an array (see :class:`~dsmac.configspace.array_neighbourhood.ArrayNeighbourhood`), and the
+    acquisition function is evaluated once per step, on the neighbors of all the running local searches.
+    As the whole neighbourhood is evaluated anyway, a local search moves to its best neighbor (ties are broken at
+    random) instead of the first improving one. Only the final incumbents are converted to ``Configuration``.
+
+    Parameters
+    ----------
+    acquisition_function : ~dsmac.optimizer.acquisition.AbstractAcquisitionFunction
+
+    config_space : ~dsmac.configspace.ConfigurationSpace
+
+    rng : np.random.RandomState or int, optional
+
+    max_steps: int
+        Maximum number of steps of each local search, unlimited if None
+
+    n_steps_plateau_walk: int
+        number of steps during a plateau walk before local search terminates
+
+    num_neighbors: int
+        Number of neighbors of a numerical hyperparameter
+
+    stdev: float
+        Standard deviation of the steps of numerical hyperparameters, in the unit interval
+
+    """
+
+    def __init__(
+            self,
+            acquisition_function: AbstractAcquisitionFunction,
+            config_space: ConfigurationSpace,
+            rng: Union[bool, np.random.RandomState] = None,
+            max_steps: Optional[int] = None,
+            n_steps_plateau_walk: int = 10,
+            num_neighbors: int = 8,
+            stdev: float = 0.05,
+    ):
+        super().__init__(acquisition_function, config_space, rng, max_steps, n_steps_plateau_walk)
+        self.neighbourhood = ArrayNeighbourhood(config_space, num_neighbors=num_neighbors, stdev=stdev)
+
+    def _do_search(
+            self,
+            start_points: List[Configuration],
+            **kwargs
+    ) -> List[Tuple[float, Configuration]]:
+
+        if isinstance(start_points, Configuration):
+            start_points = [start_points]
+        num_incumbents = len(start_points)
+        if num_incumbents == 0:
+            return []
+        incumbents = convert_configurations_to_array(start_points)
+        acq_val_incumbents = self.acquisition_function(incumbents, **kwargs)[:, 0].copy()
+
+        # whether the i-th local search is still running
+        active = np.ones(num_incumbents, dtype=bool)
+        # number of plateau walks of the i-th local search, reaching the maximum number stops the local search
+        n_no_plateau_walk = np.zeros(num_incumbents, dtype=np.int64)
+        local_search_steps = np.zeros(num_incumbents, dtype=np.int64)
+        neighbors_looked_at = np.zeros(num_incumbents, dtype=np.int64)
+        times = []
+
+        while np.any(active):
+            running = np.flatnonzero(active)
+            neighbors, origins = self.neighbourhood.get_neighbours(incumbents[running], self.rng)
+            offsets = np.searchsorted(origins, np.arange(running.size + 1))
+            acq_val = np.zeros(0)
+            if len(neighbors) != 0:
+                start_time = time.time()
+                acq_val = self.acquisition_function(neighbors, **kwargs)[:, 0]
+                times.append(time.time() - start_time)
+
+            for i, start, end in zip(running, offsets[:-1], offsets[1:]):
+                local_search_steps[i] += 1
+                neighbors_looked_at[i] += end - start
+                acq_val_neighbors = acq_val[start:end]
+                best = acq_val_neighbors.max() if end > start else -np.inf
+                if best > acq_val_incumbents[i]:
+                    candidates = np.flatnonzero(acq_val_neighbors == best)
+                    incumbents[i] = neighbors[start + self.rng.choice(candidates)]
+                    acq_val_incumbents[i] = best
+                elif n_no_plateau_walk[i] < self.n_steps_plateau_walk:
+                    # walk to a neighbor with an equal acquisition value, if there is one
+                    candidates = np.flatnonzero(acq_val_neighbors == acq_val_incumbents[i])
+                    if candidates.size != 0:
+                        incumbents[i] = neighbors[start + self.rng.choice(candidates)]
+                    n_no_plateau_walk[i] += 1
+                if n_no_plateau_walk[i] >= self.n_steps_plateau_walk or (
+                        self.max_steps is not None and local_search_steps[i] >= self.max_steps):
+                    active[i] = False
+
+        self.logger.debug(
+            "Local searches took %s steps and looked at %s configurations. Computing the acquisition function in "
+            "vectorized for took %f seconds on average.",
+            local_search_steps, neighbors_looked_at, np.mean(times) if times else 0.,
+        )
+
+        return [(a, i) for a, i in zip(acq_val_incumbents.tolist(), self.neighbourhood.to_configurations(incumbents))]
+
+
 class DiffOpt(AcquisitionFunctionMaximizer):
     """Get candidate solutions via DifferentialEvolutionSolvers.
 
@@ -583,6 +690,9 @@ class InterleavedLocalAndRandomSearch(AcquisitionFunctionMaximizer):
     n_sls_iterations: int
         [Local Search] number of local search iterations
 
+    array_local_search: bool
+        [Local Search] If True, use :class:`ArrayLocalSearch` instead of :class:`LocalSearch`
+
     """
     def __init__(
             self,
@@ -591,8 +701,8 @@ class InterleavedLocalAndRandomSearch(AcquisitionFunctionMaximizer):
             rng: Union[bool, np.random.RandomState] = None,
             max_steps: Optional[int] = None,
             n_steps_plateau_walk: int = 10,
-            n_sls_iterations: int = 10
-
+            n_sls_iterations: int = 10,
+            array_local_search: bool = False,
     ):
         super().__init__(acquisition_function, config_space, rng)
         self.random_search = RandomSearch(
@@ -600,7 +710,8 @@ class InterleavedLocalAndRandomSearch(AcquisitionFunctionMaximizer):
             config_space=config_space,
             rng=rng
         )
-        self.local_search = LocalSearch(
+        local_search_class = ArrayLocalSearch if array_local_search else LocalSearch
+        self.local_search = local_search_class(
             acquisition_function=acquisition_function,
             config_space=config_space,
             rng=rng,
@@ -75,7 +75,10 @@ class SMBO(object):
                  restore_incumbent: Configuration = None,
                  random_configuration_chooser: typing.Union[
                      ChooserNoCoolDown, ChooserLinearCoolDown] = ChooserNoCoolDown(2.0),
-                 predict_incumbent: bool = True):
+                 predict_incumbent: bool = True,
+                 retrain_every: typing.Optional[int] = None,
+                 retrain_time_fraction: typing.Optional[float] = None,
+                 partial_retrain: bool = False):
         """
         Interface that contains the main Bayesian optimization loop
 
@@ -118,6 +121,19 @@ class SMBO(object):
             * ChooserLinearCoolDown(start_modulus, modulus_increment, end_modulus)
         predict_incumbent: bool
             Use predicted performance of incumbent instead of observed performance
+        retrain_every: int
+            Retrain the model only if at least ``retrain_every`` observations were added since its last training.
+            If None (and ``retrain_time_fraction`` is None), the model is retrained on every iteration.
+        retrain_time_fraction: float
+            Retrain the model only if the time spent on training it is less than this fraction of the
+            wallclock time of the optimization.
+        partial_retrain: bool
+            If the model is not retrained, add the new observations to the leaves of the random forest
+            (see ``RandomForestWithInstances.partial_train``) instead of ignoring them until the next retraining.
+
+            In any case, the model is retrained if the configurations it was trained on changed (e.g. another
+            budget is modeled), or if their costs changed otherwise than by a monotone rescaling of
+            ``runhistory2epm``.
         """
         self.initial_configurations = None
         self.logger = logging.getLogger(
@@ -145,6 +161,20 @@ class SMBO(object):
 
         self.predict_incumbent = predict_incumbent
 
+        self.retrain_every = retrain_every
+        self.retrain_time_fraction = retrain_time_fraction
+        if partial_retrain and not hasattr(model, "partial_train"):
+            self.logger.warning("%s does not support partial_retrain, it is disabled." % type(model).__name__)
+            partial_retrain = False
+        self.partial_retrain = partial_retrain
+        # observations the model was trained on, the first ``_n_retrained`` of them by the last call to ``train``
+        self._trained_X = None  # type: typing.Optional[np.ndarray]
+        self._trained_Y = None  # type: typing.Optional[np.ndarray]
+        self._n_retrained = 0
+        # see ``_fit_y_rescaling``, None if the costs are on the scale of the model
+        self._y_rescaling = None  # type: typing.Optional[typing.List[typing.Tuple[np.ndarray, np.ndarray]]]
+        self._creation_time = time.time()
+
     def start(self, incumbent=None):
         """Starts the Bayesian Optimization loop.
         Detects whether we the optimization is restored from previous state.
@@ -177,10 +207,38 @@ class SMBO(object):
         self.logger.debug("Search for next configuration")
         # get all found configurations sorted according to acq
         challengers = self.choose_next(X, Y)
+        if not self.incumbent:
+            # nothing was evaluated yet (e.g. the initial design is evaluated by other processes),
+            # the first challenger is run as the first configuration of a design
+            self.incumbent = self.initial_design._run_first_configuration(next(iter(challengers)), self.scenario)
+            return
 
         time_spent = time.time() - start_time
         time_left = self._get_timebound_for_intensification(time_spent)
+        self._intensify_(challengers, time_left)
+
+    def propose_(self, batch_size: int, pending: typing.Sequence[Configuration] = (),
+                 liar: str = "min") -> typing.List[Configuration]:
+        """Proposes ``batch_size`` configurations to be evaluated in parallel (by ``evaluate_``), see
+        ``choose_next_batch``."""
+        self.runhistory.db.fetch_new_runhistory(False)
+        self.incumbent = self.runhistory.get_incumbent()
+        X, Y = self.rh2EPM.transform(self.runhistory)
+        return self.choose_next_batch(X, Y, batch_size, pending, liar)
 
+    def evaluate_(self, challengers: typing.List[Configuration]):
+        """Intensifies the given challengers (e.g. proposed by ``propose_`` in another process)
+        against the current incumbent."""
+        self.runhistory.db.fetch_new_runhistory(False)
+        self.incumbent = self.runhistory.get_incumbent()
+        if not self.incumbent:
+            # nothing was evaluated yet, the first challenger is run as the first configuration of a design
+            self.incumbent = self.initial_design._run_first_configuration(challengers[0], self.scenario)
+            challengers = challengers[1:]
+        if challengers:
+            self._intensify_(challengers, self.intensifier._min_time)
+
+    def _intensify_(self, challengers, time_left: float):
         self.logger.debug("Intensify")
 
         self.incumbent, inc_perf = self.intensifier.intensify(
@@ -298,24 +356,208 @@ class SMBO(object):
                 runhistory=self.runhistory, stats=self.stats, num_points=1
             )
 
-        self.model.train(X, Y)
+        self._train_model(X, Y)
 
         if incumbent_value is None:
             if self.runhistory.empty():
                 raise ValueError("Runhistory is empty and the cost value of "
                                  "the incumbent is unknown.")
             incumbent_value = self._get_incumbent_value()
+        else:
+            incumbent_value = self._to_model_scale(np.array(incumbent_value).reshape((1, 1)))[0][0]
 
         self.acquisition_func.update(model=self.model, eta=incumbent_value, num_data=len(self.runhistory.data))
 
+        compute_time = self.acquisition_func.compute_time
         challengers = self.acq_optimizer.maximize(
             runhistory=self.runhistory,
             stats=self.stats,
             num_points=self.scenario.acq_opt_challengers,
             random_configuration_chooser=self.random_configuration_chooser
         )
+        self.stats.surrogate_predict_time += self.acquisition_func.compute_time - compute_time
         return challengers
 
+    def choose_next_batch(self, X: np.ndarray, Y: np.ndarray, batch_size: int,
+                          pending: typing.Sequence[Configuration] = (),
+                          liar: str = "min") -> typing.List[Configuration]:
+        """Choose ``batch_size`` configurations at once, to be evaluated in parallel.
+
+        The model is trained once. After each choice, the chosen configuration is added to the model with a
+        fantasized cost (constant liar, or kriging believer if ``liar`` is ``"believer"``), so that the next
+        maximization of the acquisition function is pushed away from it. The configurations which are still
+        being evaluated (``pending``) are fantasized first. As the model holds fantasized costs afterwards,
+        it is trained again on the next call.
+
+        Parameters
+        ----------
+        X : (N, D) numpy array
+        Y : (N, O) numpy array
+        batch_size: int
+            Number of configurations to choose
+        pending: sequence of Configuration
+            Configurations which are being evaluated
+        liar: str
+            Fantasized cost: ``"min"``, ``"mean"`` or ``"max"`` of ``Y``, or the cost predicted by the model
+            (``"believer"``)
+
+        Returns
+        -------
+        List[Configuration]
+        """
+        assert liar in ("min", "mean", "max", "believer")
+        known = set(self.runhistory.get_all_configs()) | set(pending)
+        if X.shape[0] == 0:
+            batch = []
+            while len(batch) < batch_size:
+                config = self.config_space.sample_configuration()
+                if config not in known:
+                    config.origin = 'Random Search'
+                    known.add(config)
+                    batch.append(config)
+            return batch
+
+        self._train_model(X, Y)
+        incumbent_value = self._get_incumbent_value()
+        Y = self._to_model_scale(Y)
+        # the model is going to be trained on fantasized costs
+        self._trained_X = self._trained_Y = self._y_rescaling = None
+        y_liar = None if liar == "believer" else getattr(np, liar)(Y, axis=0)
+        X_train, Y_train = self._add_fantasies(list(pending), X, Y, y_liar)
+
+        batch = []
+        num_data = len(self.runhistory.data) + len(pending)
+        while len(batch) < batch_size:
+            self.acquisition_func.update(model=self.model, eta=incumbent_value, num_data=num_data + len(batch))
+            compute_time = self.acquisition_func.compute_time
+            challengers = self.acq_optimizer.maximize(
+                runhistory=self.runhistory,
+                stats=self.stats,
+                num_points=self.scenario.acq_opt_challengers,
+                random_configuration_chooser=self.random_configuration_chooser
+            )
+            self.stats.surrogate_predict_time += self.acquisition_func.compute_time - compute_time
+            for config in challengers:
+                if config not in known:
+                    break
+            else:
+                config = self.config_space.sample_configuration()
+                config.origin = 'Random Search'
+            known.add(config)
+            batch.append(config)
+            if len(batch) < batch_size:
+                X_train, Y_train = self._add_fantasies([config], X_train, Y_train, y_liar)
+        return batch
+
+    def _add_fantasies(self, configs: typing.List[Configuration], X: np.ndarray, Y: np.ndarray,
+                       y_liar: typing.Optional[np.ndarray]) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """Adds the configurations to the model with the cost ``y_liar`` (the predicted cost if None),
+        returns the data the model is trained on."""
+        if not configs:
+            return X, Y
+        X_fantasy = convert_configurations_to_array(configs)
+        if self.scenario.feature_array is not None:
+            # a fantasized run on every instance
+            n_instances = self.scenario.feature_array.shape[0]
+            X_fantasy = np.hstack((np.repeat(X_fantasy, n_instances, axis=0),
+                                   np.tile(self.scenario.feature_array, (len(configs), 1))))
+        if y_liar is None:
+            Y_fantasy = self.model.predict(X_fantasy)[0]
+        else:
+            Y_fantasy = np.tile(y_liar, (X_fantasy.shape[0], 1))
+
+        start_time = time.time()
+        if hasattr(self.model, "partial_train"):
+            self.model.partial_train(X_fantasy, Y_fantasy)
+            self.stats.surrogate_partial_fits += 1
+        else:
+            self.model.train(np.vstack((X, X_fantasy)), np.vstack((Y, Y_fantasy)))
+            self.stats.surrogate_fits += 1
+        self.stats.surrogate_fit_time += time.time() - start_time
+        return np.vstack((X, X_fantasy)), np.vstack((Y, Y_fantasy))
+
+    def _train_model(self, X: np.ndarray, Y: np.ndarray):
+        """Train the model on X and Y, according to the retraining policy.
+
+        If the model is not retrained, the costs ``Y`` may be on another scale than the costs it was trained
+        on (e.g. runhistory2epm normalizes log-scaled costs by the best one): :meth:`_to_model_scale` maps
+        them to the scale of the model.
+
+        Parameters
+        ----------
+        X : (N, D) numpy array
+        Y : (N, O) numpy array
+        """
+        n_trained = 0 if self._trained_X is None else self._trained_X.shape[0]
+
+        start_time = time.time()
+        if self._should_retrain(X.shape[0] - self._n_retrained) or not self._is_trained_on(X) or \
+                not self._fit_y_rescaling(Y):
+            self.model.train(X, Y)
+            self._n_retrained = X.shape[0]
+            self._y_rescaling = None
+            self.stats.surrogate_fits += 1
+            Y_model = Y
+        elif X.shape[0] > n_trained and self.partial_retrain:
+            Y_new = self._to_model_scale(Y[n_trained:])
+            self.model.partial_train(X[n_trained:], Y_new)
+            self.stats.surrogate_partial_fits += 1
+            Y_model = np.vstack((self._trained_Y, Y_new))
+        else:
+            self.logger.debug("Model is not retrained, %d new observations." % (X.shape[0] - n_trained))
+            return
+        self.stats.surrogate_fit_time += time.time() - start_time
+        self._trained_X = X.copy()
+        self._trained_Y = Y_model.copy()
+
+    def _is_trained_on(self, X: np.ndarray) -> bool:
+        # new observations are appended by runhistory2epm, the ones of the model should not have changed
+        if self._trained_X is None or self._trained_X.shape[0] > X.shape[0]:
+            return False
+        return _equal_nan(X[:self._trained_X.shape[0]], self._trained_X)
+
+    def _fit_y_rescaling(self, Y: np.ndarray) -> bool:
+        """Fit the map from the costs of the observations of the model in ``Y`` to the costs the model was
+        trained on, as a piecewise linear function of each output. Returns False if the costs did not change
+        monotonically, the model has to be retrained."""
+        Y_trained = Y[:self._trained_Y.shape[0]]
+        if _equal_nan(Y_trained, self._trained_Y):
+            self._y_rescaling = None
+            return True
+        rescaling = []
+        for current, trained in zip(Y_trained.T, self._trained_Y.T):
+            if np.isnan(current).any() or np.isnan(trained).any():
+                return False
+            order = np.argsort(current, kind="mergesort")
+            current, trained = current[order], trained[order]
+            steps = np.diff(trained)
+            # equal costs have to stay equal, and the order of the costs the same
+            if np.any(steps < 0) or np.any(steps[np.diff(current) == 0] != 0):
+                return False
+            xp, index = np.unique(current, return_index=True)
+            rescaling.append((xp, trained[index]))
+        self._y_rescaling = rescaling
+        return True
+
+    def _to_model_scale(self, Y: np.ndarray) -> np.ndarray:
+        """Costs ``Y`` of shape (N, O) on the scale of the model."""
+        if self._y_rescaling is None:
+            return Y
+        Y = np.array(Y, dtype=np.float64)
+        for i, (xp, fp) in enumerate(self._y_rescaling):
+            Y[:, i] = _interp(Y[:, i], xp, fp)
+        return Y
+
+    def _should_retrain(self, n_new: int) -> bool:
+        if self.retrain_every is None and self.retrain_time_fraction is None:
+            return True
+        if n_new < (self.retrain_every or 1):
+            return False
+        if self.retrain_time_fraction is not None and \
+                self.stats.surrogate_fit_time > self.retrain_time_fraction * (time.time() - self._creation_time):
+            return False
+        return True
+
     def _get_incumbent_value(self):
         ''' get incumbent value either from runhistory
             or from best predicted performance on configs in runhistory
@@ -326,13 +568,12 @@ class SMBO(object):
             float
         '''
         if self.predict_incumbent:
+            start_time = time.time()
             configs = convert_configurations_to_array(self.runhistory.get_all_configs())
-            costs = list(map(
-                lambda config:
-                self.model.predict_marginalized_over_instances(config.reshape((1, -1)))[0][0][0],
-                configs,
-            ))
+            # all the configurations are predicted in one batch
+            costs = self.model.predict_marginalized_over_instances(configs)[0][:, 0]
             incumbent_value = np.min(costs)
+            self.stats.surrogate_predict_time += time.time() - start_time
             # won't need log(y) if EPM was already trained on log(y)
 
         else:
@@ -344,7 +585,7 @@ class SMBO(object):
             # necessary
             incumbent_value_as_array = np.array(incumbent_value).reshape((1, 1))
             incumbent_value = self.rh2EPM.transform_response_values(incumbent_value_as_array)
-            incumbent_value = incumbent_value[0][0]
+            incumbent_value = self._to_model_scale(incumbent_value)[0][0]
 
         return incumbent_value
 
@@ -588,3 +829,19 @@ class SMBO(object):
         cs.add_conditions([inc_par_ei, inc_par_pi, inc_par_logei, inc_par_lcb])
 
         return cs
+
+
+def _equal_nan(a: np.ndarray, b: np.ndarray) -> bool:
+    # np.array_equal(a, b, equal_nan=True) needs numpy >= 1.19
+    return a.shape == b.shape and bool(((a == b) | (np.isnan(a) & np.isnan(b))).all())
+
+
+def _interp(x: np.ndarray, xp: np.ndarray, fp: np.ndarray) -> np.ndarray:
+    """np.interp, linearly extrapolated out of [xp[0], xp[-1]] (e.g. a new best cost)."""
+    if len(xp) == 1:
+        return x - xp[0] + fp[0]
+    y = np.interp(x, xp, fp)
+    left, right = x < xp[0], x > xp[-1]
+    y[left] = fp[0] + (x[left] - xp[0]) * (fp[1] - fp[0]) / (xp[1] - xp[0])
+    y[right] = fp[-1] + (x[right] - xp[-1]) * (fp[-1] - fp[-2]) / (xp[-1] - xp[-2])
+    return y
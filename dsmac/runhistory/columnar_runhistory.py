@@ -0,0 +1,420 @@
+import collections.abc
+import json
+import typing
+
+import numpy as np
+from frozendict import frozendict
+
+from dsmac.configspace import Configuration, ConfigurationSpace
+from dsmac.runhistory.runhistory import RunHistory
+from dsmac.runhistory.structure import RunKey, InstSeedKey, RunValue, DataOrigin
+from dsmac.runhistory.utils import get_id_of_config
+from dsmac.tae.execute_ta_run import StatusType
+from generic_fs import LocalFS
+
+_internal_origins = (DataOrigin.INTERNAL.value, DataOrigin.EXTERNAL_SAME_INSTANCES.value)
+
+
+class _RunsView(collections.abc.Mapping):
+    """RunKey -> RunValue, in order of addition, built from the columns on access"""
+
+    def __init__(self, runhistory: 'ColumnarRunHistory'):
+        self.runhistory = runhistory
+
+    def __getitem__(self, key: RunKey) -> RunValue:
+        position = self.runhistory._get_position(key)
+        if position is None:
+            raise KeyError(key)
+        return self.runhistory._get_run_value(position)
+
+    def __iter__(self):
+        for position in range(self.runhistory._n_runs):
+            yield self.runhistory._get_run_key(position)
+
+    def __len__(self):
+        return self.runhistory._n_runs
+
+    def items(self):
+        for position in range(self.runhistory._n_runs):
+            yield self.runhistory._get_run_key(position), self.runhistory._get_run_value(position)
+
+
+class _OriginsView(_RunsView):
+    """RunKey -> DataOrigin"""
+
+    def __getitem__(self, key: RunKey) -> DataOrigin:
+        position = self.runhistory._get_position(key)
+        if position is None:
+            raise KeyError(key)
+        return DataOrigin(int(self.runhistory._origins[position]))
+
+    def items(self):
+        for key in self:
+            yield key, self[key]
+
+
+class _RunKeysView(collections.abc.Sequence):
+    """RunKey of each run position"""
+
+    def __init__(self, runhistory: 'ColumnarRunHistory'):
+        self.runhistory = runhistory
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.runhistory._get_run_key(position)
+                    for position in range(*index.indices(self.runhistory._n_runs))]
+        if index < 0:
+            index += self.runhistory._n_runs
+        if not 0 <= index < self.runhistory._n_runs:
+            raise IndexError(index)
+        return self.runhistory._get_run_key(index)
+
+    def __len__(self):
+        return self.runhistory._n_runs
+
+
+class _IdsConfigView(collections.abc.Mapping):
+    """config_id -> Configuration, rebuilt from the configuration matrix"""
+
+    def __init__(self, runhistory: 'ColumnarRunHistory'):
+        self.runhistory = runhistory
+
+    def __getitem__(self, config_id: str) -> Configuration:
+        return self.runhistory._get_config(self.runhistory._config_index[config_id])
+
+    def __iter__(self):
+        return iter(self.runhistory._config_id_list)
+
+    def __len__(self):
+        return len(self.runhistory._config_id_list)
+
+
+class _ConfigIdsView(collections.abc.Mapping):
+    """Configuration -> config_id"""
+
+    def __init__(self, runhistory: 'ColumnarRunHistory'):
+        self.runhistory = runhistory
+
+    def __getitem__(self, config: Configuration) -> str:
+        config_id = get_id_of_config(config)
+        if config_id not in self.runhistory._config_index:
+            raise KeyError(config)
+        return config_id
+
+    def __iter__(self):
+        for index in range(len(self.runhistory._config_id_list)):
+            yield self.runhistory._get_config(index)
+
+    def __len__(self):
+        return len(self.runhistory._config_id_list)
+
+    def items(self):
+        for index, config_id in enumerate(self.runhistory._config_id_list):
+            yield self.runhistory._get_config(index), config_id
+
+
+class ColumnarRunHistory(RunHistory):
+    """RunHistory which stores runs as NumPy columns, for long experiments (100k+ runs).
+
+    Runs are stored as columns (config index, instance index, seed, cost, time, status, origin),
+    configurations as rows of a single ``get_array()`` matrix, so that there are no namedtuples,
+    dict entries or ``Configuration`` objects per run.
+
+    The API of :class:`RunHistory` is kept: ``data``, ``external``, ``ids_config``, ``config_ids`` and ``run_keys``
+    are read-only views, which build namedtuples and configurations on access.
+
+    ``save_json`` and ``load_json`` use an ``.npz`` file if the file name ends with ``.npz``,
+    which is much faster to write and read than JSON (local file system only).
+    """
+
+    def __init__(
+            self,
+            aggregate_func: typing.Callable,
+            overwrite_existing_runs: bool = False,
+            file_system=LocalFS(),
+            config_space: ConfigurationSpace = None,
+            db_type="sqlite",
+            db_params=frozendict(),
+            db_table_name="runhistory"
+    ) -> None:
+        assert config_space is not None, "ColumnarRunHistory rebuilds configurations, config_space is needed."
+        super().__init__(aggregate_func, overwrite_existing_runs, file_system, config_space,
+                         db_type, db_params, db_table_name)
+        self.config_space = config_space
+        n_params = len(config_space.get_hyperparameters())
+        # configurations
+        self._config_matrix = np.empty([16, n_params])
+        self._config_id_list = []  # type: typing.List[str]
+        self._config_origins = []  # type: typing.List[typing.Optional[str]]
+        self._config_index = {}  # type: typing.Dict[str, int]
+        # instances
+        self._instance_list = []  # type: typing.List[typing.Optional[str]]
+        self._instance_index = {}  # type: typing.Dict[typing.Optional[str], int]
+        # runs
+        self._n_runs = 0
+        # packed (config index, instance index, seed) -> position
+        self._run_index = {}  # type: typing.Dict[int, int]
+        self._configs = np.empty(64, dtype=np.int32)
+        self._instances = np.empty(64, dtype=np.int32)
+        self._seeds = np.empty(64, dtype=np.int64)
+        self._run_costs = np.empty(64)
+        self._run_times = np.empty(64)
+        self._statuses = np.empty(64, dtype=np.int8)
+        self._origins = np.empty(64, dtype=np.int8)
+        # order in which the run was listed by get_runs_for_config (as in RunHistory), -1 if it is not
+        self._listed = np.full(64, -1, dtype=np.int64)
+        self._n_listed = 0
+        # None for empty dicts, which are most of them
+        self._additional_infos = []  # type: typing.List[typing.Optional[dict]]
+        # views of the API of RunHistory
+        self.data = _RunsView(self)
+        self.external = _OriginsView(self)
+        self.run_keys = _RunKeysView(self)
+        self.ids_config = _IdsConfigView(self)
+        self.config_ids = _ConfigIdsView(self)
+        self._configid_to_inst_seed = None
+        self._positions_by_status = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ("_configs", "_instances", "_seeds", "_run_costs", "_run_times", "_statuses", "_origins",
+                     "_listed"):
+            state[name] = state[name][:self._n_runs].copy()
+        state["_config_matrix"] = state["_config_matrix"][:len(self._config_id_list)].copy()
+        for name in ("data", "external", "run_keys", "ids_config", "config_ids"):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.data = _RunsView(self)
+        self.external = _OriginsView(self)
+        self.run_keys = _RunKeysView(self)
+        self.ids_config = _IdsConfigView(self)
+        self.config_ids = _ConfigIdsView(self)
+
+    # ----------columns------------------------------------------------------------------
+
+    def _get_config(self, index: int) -> Configuration:
+        return Configuration(self.config_space, vector=self._config_matrix[index], origin=self._config_origins[index])
+
+    def _get_config_index(self, config: Configuration) -> int:
+        config_id = get_id_of_config(config)
+        index = self._config_index.get(config_id)
+        if index is None:
+            index = len(self._config_id_list)
+            if index >= self._config_matrix.shape[0]:
+                self._config_matrix = np.resize(self._config_matrix, [2 * index, self._config_matrix.shape[1]])
+            self._config_matrix[index] = config.get_array()
+            self._config_id_list.append(config_id)
+            self._config_origins.append(config.origin)
+            self._config_index[config_id] = index
+        return index
+
+    def _get_instance_index(self, instance_id: typing.Optional[str]) -> int:
+        index = self._instance_index.get(instance_id)
+        if index is None:
+            index = len(self._instance_list)
+            self._instance_list.append(instance_id)
+            self._instance_index[instance_id] = index
+        return index
+
+    @staticmethod
+    def _pack_run_key(config_index: int, instance_index: int, seed: int) -> int:
+        # an int takes less memory than a tuple of 3 ints in a dict of 100k+ runs
+        return (((config_index << 32) | instance_index) << 64) | (int(seed) & 0xFFFFFFFFFFFFFFFF)
+
+    def _get_position(self, key: RunKey) -> typing.Optional[int]:
+        config_index = self._config_index.get(key.config_id)
+        instance_index = self._instance_index.get(key.instance_id)
+        if config_index is None or instance_index is None:
+            return None
+        return self._run_index.get(self._pack_run_key(config_index, instance_index, key.seed))
+
+    def _get_run_key(self, position: int) -> RunKey:
+        return RunKey(self._config_id_list[self._configs[position]], self._instance_list[self._instances[position]],
+                      int(self._seeds[position]))
+
+    def _get_run_value(self, position: int) -> RunValue:
+        additional_info = self._additional_infos[position]
+        return RunValue(float(self._run_costs[position]), float(self._run_times[position]),
+                        StatusType(int(self._statuses[position])), additional_info if additional_info else {})
+
+    def _grow(self):
+        capacity = 2 * self._n_runs
+        for name in ("_configs", "_instances", "_seeds", "_run_costs", "_run_times", "_statuses", "_origins",
+                     "_listed"):
+            setattr(self, name, np.resize(getattr(self, name), capacity))
+
+    # ----------API of RunHistory------------------------------------------------------------------
+
+    def add(self, config: Configuration, cost: float, time: float,
+            status: StatusType, instance_id: str = "",
+            seed: int = 0,
+            additional_info: dict = None,
+            origin: DataOrigin = DataOrigin.INTERNAL):
+        if not instance_id:
+            instance_id = None
+        config_index = self._get_config_index(config)
+        instance_index = self._get_instance_index(instance_id)
+        run_index_key = self._pack_run_key(config_index, instance_index, seed)
+        position = self._run_index.get(run_index_key)
+        if position is not None:
+            # same rules as RunHistory.add
+            old_status = StatusType(int(self._statuses[position]))
+            if not (self.overwrite_existing_runs or
+                    (status != StatusType.CAPPED and old_status == StatusType.CAPPED) or
+                    (status == StatusType.CAPPED and old_status == StatusType.CAPPED and
+                     cost > self._run_costs[position])):
+                return
+        else:
+            position = self._n_runs
+            if position >= self._configs.shape[0]:
+                self._grow()
+            self._n_runs += 1
+            self._run_index[run_index_key] = position
+            self._configs[position] = config_index
+            self._instances[position] = instance_index
+            self._seeds[position] = seed
+            self._listed[position] = -1
+            self._additional_infos.append(None)
+        self._run_costs[position] = cost
+        self._run_times[position] = time
+        self._push_run_cost(position, cost)
+        self._statuses[position] = status.value
+        self._origins[position] = origin.value
+        self._additional_infos[position] = dict(additional_info) if additional_info else None
+
+        if origin.value in _internal_origins and status != StatusType.CAPPED:
+            if self._listed[position] < 0:
+                self._listed[position] = self._n_listed
+                self._n_listed += 1
+            if not self.overwrite_existing_runs:
+                # assumes an average across runs as cost function aggregation, as incremental_update_cost
+                config_id = self._config_id_list[config_index]
+                n_runs = self.runs_per_config.get(config_id, 0)
+                old_cost = self.cost_per_config.get(config_id, 0.)
+                self._set_cost(config_id, ((old_cost * n_runs) + cost) / (n_runs + 1), n_runs + 1)
+            else:
+                self.update_cost(config=config)
+
+    def get_runs_for_config(self, config: Configuration):
+        config_index = self._config_index.get(get_id_of_config(config))
+        if config_index is None:
+            return []
+        n = self._n_runs
+        positions = np.flatnonzero((self._configs[:n] == config_index) & (self._listed[:n] >= 0))
+        positions = positions[np.argsort(self._listed[positions])]
+        return [InstSeedKey(self._instance_list[self._instances[position]], int(self._seeds[position]))
+                for position in positions]
+
+    def get_instance_costs_for_config(self, config: Configuration):
+        config_index = self._config_index.get(get_id_of_config(config))
+        if config_index is None:
+            return {}
+        n = self._n_runs
+        positions = np.flatnonzero((self._configs[:n] == config_index) & (self._listed[:n] >= 0))
+        positions = positions[np.argsort(self._listed[positions])]
+        cost_per_inst = {}
+        for position in positions:
+            instance_id = self._instance_list[self._instances[position]]
+            cost_per_inst.setdefault(instance_id, []).append(self._run_costs[position])
+        return dict([(inst, np.mean(costs)) for inst, costs in cost_per_inst.items()])
+
+    def get_run_positions(self, statuses: typing.Iterable[StatusType]) -> np.ndarray:
+        values = [status.value for status in set(statuses)]
+        return np.flatnonzero(np.isin(self._statuses[:self._n_runs], values))
+
+    def get_run_costs(self) -> np.ndarray:
+        return self._run_costs[:self._n_runs]
+
+    def get_run_times(self) -> np.ndarray:
+        return self._run_times[:self._n_runs]
+
+    def get_run_config_arrays(self, start: int = 0) -> np.ndarray:
+        return self._config_matrix[self._configs[start:self._n_runs]]
+
+    # ----------serialization------------------------------------------------------------------
+
+    def save_json(self, fn: str = "runhistory.json", save_external: bool = False):
+        if fn.endswith(".npz"):
+            self.save_npz(fn, save_external)
+        else:
+            super().save_json(fn, save_external)
+
+    def load_json(self, fn: str, cs: ConfigurationSpace):
+        if fn.endswith(".npz"):
+            self.load_npz(fn, cs)
+            return
+        try:
+            txt = self.file_system.read_txt(fn)
+            all_data = json.loads(txt, object_hook=StatusType.enum_hook)
+        except Exception as e:
+            self.logger.warning(
+                'Encountered exception %s while reading runhistory from %s. '
+                'Not adding any runs!',
+                e,
+                fn,
+            )
+            return
+        config_origins = all_data.get("config_origins", {})
+        configs = {id_: Configuration(cs, values=values, origin=config_origins.get(id_, None))
+                   for id_, values in all_data["configs"].items()}
+        for k, v in all_data["data"]:
+            if k[0] in configs:
+                self.add(config=configs[k[0]], cost=float(v[0]), time=float(v[1]), status=StatusType(v[2]),
+                         instance_id=k[1], seed=int(k[2]), additional_info=v[3])
+
+    def save_npz(self, fn: str, save_external: bool = False):
+        """Save runs and configurations as arrays in a ``.npz`` file
+
+        Parameters
+        ----------
+        fn : str
+            file name, on local file system
+        save_external : bool
+            Whether to save external data in the runhistory file.
+        """
+        n = self._n_runs
+        mask = np.ones(n, dtype=bool) if save_external else self._origins[:n] == DataOrigin.INTERNAL.value
+        n_configs = len(self._config_id_list)
+        with open(fn, "wb") as f:
+            np.savez(
+                f,
+                configs=self._configs[:n][mask],
+                instances=self._instances[:n][mask],
+                seeds=self._seeds[:n][mask],
+                costs=self._run_costs[:n][mask],
+                times=self._run_times[:n][mask],
+                statuses=self._statuses[:n][mask],
+                origins=self._origins[:n][mask],
+                config_matrix=self._config_matrix[:n_configs],
+                # small, or mostly empty, lists are stored as json
+                meta=np.array(json.dumps({
+                    "config_origins": self._config_origins,
+                    "instances": self._instance_list,
+                    "additional_infos": [x for x, m in zip(self._additional_infos, mask) if m],
+                })),
+            )
+
+    def load_npz(self, fn: str, cs: ConfigurationSpace):
+        """Add the runs of a ``.npz`` file written by :meth:`save_npz`
+
+        Parameters
+        ----------
+        fn : str
+            file name, on local file system
+        cs : ConfigSpace
+            instance of configuration space
+        """
+        with np.load(fn) as f:
+            arrays = {name: f[name] for name in f.files}
+        meta = json.loads(str(arrays["meta"]))
+        configs = [Configuration(cs, vector=vector, origin=origin)
+                   for vector, origin in zip(arrays["config_matrix"], meta["config_origins"])]
+        for config_index, instance_index, seed, cost, time, status, origin, additional_info in zip(
+                arrays["configs"], arrays["instances"], arrays["seeds"], arrays["costs"], arrays["times"],
+                arrays["statuses"], arrays["origins"], meta["additional_infos"]):
+            self.add(config=configs[config_index], cost=float(cost), time=float(time), status=StatusType(int(status)),
+                     instance_id=meta["instances"][instance_index], seed=int(seed), additional_info=additional_info,
+                     origin=DataOrigin(int(origin)))
@@ -1,11 +1,13 @@
+import bisect
 import collections
+import heapq
 import json
 import typing
 
 import numpy as np
 from frozendict import frozendict
 
-from dsmac.configspace import Configuration, ConfigurationSpace
+from dsmac.configspace import Configuration, ConfigurationSpace, convert_configurations_to_array
 from dsmac.runhistory.runhistory_db import RunHistoryDB
 from dsmac.runhistory.structure import RunKey, InstSeedKey, RunValue, EnumEncoder, DataOrigin
 from dsmac.runhistory.utils import get_id_of_config
@@ -95,15 +97,75 @@ class RunHistory(object):
         self.aggregate_func = aggregate_func
         self.overwrite_existing_runs = overwrite_existing_runs
 
+        # Incremental indexes, so that the optimizer does not scan all the runs in each iteration.
+        # Position of each run in self.data, and its cost and time in columns aligned with positions
+        self.run_keys = []  # type: typing.List[RunKey]
+        self._run_positions = {}  # type: typing.Dict[RunKey, int]
+        self._run_costs = np.empty(64)
+        self._run_times = np.empty(64)
+        # Sorted positions of the runs of each status
+        self._positions_by_status = {}  # type: typing.Dict[StatusType, typing.List[int]]
+        # Heap of (cost, position) of the runs. An entry is stale if the run has been overwritten with another
+        # cost since, stale entries are dropped when they reach the top of the heap.
+        self._run_cost_heap = []  # type: typing.List[typing.Tuple[float, int]]
+
     def get_incumbent(self):
-        incumbent = None
-        min_cost = np.inf
-        for run_key, run_value in self.data.items():
-            cost = run_value.cost
-            if cost < min_cost:
-                incumbent = self.ids_config[run_key.config_id]
-                min_cost = cost
-        return incumbent
+        # the configuration of the run with the minimal cost, the first one in self.data if several runs tie
+        heap = self._run_cost_heap
+        costs = self.get_run_costs()
+        while heap and costs[heap[0][1]] != heap[0][0]:
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        return self.ids_config[self.run_keys[heap[0][1]].config_id]
+
+    def _push_run_cost(self, position: int, cost: float):
+        # nan and inf are never the incumbent, as in a comparison with the minimal cost
+        if cost < np.inf:
+            heapq.heappush(self._run_cost_heap, (cost, position))
+
+    def _set_cost(self, config_id: str, cost: float, n_runs: int):
+        self.cost_per_config[config_id] = cost
+        self.runs_per_config[config_id] = n_runs
+
+    def _reset_costs(self):
+        self.cost_per_config = {}
+        self.runs_per_config = {}
+
+    def _index_run(self, k: RunKey, v: RunValue, old_v: typing.Optional[RunValue]):
+        position = self._run_positions.get(k)
+        if position is None:
+            position = len(self.run_keys)
+            self.run_keys.append(k)
+            self._run_positions[k] = position
+            if position >= self._run_costs.shape[0]:
+                self._run_costs = np.resize(self._run_costs, 2 * position)
+                self._run_times = np.resize(self._run_times, 2 * position)
+            self._positions_by_status.setdefault(v.status, []).append(position)
+        elif old_v.status != v.status:
+            positions = self._positions_by_status[old_v.status]
+            del positions[bisect.bisect_left(positions, position)]
+            bisect.insort(self._positions_by_status.setdefault(v.status, []), position)
+        self._run_costs[position] = v.cost
+        self._run_times[position] = v.time
+        self._push_run_cost(position, v.cost)
+
+    def get_run_positions(self, statuses: typing.Iterable[StatusType]) -> np.ndarray:
+        """Positions in self.data of the runs which have one of the statuses, in order of self.data"""
+        positions = [self._positions_by_status.get(status, []) for status in set(statuses)]
+        return np.sort(np.concatenate([np.array(x, dtype=np.int64) for x in positions] + [np.empty(0, np.int64)]))
+
+    def get_run_costs(self) -> np.ndarray:
+        """Cost of each run, aligned with run positions"""
+        return self._run_costs[:len(self.run_keys)]
+
+    def get_run_times(self) -> np.ndarray:
+        """Time of each run, aligned with run positions"""
+        return self._run_times[:len(self.run_keys)]
+
+    def get_run_config_arrays(self, start: int = 0) -> np.ndarray:
+        """Configuration (as array) of each run, from position ``start``"""
+        return convert_configurations_to_array([self.ids_config[key.config_id] for key in self.run_keys[start:]])
 
     def add(self, config: Configuration, cost: float, time: float,
             status: StatusType, instance_id: str = "",
@@ -164,7 +226,9 @@ class RunHistory(object):
         TODO
 
         """
+        old_v = self.data.get(k)
         self.data[k] = v
+        self._index_run(k, v, old_v)
         self.external[k] = origin
 
         if origin in (DataOrigin.INTERNAL, DataOrigin.EXTERNAL_SAME_INSTANCES) \
@@ -195,8 +259,7 @@ class RunHistory(object):
         inst_seeds = set(self.get_runs_for_config(config))
         perf = self.aggregate_func(config, self, inst_seeds)
         config_id = self.config_ids[config]
-        self.cost_per_config[config_id] = perf
-        self.runs_per_config[config_id] = len(inst_seeds)
+        self._set_cost(config_id, perf, len(inst_seeds))
 
     def compute_all_costs(self, instances: typing.List[str] = None):
         """Computes the cost of all configurations from scratch and overwrites
@@ -208,8 +271,7 @@ class RunHistory(object):
             list of instances; if given, cost is only computed wrt to this instance set
         """
 
-        self.cost_per_config = {}
-        self.runs_per_config = {}
+        self._reset_costs()
         for config, config_id in self.config_ids.items():
             inst_seeds = set(self.get_runs_for_config(config))
             if instances is not None:
@@ -218,8 +280,7 @@ class RunHistory(object):
 
             if inst_seeds:  # can be empty if never saw any runs on <instances>
                 perf = self.aggregate_func(config, self, inst_seeds)
-                self.cost_per_config[config_id] = perf
-                self.runs_per_config[config_id] = len(inst_seeds)
+                self._set_cost(config_id, perf, len(inst_seeds))
 
     def incremental_update_cost(self, config: Configuration, cost: float):
         """Incrementally updates the performance of a configuration by using a
@@ -236,9 +297,7 @@ class RunHistory(object):
         config_id = self.config_ids[config]
         n_runs = self.runs_per_config.get(config_id, 0)
         old_cost = self.cost_per_config.get(config_id, 0.)
-        self.cost_per_config[config_id] = (
-                                                  (old_cost * n_runs) + cost) / (n_runs + 1)
-        self.runs_per_config[config_id] = n_runs + 1
+        self._set_cost(config_id, ((old_cost * n_runs) + cost) / (n_runs + 1), n_runs + 1)
 
     def get_cost(self, config: Configuration):
         """Returns empirical cost for a configuration; uses  self.cost_per_config
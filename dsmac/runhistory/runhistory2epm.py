@@ -8,7 +8,6 @@ import numpy as np
 from dsmac.tae.execute_ta_run import StatusType
 from dsmac.runhistory.runhistory import RunHistory
 from dsmac.runhistory.structure import RunKey, RunValue
-from dsmac.configspace import convert_configurations_to_array
 from dsmac.epm.base_imputor import BaseImputor
 from dsmac.utils import constants
 from dsmac.scenario.scenario import Scenario
@@ -135,22 +134,52 @@ class AbstractRunHistory2EPM(object):
         self.max_y = None
         self.perc = None
 
+        # X rows of the runs of a runhistory, aligned with run positions;
+        # rows of new runs are appended by each transform, as a run never changes its configuration or instance
+        self._cached_runhistory_id = None
+        self._X = np.empty([0, self.num_params + self.n_feats])
+        # instance of each run, coded by self._instance_index
+        self._instances = np.empty(0, dtype=np.int64)
+        self._instance_index = {}  # type: typing.Dict[str, int]
+
+    def _update_cache(self, runhistory: RunHistory):
+        """Append the X rows of the runs added to runhistory since the last call"""
+        if self._cached_runhistory_id != id(runhistory) or self._X.shape[0] > len(runhistory.run_keys):
+            self._cached_runhistory_id = id(runhistory)
+            self._X = self._X[:0]
+            self._instances = self._instances[:0]
+        new_keys = runhistory.run_keys[self._X.shape[0]:]
+        if not new_keys:
+            return
+        X = runhistory.get_run_config_arrays(self._X.shape[0]).reshape(len(new_keys), -1)
+        if self.n_feats:
+            X = np.hstack((X, np.array([self.instance_features[key.instance_id] for key in new_keys])))
+        instances = [self._instance_index.setdefault(key.instance_id, len(self._instance_index)) for key in new_keys]
+        self._X = np.vstack((self._X, X))
+        self._instances = np.concatenate((self._instances, instances))
+
+    def _select_runs(self, runhistory: RunHistory, statuses: typing.Iterable[StatusType],
+                     instances: typing.List[str] = None) -> np.ndarray:
+        """Positions of the runs with one of the statuses (and on one of the instances), in order of runhistory"""
+        positions = runhistory.get_run_positions(statuses)
+        if instances is not None:
+            codes = [self._instance_index[instance] for instance in instances if instance in self._instance_index]
+            positions = positions[np.isin(self._instances[positions], codes)]
+        return positions
+
     @abc.abstractmethod
-    def _build_matrix(self, run_dict: typing.Mapping[RunKey, RunValue],
+    def _build_matrix(self, positions: np.ndarray,
                       runhistory: RunHistory,
-                      instances: list = None,
                       return_time_as_y: bool = False,
                       store_statistics: bool = False):
         """Builds x,y matrixes from selected runs from runhistory
 
         Parameters
         ----------
-        run_dict: dict(RunKey -> RunValue)
-            dictionary from RunHistory.RunKey to RunHistory.RunValue
+        positions: np.ndarray
+            positions of the selected runs in runhistory
         runhistory: RunHistory
             runhistory object
-        instances: list
-            list of instances
         return_time_as_y: bool
             Return the time instead of cost as y value. Necessary to access the raw y values for imputation.
         store_statistics: bool
@@ -163,7 +192,7 @@ class AbstractRunHistory2EPM(object):
         """
         raise NotImplementedError()
 
-    def transform(self, runhistory: RunHistory):
+    def transform(self, runhistory: RunHistory, instances: typing.List[str] = None):
         """Returns vector representation of runhistory; if imputation is
         disabled, censored (TIMEOUT with time < cutoff) will be skipped
 
@@ -171,6 +200,9 @@ class AbstractRunHistory2EPM(object):
         ----------
         runhistory : smac.runhistory.runhistory.RunHistory
             Runhistory containing all evaluated configurations/instances
+        instances: typing.List[str]
+            if given, only runs on these instances are used
+            (e.g. runs of one budget, so that budgets are not mixed)
 
         Returns
         -------
@@ -180,58 +212,46 @@ class AbstractRunHistory2EPM(object):
             cost values
         """
         self.logger.debug("Transform runhistory into X,y format")
+        self._update_cache(runhistory)
 
         # consider only successfully finished runs
-        s_run_dict = {run: runhistory.data[run] for run in runhistory.data.keys()
-                      if runhistory.data[run].status in self.success_states}
-
-        # Store a list of instance IDs
-        s_instance_id_list = [k.instance_id for k in s_run_dict.keys()]
-        X, Y = self._build_matrix(run_dict=s_run_dict, runhistory=runhistory,
-                                  instances=s_instance_id_list, store_statistics=True)
+        s_positions = self._select_runs(runhistory, self.success_states, instances)
+        X, Y = self._build_matrix(positions=s_positions, runhistory=runhistory, store_statistics=True)
 
         # Also get TIMEOUT runs
-        t_run_dict = {run: runhistory.data[run] for run in runhistory.data.keys()
-                      if runhistory.data[run].status == StatusType.TIMEOUT and
-                      runhistory.data[run].time >= self.cutoff_time}
-        t_instance_id_list = [k.instance_id for k in s_run_dict.keys()]
+        t_positions = self._select_runs(runhistory, [StatusType.TIMEOUT], instances)
+        t_positions = t_positions[runhistory.get_run_times()[t_positions] >= self.cutoff_time]
 
         # use penalization (e.g. PAR10) for EPM training
         store_statistics = True if self.min_y is None else False
-        tX, tY = self._build_matrix(run_dict=t_run_dict, runhistory=runhistory,
-                                    instances=t_instance_id_list, store_statistics=store_statistics)
+        tX, tY = self._build_matrix(positions=t_positions, runhistory=runhistory,
+                                    store_statistics=store_statistics)
 
         # if we don't have successful runs,
         # we have to return all timeout runs
-        if not s_run_dict:
+        if s_positions.size == 0:
             return tX, tY
 
         if self.impute_censored_data:
             # Get all censored runs
-            c_run_dict = {run: runhistory.data[run] for run in runhistory.data.keys()
-                          if runhistory.data[run].status in self.impute_state and
-                          runhistory.data[run].time < self.cutoff_time}
-            if len(c_run_dict) == 0:
+            c_positions = self._select_runs(runhistory, self.impute_state, instances)
+            c_positions = c_positions[runhistory.get_run_times()[c_positions] < self.cutoff_time]
+            if c_positions.size == 0:
                 self.logger.debug("No censored data found, skip imputation")
                 # If we do not impute, we also return TIMEOUT data
                 X = np.vstack((X, tX))
                 Y = np.concatenate((Y, tY))
             else:
-                # Store a list of instance IDs
-                c_instance_id_list = [k.instance_id for k in c_run_dict.keys()]
-
                 # better empirical results by using PAR1 instead of PAR10
                 # for censored data imputation
-                cen_X, cen_Y = self._build_matrix(run_dict=c_run_dict,
+                cen_X, cen_Y = self._build_matrix(positions=c_positions,
                                                   runhistory=runhistory,
-                                                  instances=c_instance_id_list,
                                                   return_time_as_y=True,
                                                   store_statistics=False,)
 
                 # Also impute TIMEOUTS
-                tX, tY = self._build_matrix(run_dict=t_run_dict,
+                tX, tY = self._build_matrix(positions=t_positions,
                                             runhistory=runhistory,
-                                            instances=t_instance_id_list,
                                             return_time_as_y=True,
                                             store_statistics=False,)
                 cen_X = np.vstack((cen_X, tX))
@@ -307,21 +327,18 @@ class AbstractRunHistory2EPM(object):
 class RunHistory2EPM4Cost(AbstractRunHistory2EPM):
     """TODO"""
 
-    def _build_matrix(self, run_dict: typing.Mapping[RunKey, RunValue],
+    def _build_matrix(self, positions: np.ndarray,
                       runhistory: RunHistory,
-                      instances: list = None,
                       return_time_as_y: bool = False,
                       store_statistics: bool = False):
         """"Builds X,y matrixes from selected runs from runhistory
 
         Parameters
         ----------
-        run_dict: dict: RunKey -> RunValue
-            dictionary from RunHistory.RunKey to RunHistory.RunValue
+        positions: np.ndarray
+            positions of the selected runs in runhistory
         runhistory: RunHistory
             runhistory object
-        instances: list
-            list of instances
         return_time_as_y: bool
             Return the time instead of cost as y value. Necessary to access the raw y values for imputation.
         store_statistics: bool
@@ -332,28 +349,12 @@ class RunHistory2EPM4Cost(AbstractRunHistory2EPM):
         X: np.ndarray
         Y: np.ndarray
         """
-
-        # First build nan-matrix of size #configs x #params+1
-        n_rows = len(run_dict)
-        n_cols = self.num_params
-        X = np.ones([n_rows, n_cols + self.n_feats]) * np.nan
-        y = np.ones([n_rows, 1])
-
-        # Then populate matrix
-        for row, (key, run) in enumerate(run_dict.items()):
-            # Scaling is automatically done in configSpace
-            conf = runhistory.ids_config[key.config_id]
-            conf_vector = convert_configurations_to_array([conf])[0]
-            if self.n_feats:
-                feats = self.instance_features[key.instance_id]
-                X[row, :] = np.hstack((conf_vector, feats))
-            else:
-                X[row, :] = conf_vector
-            # run_array[row, -1] = instances[row]
-            if return_time_as_y:
-                y[row, 0] = run.time
-            else:
-                y[row, 0] = run.cost
+        # Configurations are scaled by configSpace, X rows are cached by transform
+        X = self._X[positions]
+        if return_time_as_y:
+            y = runhistory.get_run_times()[positions].reshape(-1, 1)
+        else:
+            y = runhistory.get_run_costs()[positions].reshape(-1, 1)
 
         if y.size > 0:
             if store_statistics:
@@ -538,8 +539,8 @@ class RunHistory2EPM4LogScaledCost(RunHistory2EPM4Cost):
 class RunHistory2EPM4EIPS(AbstractRunHistory2EPM):
     """TODO"""
 
-    def _build_matrix(self, run_dict: typing.Mapping[RunKey, RunValue],
-                      runhistory: RunHistory, instances: typing.List[str] = None,
+    def _build_matrix(self, positions: np.ndarray,
+                      runhistory: RunHistory,
                       return_time_as_y: bool = False,
                       store_statistics: bool = False):
         """TODO"""
@@ -548,24 +549,10 @@ class RunHistory2EPM4EIPS(AbstractRunHistory2EPM):
         if store_statistics:
             raise NotImplementedError()
 
-        # First build nan-matrix of size #configs x #params+1
-        n_rows = len(run_dict)
-        n_cols = self.num_params
-        X = np.ones([n_rows, n_cols + self.n_feats]) * np.nan
-        y = np.ones([n_rows, 2])
-
-        # Then populate matrix
-        for row, (key, run) in enumerate(run_dict.items()):
-            # Scaling is automatically done in configSpace
-            conf = runhistory.ids_config[key.config_id]
-            conf_vector = convert_configurations_to_array([conf])[0]
-            if self.n_feats:
-                feats = self.instance_features[key.instance_id]
-                X[row, :] = np.hstack((conf_vector, feats))
-            else:
-                X[row, :] = conf_vector
-            y[row, 0] = run.cost
-            y[row, 1] = 1 + run.time
+        X = self._X[positions]
+        y = np.ones([positions.size, 2])
+        y[:, 0] = runhistory.get_run_costs()[positions]
+        y[:, 1] = 1 + runhistory.get_run_times()[positions]
 
         y = self.transform_response_values(values=y)
 
@@ -2,6 +2,7 @@ import datetime
 import json
 import os
 import pickle
+from typing import Dict, Optional
 
 import peewee as pw
 from ConfigSpace import ConfigurationSpace, Configuration
@@ -15,6 +16,12 @@ from generic_fs.utils import get_db_class_by_db_type
 
 
 class RunHistoryDB():
+    # rows written by other processes are read incrementally, from a watermark on their timestamps, which are
+    # assigned by the database when a row is inserted or updated (see ``get_now``).
+    # A row may be committed after its timestamp is computed, as late as a writer waits for the lock of the database,
+    # so rows of the last ``sync_overlap`` (at least the lock timeout) are read again, and skipped if they have
+    # already been read.
+    min_sync_overlap = datetime.timedelta(seconds=5)
 
     def __init__(self, config_space: ConfigurationSpace, runhistory, db_type="sqlite",
                  db_params=frozendict(), db_table_name="runhistory"):
@@ -39,6 +46,13 @@ class RunHistoryDB():
         # -----------------------------------------------------
         self.Model: pw.Model = self.get_model()
         self.config_space: ConfigurationSpace = config_space
+        # busy timeout of sqlite (5s by default in peewee), other databases should bound their lock waits by it
+        lock_timeout = datetime.timedelta(seconds=self.db_params.get("timeout", 5))
+        self.sync_overlap = max(self.min_sync_overlap, lock_timeout + datetime.timedelta(seconds=1))
+        # latest timestamp of the rows which have been read
+        self.watermark: Optional[datetime.datetime] = None
+        # run_id -> timestamp, of the rows read in the overlap window
+        self.fetched_runs: Dict[str, datetime.datetime] = {}
 
     def get_model(self) -> pw.Model:
         class Run_History(pw.Model):
@@ -56,15 +70,32 @@ class RunHistoryDB():
             origin = pw.IntegerField(default=0)
             weight = pw.FloatField(default=0.0)
             pid = pw.IntegerField(default=os.getpid)
-            timestamp = pw.DateTimeField(default=datetime.datetime.now)
+            timestamp = pw.DateTimeField(null=True, index=True)
 
             class Meta:
                 database = self.db
                 table_name = self.db_table_name
+                indexes = (
+                    (("pid", "origin"), False),
+                )
 
+        if self.db.table_exists(self.db_table_name) and \
+                ["timestamp"] not in [index.columns for index in self.db.get_indexes(self.db_table_name)]:
+            # table of an older version, timestamps of its rows are local times of their writers,
+            # which may be ahead of the database and would hold the watermark in the future
+            n_rows = Run_History.update(timestamp=self.get_now()).execute()
+            self.logger.info(f"Reset timestamps of {n_rows} records in run_history database.")
         self.db.create_tables([Run_History])
         return Run_History
 
+    def get_now(self) -> pw.Node:
+        # current time of the database (in UTC), so that timestamps do not depend on the clocks of the writers
+        if self.db_type == "sqlite":
+            return pw.fn.strftime("%Y-%m-%d %H:%M:%f", "now")
+        elif self.db_type == "postgresql":
+            return pw.SQL("(now() at time zone 'utc')")
+        return pw.SQL("UTC_TIMESTAMP(6)")
+
     def get_run_id(self, instance_id, config_id):
         return instance_id + "-" + config_id
 
@@ -77,7 +108,8 @@ class RunHistoryDB():
         try:
             self.Model.create(
                 run_id=run_id,
-                origin=-1
+                origin=-1,
+                timestamp=self.get_now()
             )
         except Exception as e:
             return False
@@ -106,10 +138,10 @@ class RunHistoryDB():
                 status=status.value,
                 additional_info=dict(additional_info),
                 origin=origin.value,
+                timestamp=self.get_now(),
             )
         except pw.IntegrityError:
-            self.Model(
-                run_id=run_id,
+            self.Model.update(
                 config_id=config_id,
                 config=config.get_dictionary(),
                 config_origin=config.origin,
@@ -121,7 +153,9 @@ class RunHistoryDB():
                 status=status.value,
                 additional_info=dict(additional_info),
                 origin=origin.value,
-            ).save()
+                pid=os.getpid(),
+                timestamp=self.get_now(),
+            ).where(self.Model.run_id == run_id).execute()
         self.timestamp = datetime.datetime.now()
 
     def fetch_new_runhistory(self, is_init=False):
@@ -130,10 +164,20 @@ class RunHistoryDB():
             if n_del > 0:
                 self.logger.info(f"Delete {n_del} invalid records in run_history database.")
             query = self.Model.select().where(self.Model.origin >= 0)
+            self.watermark = None
+            self.fetched_runs = {}
         else:
-            query = self.Model.select().where(self.Model.pid != os.getpid()).where(self.Model.origin >= 0)
+            query = self.Model.select().where((self.Model.pid != os.getpid()) & (self.Model.origin >= 0))
+            if self.watermark is not None:
+                query = query.where(self.Model.timestamp >= self.watermark - self.sync_overlap)
+        query = query.order_by(self.Model.timestamp)
         for model in query:
             run_id = model.run_id
+            if self.fetched_runs.get(run_id) == model.timestamp:
+                continue
+            self.fetched_runs[run_id] = model.timestamp
+            if self.watermark is None or model.timestamp > self.watermark:
+                self.watermark = model.timestamp
             config_id = model.config_id
             config = model.config
             config_bin = model.config_bin
@@ -158,4 +202,8 @@ class RunHistoryDB():
                 additional_info = {}
             self.runhistory.add(config, cost, time, StatusType(status), instance_id, seed, additional_info,
                                 DataOrigin(origin))
+        if self.watermark is not None:
+            # rows before the overlap window will not be read again
+            self.fetched_runs = {run_id: timestamp for run_id, timestamp in self.fetched_runs.items()
+                                 if timestamp >= self.watermark - self.sync_overlap}
         self.timestamp = datetime.datetime.now()
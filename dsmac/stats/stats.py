@@ -25,6 +25,10 @@ class Stats(object):
     wallclock_time_used
     ta_time_used
     inc_changed
+    surrogate_fits
+    surrogate_partial_fits
+    surrogate_fit_time
+    surrogate_predict_time
     """
 
     def __init__(self, scenario: Scenario,file_system=LocalFS()):
@@ -45,6 +49,12 @@ class Stats(object):
         self.ta_time_used = 0
         self.inc_changed = 0
 
+        # surrogate model of SMBO
+        self.surrogate_fits = 0
+        self.surrogate_partial_fits = 0
+        self.surrogate_fit_time = 0
+        self.surrogate_predict_time = 0
+
         # debug stats
         self._n_configs_per_intensify = 0
         self._n_calls_of_intensify = 0
@@ -194,6 +204,8 @@ class Stats(object):
         log_func("#Configurations: %d" %(self.n_configs))
         log_func("Used wallclock time: %.2f / %.2f sec " %(time.time() - self._start_time, self.__scenario.wallclock_limit))
         log_func("Used target algorithm runtime: %.2f / %.2f sec" %(self.ta_time_used, self.__scenario.algo_runs_timelimit))
+        log_func("Surrogate model: %d fits, %d partial fits, %.2f sec fitting, %.2f sec predicting" % (
+            self.surrogate_fits, self.surrogate_partial_fits, self.surrogate_fit_time, self.surrogate_predict_time))
         self._logger.debug("Debug Statistics:")
         if self._n_calls_of_intensify > 0:
             self._logger.debug("Average Configurations per Intensify: %.2f" %(self._n_configs_per_intensify / self._n_calls_of_intensify))
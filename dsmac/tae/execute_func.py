@@ -2,11 +2,13 @@ import inspect
 import logging
 import math
 import time
+import typing
 
 import numpy as np
 import pynisher
 
 from dsmac.tae.execute_ta_run import StatusType, ExecuteTARun
+from dsmac.tae.persistent_worker import PersistentWorker
 from dsmac.utils.constants import MAXINT
 
 __author__ = "Marius Lindauer, Matthias Feurer"
@@ -26,13 +28,17 @@ class AbstractTAFunc(ExecuteTARun):
     ----------
     memory_limit
     use_pynisher
+    persistent_worker
+    worker_initializer
     """
 
     def __init__(self, ta, stats=None, runhistory=None, run_obj: str = "quality",
                  memory_limit: int = None, par_factor: int = 1,
                  cost_for_crash: float = float(MAXINT),
                  abort_on_first_run_crash: bool = False,
-                 use_pynisher: bool = True):
+                 use_pynisher: bool = True,
+                 persistent_worker: bool = False,
+                 worker_initializer: typing.Callable = None):
         """
         Abstract class for having a function as target algorithm
 
@@ -59,6 +65,15 @@ class AbstractTAFunc(ExecuteTARun):
               * TA func can use as many resources 
               as it wants (time and memory) --- use with caution
               * all runs will be returned as SUCCESS if returned value is not None
+        persistent_worker: bool
+            only used if ``use_pynisher`` is True;
+            run the target algorithm in a long-lived worker process forked once (with the same
+            time and memory limits), instead of forking a new process for every run.
+            The worker is replaced only after a run hit a limit.
+        worker_initializer: callable, optional
+            only used if ``persistent_worker`` is True;
+            called in every worker process after it is forked, e.g. to disable the caches of the
+            target algorithm, which would count against the memory limit of the next runs.
             
         """
         super().__init__(ta=ta, stats=stats, runhistory=runhistory,
@@ -74,6 +89,9 @@ class AbstractTAFunc(ExecuteTARun):
         self.memory_limit = memory_limit
 
         self.use_pynisher = use_pynisher
+        self.persistent_worker = persistent_worker
+        self.worker_initializer = worker_initializer
+        self._worker = None
 
     def run(self, config, instance=None,
             cutoff=None,
@@ -132,7 +150,14 @@ class AbstractTAFunc(ExecuteTARun):
 
         if self.use_pynisher:
 
-            obj = pynisher.enforce_limits(**arguments)(self.ta)
+            if self.persistent_worker:
+                if self._worker is None:
+                    self._worker = PersistentWorker(self.ta, mem_in_mb=self.memory_limit,
+                                                    logger=arguments['logger'],
+                                                    initializer=self.worker_initializer)
+                obj = self._worker.enforce_limits(wall_time_in_s=cutoff)
+            else:
+                obj = pynisher.enforce_limits(**arguments)(self.ta)
             rval = self._call_ta(obj, config, **obj_kwargs)
 
             if isinstance(rval, tuple):
@@ -191,6 +216,12 @@ class AbstractTAFunc(ExecuteTARun):
 
         return status, cost, runtime, additional_run_info
 
+    def close(self):
+        """Stop the persistent worker, if any."""
+        if self._worker is not None:
+            self._worker.close()
+            self._worker = None
+
     def _call_ta(self, obj, config, instance, seed):
         raise NotImplementedError()
 
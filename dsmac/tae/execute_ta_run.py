@@ -1,5 +1,7 @@
 import logging
 import math
+import time
+import typing
 from enum import Enum
 
 import numpy as np
@@ -77,6 +79,8 @@ class ExecuteTARun(object):
     crash_cost
 
     logger
+    before_run
+    after_run
     """
 
     def __init__(self, ta, stats=None, runhistory=None,
@@ -115,6 +119,11 @@ class ExecuteTARun(object):
         self.logger = logging.getLogger(
             self.__module__ + '.' + self.__class__.__name__)
         self._supports_memory_limit = False
+        # called before each run, returns the wall time left for it (in seconds, may be inf);
+        # the run is not started if no time is left, and its cutoff is capped by the time left
+        self.before_run = None  # type: typing.Optional[typing.Callable[[], float]]
+        # called after each run with its wall time
+        self.after_run = None  # type: typing.Optional[typing.Callable[[float], None]]
 
     def start(self, config: Configuration,
               instance: str,
@@ -158,6 +167,13 @@ class ExecuteTARun(object):
         #         "Skip target algorithm run due to exhausted "
         #         "configuration budget")
 
+        if self.before_run is not None:
+            time_left = self.before_run()
+            if time_left <= 0:
+                raise BudgetExhaustedException("Skip target algorithm run: no time left")
+            if cutoff is not None and np.isfinite(time_left):
+                cutoff = max(min(cutoff, math.floor(time_left)), 1)
+
         if cutoff is not None:
             cutoff = int(math.ceil(cutoff))
         if cutoff is None and self.run_obj == "runtime":
@@ -165,11 +181,14 @@ class ExecuteTARun(object):
                               "(run objective), a cutoff time is required, "
                               "but not given to this call.")
 
+        start_time = time.time()
         status, cost, runtime, additional_info = self.run(config=config,
                                                           instance=instance,
                                                           cutoff=cutoff,
                                                           seed=seed,
                                                           instance_specific=instance_specific)
+        if self.after_run is not None:
+            self.after_run(time.time() - start_time)
 
         # update SMAC stats
         self.stats.ta_runs += 1
@@ -0,0 +1,173 @@
+import logging
+import multiprocessing
+import os
+import resource
+import signal
+import time
+import typing
+import weakref
+
+from pynisher import AnythingException, MemorylimitException, TimeoutException
+
+
+def _alarm_handler(signum, frame):
+    raise TimeoutException
+
+
+def _worker_loop(func, conn, parent_conn, mem_in_mb, logger, initializer=None):
+    parent_conn.close()
+    # the worker leads its own process group, so that processes spawned by ``func`` are killed with it
+    os.setsid()
+    signal.signal(signal.SIGALRM, _alarm_handler)
+    if initializer is not None:
+        initializer()
+    if mem_in_mb is not None:
+        mem_in_b = mem_in_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (mem_in_b, mem_in_b))
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        args, kwargs, wall_time_in_s = message
+        try:
+            if wall_time_in_s is not None:
+                signal.alarm(wall_time_in_s)
+            return_value = (func(*args, **kwargs), 0)
+        except MemoryError:
+            return_value = (None, MemorylimitException)
+        except TimeoutException:
+            return_value = (None, TimeoutException)
+        except Exception:
+            logger.exception("Target algorithm raised an exception.")
+            return_value = (None, AnythingException)
+        finally:
+            signal.alarm(0)
+        try:
+            conn.send(return_value)
+        except Exception:
+            logger.exception("Can not send the return value of the target algorithm.")
+            conn.send((None, AnythingException))
+        if return_value[1] in (MemorylimitException, TimeoutException):
+            # the state of the process is unknown after a limit is hit
+            break
+    conn.close()
+
+
+def _shutdown(process: multiprocessing.Process, conn):
+    try:
+        conn.send(None)
+    except Exception:
+        pass
+    conn.close()
+    process.join(1)
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    process.join()
+
+
+class PersistentWorker(object):
+    """Long-lived process which runs a function under wall time and memory limits.
+
+    ``pynisher.enforce_limits`` forks a new process for every call. Here, the process is forked once, with the
+    function (and the data it holds) in its memory, and serves the calls one after the other. As in pynisher,
+    the address space of the process is limited with ``RLIMIT_AS`` and an alarm interrupts a call which exceeds
+    its wall time. In addition, the parent kills the process group if no result comes back within the wall time
+    and a grace period (e.g. if the alarm is not handled because the function is stuck in native code).
+
+    The process is replaced only after a call hit one of the limits, or died. ``exit_status`` and
+    ``wall_clock_time`` of the last call have the values of pynisher's function wrapper.
+
+    The address space is limited once for the whole life of the process, so memory which ``func`` keeps
+    between calls (e.g. in-process caches) counts against the limit of the next calls. ``initializer`` is
+    called in the process after it is forked, e.g. to disable such caches.
+
+    Parameters
+    ----------
+    func : callable
+        Function to run, it is inherited by the forked process, not pickled
+    mem_in_mb : int, optional
+        Memory limit of the process (in MB)
+    grace_period_in_s : int
+        Time the parent waits for a result after the wall time before killing the process
+    logger : logging.Logger, optional
+    initializer : callable, optional
+        Function called without arguments in the process, before the first call
+    """
+
+    def __init__(self, func: typing.Callable, mem_in_mb: int = None, grace_period_in_s: int = 5,
+                 logger: logging.Logger = None, initializer: typing.Callable = None):
+        self.func = func
+        self.initializer = initializer
+        self.mem_in_mb = mem_in_mb
+        self.grace_period_in_s = grace_period_in_s
+        self.logger = logger if logger is not None else logging.getLogger("pynisher")
+        self.wall_time_in_s = None
+        self.process = None
+        self.conn = None
+        self._finalizer = None
+        self._reset_attributes()
+
+    def _reset_attributes(self):
+        self.result = None
+        self.exit_status = None
+        self.wall_clock_time = None
+
+    def enforce_limits(self, wall_time_in_s: int = None) -> "PersistentWorker":
+        """Set the wall time limit of the next calls, the worker is used as the wrapped function of pynisher."""
+        self.wall_time_in_s = wall_time_in_s
+        return self
+
+    def start(self):
+        # fork explicitly: the function and its data are shared with the worker instead of being pickled
+        context = multiprocessing.get_context("fork")
+        parent_conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_loop, name="persistent worker",
+            args=(self.func, child_conn, parent_conn, self.mem_in_mb, self.logger, self.initializer))
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self._finalizer = weakref.finalize(self, _shutdown, self.process, self.conn)
+        self.logger.debug(f"Started persistent worker {self.process.pid}.")
+
+    def recycle(self):
+        if self._finalizer is not None:
+            self._finalizer()
+        self.process = None
+        self.conn = None
+        self._finalizer = None
+
+    def close(self):
+        self.recycle()
+
+    def __call__(self, *args, **kwargs):
+        self._reset_attributes()
+        if self.process is not None and not self.process.is_alive():
+            self.recycle()
+        if self.process is None:
+            self.start()
+        start = time.time()
+        answered = False
+        try:
+            self.conn.send((args, kwargs, self.wall_time_in_s))
+            if self.wall_time_in_s is None or self.conn.poll(self.wall_time_in_s + self.grace_period_in_s):
+                self.result, self.exit_status = self.conn.recv()
+                answered = True
+            else:
+                self.logger.debug(f"Persistent worker {self.process.pid} did not return in time, kill it.")
+                self.exit_status = TimeoutException
+        except (EOFError, OSError):
+            self.logger.debug("Persistent worker closed the pipe prematurely -> it probably got an uncatchable signal.")
+            self.exit_status = AnythingException
+        finally:
+            self.wall_clock_time = time.time() - start
+            # the worker exits after a limit is hit, a function which raised an exception leaves it alive
+            if not answered or self.exit_status in (MemorylimitException, TimeoutException):
+                self.recycle()
+            self.exit_status = 5 if self.exit_status is None else self.exit_status
+        return self.result
@@ -0,0 +1,213 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Type, Optional
+
+
+class ParallelMembersWriter(io.RawIOBase):
+    '''
+    Split the stream in chunks which are compressed by a thread pool, each chunk is written as an
+    independent stream (bz2) or frame (lz4) of the file. Readers of these formats (including joblib's)
+    decompress concatenated streams as one stream, as ``pbzip2`` files.
+    '''
+
+    def __init__(self, f, compress: Callable[[bytes], bytes], threads: int, chunk_size: int = 1 << 22):
+        self.f = f
+        self.compress = compress
+        self.threads = threads
+        self.chunk_size = chunk_size
+        self.executor = ThreadPoolExecutor(threads) if threads > 1 else None
+        self.buffer = bytearray()
+        self.pending = deque()
+        self.n_members = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.buffer += b
+        while len(self.buffer) >= self.chunk_size:
+            self._submit(bytes(self.buffer[:self.chunk_size]))
+            del self.buffer[:self.chunk_size]
+        return len(b)
+
+    def _submit(self, chunk: bytes):
+        self.n_members += 1
+        if self.executor is None:
+            self.f.write(self.compress(chunk))
+            return
+        self.pending.append(self.executor.submit(self.compress, chunk))
+        # bound the memory of chunks waiting to be written
+        while len(self.pending) > 2 * self.threads:
+            self.f.write(self.pending.popleft().result())
+
+    def tail(self) -> bytes:
+        return b""
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self.buffer or self.n_members == 0:
+                self._submit(bytes(self.buffer))
+                self.buffer = bytearray()
+            while self.pending:
+                self.f.write(self.pending.popleft().result())
+            self.f.write(self.tail())
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+            self.f.close()
+            super(ParallelMembersWriter, self).close()
+
+
+def _deflate_chunk(chunk: bytes, level: int) -> bytes:
+    # raw deflate blocks ending on a byte boundary (sync flush), so that compressed chunks can be concatenated
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+class ParallelGzipWriter(ParallelMembersWriter):
+    '''
+    Chunks deflated by a thread pool in one gzip member, as ``pigz``: joblib's gzip reader does not read
+    concatenated members. Chunks do not share their dictionary, so the file is slightly larger.
+    '''
+
+    def __init__(self, f, level: int, threads: int, chunk_size: int = 1 << 22):
+        super(ParallelGzipWriter, self).__init__(f, lambda chunk: _deflate_chunk(chunk, level), threads, chunk_size)
+        self.level = level
+        self.crc = 0
+        self.size = 0
+        # magic, deflate, no flags, no mtime, no extra flags, unknown os
+        self.f.write(b"\x1f\x8b\x08\x00" + struct.pack("<I", 0) + b"\x00\xff")
+
+    def write(self, b):
+        self.crc = zlib.crc32(b, self.crc)
+        self.size += len(memoryview(b).cast("B"))
+        return super(ParallelGzipWriter, self).write(b)
+
+    def tail(self) -> bytes:
+        last_block = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS).flush(zlib.Z_FINISH)
+        return last_block + struct.pack("<II", self.crc, self.size & 0xffffffff)
+
+
+class Codec():
+    '''
+    Compression of pickled artifacts, chosen by the suffix of their path.
+
+    Parameters
+    ----------
+    level: int or None
+        compression level, the default level of the codec if None.
+    threads: int
+        number of threads which compress the stream, if the codec supports it.
+    '''
+    suffix = "pkl"
+    default_level = None
+
+    def __init__(self, level=None, threads=1):
+        self.level = self.default_level if level is None else level
+        self.threads = max(int(threads), 1)
+
+    def open_writer(self, path):
+        return open(path, "wb")
+
+    def open_reader(self, path):
+        return open(path, "rb")
+
+
+class GzipCodec(Codec):
+    suffix = "gz"
+    default_level = 6
+
+    def open_writer(self, path):
+        if self.threads > 1:
+            return ParallelGzipWriter(open(path, "wb"), self.level, self.threads)
+        return gzip.GzipFile(path, "wb", compresslevel=self.level, mtime=0)
+
+    def open_reader(self, path):
+        return gzip.open(path, "rb")
+
+
+class Bz2Codec(Codec):
+    suffix = "bz2"
+    default_level = 9
+
+    def open_writer(self, path):
+        if self.threads > 1:
+            return ParallelMembersWriter(
+                open(path, "wb"), lambda chunk: bz2.compress(chunk, self.level), self.threads)
+        return bz2.open(path, "wb", compresslevel=self.level)
+
+    def open_reader(self, path):
+        return bz2.open(path, "rb")
+
+
+class XzCodec(Codec):
+    # python's lzma has no multithreaded compressor
+    suffix = "xz"
+    default_level = 6
+
+    def open_writer(self, path):
+        return lzma.open(path, "wb", preset=self.level)
+
+    def open_reader(self, path):
+        return lzma.open(path, "rb")
+
+
+class Lz4Codec(Codec):
+    suffix = "lz4"
+    default_level = 0
+
+    def open_writer(self, path):
+        import lz4.frame
+        if self.threads > 1:
+            return ParallelMembersWriter(
+                open(path, "wb"), lambda chunk: lz4.frame.compress(chunk, compression_level=self.level),
+                self.threads)
+        return lz4.frame.open(path, "wb", compression_level=self.level)
+
+    def open_reader(self, path):
+        import lz4.frame
+        return lz4.frame.open(path, "rb")
+
+
+class ZstdCodec(Codec):
+    suffix = "zst"
+    default_level = 3
+
+    def open_writer(self, path):
+        import zstandard
+        # zstd compresses with its own worker threads
+        compressor = zstandard.ZstdCompressor(level=self.level, threads=self.threads if self.threads > 1 else 0)
+        return compressor.stream_writer(open(path, "wb"), closefd=True)
+
+    def open_reader(self, path):
+        import zstandard
+        # buffered, so that joblib can peek the header of the stream
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True))
+
+
+suffix2codec: Dict[str, Type[Codec]] = {
+    codec.suffix: codec for codec in (Codec, GzipCodec, Bz2Codec, XzCodec, Lz4Codec, ZstdCodec)
+}
+name2suffix = {"none": "pkl", "gzip": "gz", "lzma": "xz", "zstd": "zst"}
+
+
+def get_suffix(name: str) -> str:
+    '''suffix of the codec ``name`` (e.g. "zstd" or "zst"), unknown names are returned as is.'''
+    return name2suffix.get(name, name)
+
+
+def get_codec(path: str, level=None, threads=1) -> Optional[Codec]:
+    '''codec of ``path``, None if its suffix is unknown.'''
+    suffix = os.path.splitext(path)[1].lstrip(".")
+    if suffix not in suffix2codec:
+        return None
+    return suffix2codec[suffix](level, threads)
@@ -5,9 +5,16 @@ import pandas as pd
 from joblib import dump, load
 
 from generic_fs import FileSystem
+from generic_fs.codecs import get_codec
 
 
 class LocalFS(FileSystem):
+    def __init__(self, compress_threads=1, compress_levels=None):
+        # threads of the codecs which can compress in parallel, one stream is written with 1 thread
+        self.compress_threads = compress_threads
+        # suffix -> compression level
+        self.compress_levels = dict(compress_levels or {})
+
     def listdir(self, parent, **kwargs):
         return os.listdir(parent)
 
@@ -46,10 +53,21 @@ class LocalFS(FileSystem):
             pass
 
     def dump_pickle(self, data, path):
-        dump(data, path)
+        codec = get_codec(path, threads=self.compress_threads)
+        if codec is None:
+            # joblib infers the compression from the extension
+            dump(data, path)
+            return
+        codec.level = self.compress_levels.get(codec.suffix, codec.level)
+        with codec.open_writer(path) as f:
+            dump(data, f)
 
     def load_pickle(self, path):
-        return load(path)
+        codec = get_codec(path)
+        if codec is None:
+            return load(path)
+        with codec.open_reader(path) as f:
+            return load(f)
 
     def dump_csv(self, data:pd.DataFrame, path,**kwargs):
         data.to_csv(path,**kwargs)
@@ -0,0 +1,64 @@
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier
+
+from generic_fs.codecs import suffix2codec
+from generic_fs.local import LocalFS
+
+# dump/load time and size of AutoFlow artifacts with each codec of ``generic_fs.codecs``
+# usage: python run_codec_benchmark.py [store_path] [compress_threads]
+# artifacts are the models and datasets in ``store_path`` (e.g. ``~/autoflow``) if it is given,
+# otherwise a dataset and tree ensembles fitted on it, as AutoFlow stores them.
+store_path = os.path.expanduser(sys.argv[1]) if len(sys.argv) > 1 else None
+compress_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+
+def get_artifacts():
+    fs = LocalFS()
+    if store_path:
+        for path in sorted(glob.glob(os.path.join(store_path, "trials", "*", "*", "*")))[:10] + \
+                    sorted(glob.glob(os.path.join(store_path, "datasets", "*"))):
+            yield os.path.relpath(path, store_path), fs.load_pickle(path)
+        return
+    df = pd.read_csv(os.path.join(os.path.dirname(__file__), "../examples/data/train_classification.csv"))
+    y = df.pop("Survived")
+    X = df.select_dtypes("number").fillna(0)
+    yield "datasets/Xy_train", [df, y]
+    for klass in (RandomForestClassifier, ExtraTreesClassifier):
+        # models of a trial are a list of the models of each fold
+        models = [klass(n_estimators=300, random_state=i).fit(X, y) for i in range(5)]
+        yield f"trials/{klass.__name__}", models
+
+
+if __name__ == '__main__':
+    directory = tempfile.mkdtemp()
+    fs = LocalFS(compress_threads=compress_threads)
+    available = []
+    for suffix, codec in suffix2codec.items():
+        try:
+            codec().open_writer(os.path.join(directory, f"probe.{suffix}")).close()
+            available.append(suffix)
+        except ImportError as e:
+            print(f"skip {suffix}: {e}")
+    print(f"compress_threads = {fs.compress_threads}")
+    try:
+        for name, artifact in get_artifacts():
+            print(name)
+            for suffix in available:
+                path = os.path.join(directory, f"artifact.{suffix}")
+                start = time.time()
+                fs.dump_pickle(artifact, path)
+                dump_time = time.time() - start
+                start = time.time()
+                fs.load_pickle(path)
+                load_time = time.time() - start
+                print(f"    {suffix:4}  size = {os.path.getsize(path) / 1024 / 1024:8.2f}MB  "
+                      f"dump = {dump_time:7.3f}s  load = {load_time:7.3f}s")
+    finally:
+        shutil.rmtree(directory)
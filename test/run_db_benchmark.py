@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from autoflow.manager.resource_manager import ResourceManager
+
+# insert throughput of trials table as tuner workers scale, with and without ``ResourceManager.pooled_db``
+# usage: python run_db_benchmark.py [n_trials_per_worker] [max_workers]
+n_trials = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+
+def insert_trials(resource_manager: ResourceManager, n_trials, errors):
+    rng = np.random.RandomState(os.getpid())
+    for i in range(n_trials):
+        try:
+            resource_manager.insert_to_trials_table({
+                "config_id": f"{os.getpid()}_{i}",
+                "estimator": "logistic_regression",
+                "loss": rng.rand(),
+                "losses": [rng.rand()],
+                "all_score": {"accuracy": rng.rand()},
+                "models": None,
+                "intermediate_result": None,
+                "y_true_indexes": np.arange(100),
+                "y_preds": rng.rand(100, 2),
+                "status": "SUCCESS",
+            })
+        except Exception as e:
+            errors.append(str(e))
+
+
+def run(store_path, pooled_db, n_workers):
+    resource_manager = ResourceManager(store_path, persistent_mode="db", pooled_db=pooled_db)
+    resource_manager.task_id = f"benchmark_{n_workers}_{int(pooled_db)}"
+    resource_manager.hdl_id = ""
+    resource_manager.experiment_id = 0
+    resource_manager.init_trials_table()
+    resource_manager.close_trials_table()
+    errors = multiprocessing.Manager().list()
+    processes = [multiprocessing.Process(target=insert_trials, args=(resource_manager, n_trials, errors))
+                 for _ in range(n_workers)]
+    start = time.time()
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    cost_time = time.time() - start
+    resource_manager.init_trials_table()
+    n_inserted = resource_manager.TrialsModel.select().count()
+    print(f"pooled_db = {pooled_db!s:5}  workers = {n_workers:2d}  inserted = {n_inserted:5d}  "
+          f"errors = {len(errors):4d}  time = {cost_time:7.2f}s  throughput = {n_inserted / cost_time:8.1f} trials/s")
+
+
+if __name__ == '__main__':
+    store_path = tempfile.mkdtemp()
+    try:
+        n_workers = 1
+        while n_workers <= max_workers:
+            for pooled_db in (False, True):
+                run(store_path, pooled_db, n_workers)
+            n_workers *= 2
+    finally:
+        shutil.rmtree(store_path)
@@ -0,0 +1,84 @@
+import sys
+import time
+
+import numpy as np
+
+from dsmac.configspace import ConfigurationSpace, UniformFloatHyperparameter, CategoricalHyperparameter, \
+    InCondition
+from dsmac.configspace.util import convert_configurations_to_array
+from dsmac.epm.rf_with_instances import RandomForestWithInstances
+from dsmac.epm.util_funcs import get_types
+
+# predictions of ``RandomForestWithInstances`` with the trees flattened into arrays (``FlatForest``) against
+# the per-row pyrfr calls, on the same fitted forest, with and without log_y and instance features.
+# usage: python run_flat_forest_benchmark.py [n_train] [n_predict]
+# predictions are asserted to be equal: exactly for ``predict`` of a trained forest, up to rounding when they
+# are marginalized over instances or the forest is partially trained.
+n_train = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+n_predict = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+
+def get_config_space():
+    cs = ConfigurationSpace(seed=1)
+    classifier = CategoricalHyperparameter("classifier", ["a", "b", "c"])
+    cs.add_hyperparameters([classifier] + [UniformFloatHyperparameter(f"x{i}", 0, 1) for i in range(5)])
+    # inactive hyperparameters are imputed before the prediction
+    c = UniformFloatHyperparameter("c", 1e-3, 1e3, log=True)
+    cs.add_hyperparameter(c)
+    cs.add_condition(InCondition(c, classifier, ["a"]))
+    return cs
+
+
+def get_data(cs: ConfigurationSpace, n: int, instance_features):
+    X = convert_configurations_to_array(cs.sample_configuration(n))
+    if instance_features is not None:
+        X = np.hstack((X, instance_features[np.arange(n) % len(instance_features)]))
+    y = np.nansum(X, axis=1) + np.random.RandomState(1).rand(n)
+    return X, y.reshape((-1, 1))
+
+
+def timed(function, *args):
+    start = time.time()
+    result = function(*args)
+    return result, time.time() - start
+
+
+def compare(log_y: bool, instance_features=None):
+    cs = get_config_space()
+    types, bounds = get_types(cs, instance_features)
+    model = RandomForestWithInstances(cs, types=types, bounds=bounds, seed=1, log_y=log_y,
+                                      instance_features=instance_features)
+    X, y = get_data(cs, n_train, instance_features)
+    model.train(X, y)
+    X_test, _ = get_data(cs, n_predict, instance_features)
+    X_configs = X_test[:, :len(cs.get_hyperparameters())]
+
+    name = f"log_y={log_y}, instances={0 if instance_features is None else len(instance_features)}"
+    for stage in ("trained", "partially trained"):
+        if stage == "partially trained":
+            # leaves updated by ``pseudo_update``, their statistics are rounded differently
+            model.partial_train(*get_data(cs, n_train // 10, instance_features))
+        for method, X_method, exact in (
+                ("predict", X_test, stage == "trained"),
+                ("predict_marginalized_over_instances", X_configs, stage == "trained" and instance_features is None)):
+            model.batch_predict = False
+            (rfr_means, rfr_vars), rfr_time = timed(getattr(model, method), X_method)
+            model.batch_predict = True
+            # the trees are flattened once after the training, not in each prediction
+            model._get_flat_forest()
+            (flat_means, flat_vars), flat_time = timed(getattr(model, method), X_method)
+            if exact:
+                assert np.array_equal(rfr_means, flat_means) and np.array_equal(rfr_vars, flat_vars), \
+                    (name, stage, method)
+            else:
+                assert np.allclose(rfr_means, flat_means, rtol=1e-12, atol=1e-12) and \
+                    np.allclose(rfr_vars, flat_vars, rtol=1e-12, atol=1e-12), (name, stage, method)
+            print(f"{name:25} {stage:17} {method:36} {X_method.shape[0]} rows  pyrfr = {rfr_time * 1000:8.1f}ms  "
+                  f"flat = {flat_time * 1000:8.1f}ms  max diff = {np.max(np.abs(rfr_means - flat_means)):.1e}")
+
+
+if __name__ == '__main__':
+    instance_features = np.random.RandomState(1).rand(4, 2)
+    for log_y in (False, True):
+        compare(log_y)
+        compare(log_y, instance_features)
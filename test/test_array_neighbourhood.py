@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+from ConfigSpace.conditions import AndConjunction, EqualsCondition, GreaterThanCondition
+from ConfigSpace.forbidden import ForbiddenAndConjunction, ForbiddenEqualsClause
+
+from dsmac.configspace import ConfigurationSpace, Configuration, CategoricalHyperparameter, \
+    UniformFloatHyperparameter, UniformIntegerHyperparameter, InCondition, get_one_exchange_neighbourhood
+from dsmac.configspace.array_neighbourhood import ArrayNeighbourhood
+
+
+class TestArrayNeighbourhood(unittest.TestCase):
+    def setUp(self):
+        cs = ConfigurationSpace(seed=1)
+        classifier = CategoricalHyperparameter("classifier", ["svm", "tree", "knn"])
+        kernel = CategoricalHyperparameter("kernel", ["rbf", "poly", "linear"])
+        degree = UniformIntegerHyperparameter("degree", 2, 5, default_value=3)
+        gamma = UniformFloatHyperparameter("gamma", 1e-4, 10, log=True)
+        depth = UniformIntegerHyperparameter("depth", 1, 16, default_value=4)
+        min_samples = UniformFloatHyperparameter("min_samples", 0, 1)
+        # active if min_samples > 0.5, a condition on a numerical parent
+        criterion = CategoricalHyperparameter("criterion", ["gini", "entropy"])
+        n_neighbors = UniformIntegerHyperparameter("n_neighbors", 1, 20, default_value=5)
+        scale = CategoricalHyperparameter("scale", [True, False])
+        cs.add_hyperparameters([classifier, kernel, degree, gamma, depth, min_samples, criterion, n_neighbors, scale])
+        cs.add_conditions([
+            EqualsCondition(kernel, classifier, "svm"),
+            # nested condition
+            EqualsCondition(degree, kernel, "poly"),
+            InCondition(gamma, kernel, ["rbf", "poly"]),
+            EqualsCondition(depth, classifier, "tree"),
+            EqualsCondition(min_samples, classifier, "tree"),
+            AndConjunction(EqualsCondition(criterion, classifier, "tree"),
+                           GreaterThanCondition(criterion, min_samples, 0.5)),
+            EqualsCondition(n_neighbors, classifier, "knn"),
+        ])
+        cs.add_forbidden_clauses([
+            ForbiddenAndConjunction(ForbiddenEqualsClause(classifier, "svm"), ForbiddenEqualsClause(scale, False)),
+            ForbiddenEqualsClause(degree, 5),
+            ForbiddenAndConjunction(ForbiddenEqualsClause(depth, 16), ForbiddenEqualsClause(criterion, "gini")),
+        ])
+        self.cs = cs
+        self.configs = cs.sample_configuration(60)
+        self.vectors = np.array([config.get_array() for config in self.configs])
+
+    @staticmethod
+    def get_changed(vector: np.ndarray, neighbour: np.ndarray) -> int:
+        # the hyperparameter of the one-exchange, conditional ones may be (de)activated with it
+        changed = np.flatnonzero(~((vector == neighbour) | (np.isnan(vector) & np.isnan(neighbour))))
+        return changed[0]
+
+    def test_valid_configurations(self):
+        neighbours, origins = ArrayNeighbourhood(self.cs).get_neighbours(self.vectors, np.random.RandomState(1))
+        self.assertEqual(neighbours.shape[0], origins.shape[0])
+        self.assertTrue(np.all(np.diff(origins) >= 0))
+        for neighbour in neighbours:
+            config = Configuration(self.cs, vector=neighbour)
+            config.is_valid_configuration()
+            # conditional hyperparameters are active with their default value, inactive ones are NaN
+            np.testing.assert_array_equal(config.get_array(), neighbour)
+
+    def test_covers_one_exchange_neighbourhood(self):
+        neighbourhood = ArrayNeighbourhood(self.cs)
+        rng = np.random.RandomState(1)
+        numericals = {self.cs.get_idx_by_hyperparameter_name(hp.name) for hp in self.cs.get_hyperparameters()
+                      if isinstance(hp, (UniformFloatHyperparameter, UniformIntegerHyperparameter))}
+        for config, vector in zip(self.configs, self.vectors):
+            neighbours, _ = neighbourhood.get_neighbours(vector, rng)
+            changed = {self.get_changed(vector, neighbour) for neighbour in neighbours}
+            rows = {tuple(np.nan_to_num(neighbour, nan=-1)) for neighbour in neighbours}
+            for expected in get_one_exchange_neighbourhood(config, seed=1):
+                expected = expected.get_array()
+                idx = self.get_changed(vector, expected)
+                if idx in numericals:
+                    # random steps, the same hyperparameter is changed
+                    self.assertIn(idx, changed)
+                else:
+                    # all the other choices of categorical hyperparameters
+                    self.assertIn(tuple(np.nan_to_num(expected, nan=-1)), rows)
@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from copy import deepcopy
+from queue import Queue
+from types import SimpleNamespace
+
+import numpy as np
+
+from autoflow.evaluation.base import BaseEvaluator
+from autoflow.tuner.tuner import Tuner
+from dsmac.configspace import ConfigurationSpace, UniformFloatHyperparameter
+from dsmac.configspace.util import convert_configurations_to_array
+from dsmac.facade.smac_hpo_facade import SMAC4HPO
+from dsmac.scenario.scenario import Scenario
+
+# configurations evaluated by all the workers (threads) of a test
+EVALUATED = []
+
+
+def evaluate(config, seed=0, instance=""):
+    return (config["x"] - 0.3) ** 2 + config["y"]
+
+
+class Evaluator(BaseEvaluator):
+    def __init__(self):
+        self.resource_manager = SimpleNamespace(delete_models=lambda: True)
+
+    def __call__(self, config, seed=0, instance=""):
+        EVALUATED.append(config)
+        return evaluate(config)
+
+
+class RecordingQueue(Queue):
+    # records the proposals of the optimizer
+    def __init__(self):
+        super().__init__()
+        self.proposals = []
+
+    def put(self, item, block=True, timeout=None):
+        if item is not None:
+            self.proposals.append(item)
+        super().put(item, block, timeout)
+
+
+def get_config_space():
+    cs = ConfigurationSpace(seed=1)
+    cs.add_hyperparameters([UniformFloatHyperparameter("x", 0, 1), UniformFloatHyperparameter("y", 0, 1)])
+    return cs
+
+
+class TestChooseNextBatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cs = get_config_space()
+        scenario = Scenario({"run_obj": "quality", "cs": self.cs, "deterministic": "true", "instances": [["i0"]],
+                             "cutoff_time": 10, "runcount-limit": 1000, "output_dir": ""},
+                            initial_runs=0, db_params={"database": os.path.join(self.directory, "runhistory.db")},
+                            use_pynisher=False)
+        self.smac = SMAC4HPO(scenario=scenario, rng=np.random.RandomState(1), tae_runner=evaluate,
+                             initial_configurations=[])
+        self.solver = self.smac.solver
+        self.solver.stats.start_timing()
+        configs = self.cs.sample_configuration(8)
+        for config in configs:
+            config.origin = "Random Search"
+            self.solver.evaluate_([config])
+        self.X, self.Y = self.solver.rh2EPM.transform(self.solver.runhistory)
+        self.pending = self.cs.sample_configuration(2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_distinct_configs(self):
+        self.assertEqual(self.X.shape[0], 8)
+        batch = self.solver.choose_next_batch(self.X, self.Y, 4, self.pending)
+        self.assertEqual(len(batch), 4)
+        self.assertEqual(len(set(batch)), 4)
+        # neither evaluated nor being evaluated
+        self.assertFalse(set(batch) & set(self.solver.runhistory.get_all_configs()))
+        self.assertFalse(set(batch) & set(self.pending))
+
+    def test_trained_once(self):
+        n_trains = []
+        train = self.solver.model.train
+        self.solver.model.train = lambda X, Y: n_trains.append(X.shape[0]) or train(X, Y)
+        stats = self.solver.stats
+        for i in range(2):
+            n_partial_fits = stats.surrogate_partial_fits
+            self.solver.choose_next_batch(self.X, self.Y, 4, self.pending)
+            # on the observations only, the pending configurations and the batch are fantasized
+            self.assertEqual(n_trains, [8] * (i + 1))
+            self.assertEqual(stats.surrogate_partial_fits - n_partial_fits, 4)
+
+    def test_liars(self):
+        for liar in ("min", "mean", "max", "believer"):
+            with self.subTest(liar=liar):
+                fantasies = []
+                add_fantasies = self.solver._add_fantasies
+
+                def record_fantasies(configs, X, Y, y_liar):
+                    predicted = self.solver.model.predict(convert_configurations_to_array(configs))[0]
+                    X_train, Y_train = add_fantasies(configs, X, Y, y_liar)
+                    fantasies.append((Y_train[-len(configs):], predicted))
+                    return X_train, Y_train
+
+                self.solver._add_fantasies = record_fantasies
+                try:
+                    self.solver.choose_next_batch(self.X, self.Y, 3, self.pending, liar)
+                finally:
+                    del self.solver._add_fantasies
+                # the pending configurations, then the first two of the batch
+                self.assertEqual([Y_fantasy.shape[0] for Y_fantasy, _ in fantasies], [2, 1, 1])
+                for Y_fantasy, predicted in fantasies:
+                    if liar == "believer":
+                        np.testing.assert_allclose(Y_fantasy, predicted)
+                    else:
+                        np.testing.assert_allclose(Y_fantasy, getattr(np, liar)(self.Y))
+        self.assertLess(np.min(self.Y), np.mean(self.Y))
+        self.assertLess(np.mean(self.Y), np.max(self.Y))
+
+
+class TestBatchTuner(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # smac writes its output in the working directory
+        self.cwd = os.getcwd()
+        os.chdir(self.directory)
+        EVALUATED.clear()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def test_batch_tuner(self):
+        n_workers = 3
+        tuner = Tuner(evaluator=Evaluator(), run_limit=7, limit_resource=False, n_jobs=n_workers,
+                      search_method_params={"batch_size": 2})
+        tuner.shps = get_config_space()
+        self.assertTrue(tuner.is_batch_mode())
+        initial_configs = tuner.shps.sample_configuration(3)
+        kwargs = {"instance_id": "task", "rh_db_params": {"database": os.path.join(self.directory, "runhistory.db")}}
+        proposal_queue, result_queue = RecordingQueue(), Queue()
+        workers = [threading.Thread(target=deepcopy(tuner).run_batch_worker,
+                                    args=(proposal_queue, result_queue), kwargs=kwargs)
+                   for _ in range(n_workers)]
+        for worker in workers:
+            worker.start()
+        tuner.run_batch_optimizer(initial_configs, proposal_queue, result_queue, n_workers,
+                                  lambda: any(worker.is_alive() for worker in workers), **kwargs)
+        for worker in workers:
+            worker.join()
+        # the initial configurations, then batches up to the run limit
+        vectors = [tuple(vector) for vector, _ in proposal_queue.proposals]
+        self.assertEqual(len(vectors), 3 + 7)
+        self.assertEqual(len(set(vectors)), len(vectors))
+        self.assertEqual([origin for _, origin in proposal_queue.proposals[:3]], ["Initial design"] * 3)
+        # every proposal is evaluated once, by whichever worker is idle
+        self.assertEqual(sorted(tuple(config.get_array()) for config in EVALUATED), sorted(vectors))
+        # the workers are stopped once the run limit is proposed
+        self.assertFalse(any(worker.is_alive() for worker in workers))
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import joblib
+import numpy as np
+
+from generic_fs.codecs import suffix2codec
+from generic_fs.local import LocalFS
+
+
+class TestCodecs(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # more than one chunk (4MB) of ``ParallelMembersWriter``, compressible so that bz2 is fast
+        self.data = {"array": np.tile(np.arange(1000, dtype="float64"), 1200), "list": list(range(100))}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_suffixes(self):
+        suffixes = []
+        for suffix, codec in suffix2codec.items():
+            try:
+                codec().open_writer(os.path.join(self.directory, f"probe.{suffix}")).close()
+            except ImportError:
+                continue
+            suffixes.append(suffix)
+        return suffixes
+
+    def assert_data_equal(self, data):
+        self.assertTrue(np.array_equal(data["array"], self.data["array"]))
+        self.assertEqual(data["list"], self.data["list"])
+
+    def test_round_trip(self):
+        for compress_threads in (1, 4):
+            fs = LocalFS(compress_threads=compress_threads)
+            for suffix in self.get_suffixes():
+                with self.subTest(suffix=suffix, compress_threads=compress_threads):
+                    path = os.path.join(self.directory, f"artifact.{suffix}")
+                    fs.dump_pickle(self.data, path)
+                    self.assert_data_equal(fs.load_pickle(path))
+                    if suffix != "zst":  # joblib has no zstd reader
+                        self.assert_data_equal(joblib.load(path))
+
+    def test_load_joblib_files(self):
+        fs = LocalFS()
+        for suffix in self.get_suffixes():
+            if suffix == "zst":
+                continue
+            with self.subTest(suffix=suffix):
+                path = os.path.join(self.directory, f"joblib.{suffix}")
+                joblib.dump(self.data, path)
+                self.assert_data_equal(fs.load_pickle(path))
+
+    def test_empty(self):
+        for compress_threads in (1, 4):
+            fs = LocalFS(compress_threads=compress_threads)
+            for suffix in self.get_suffixes():
+                with self.subTest(suffix=suffix, compress_threads=compress_threads):
+                    path = os.path.join(self.directory, f"empty.{suffix}")
+                    fs.dump_pickle({}, path)
+                    self.assertEqual(fs.load_pickle(path), {})
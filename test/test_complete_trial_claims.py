@@ -0,0 +1,40 @@
+import multiprocessing
+import shutil
+import tempfile
+import unittest
+
+from autoflow.manager.resource_manager import ResourceManager
+
+
+def claim(resource_manager, config_id, results):
+    results.append(resource_manager.claim_complete_trial(config_id))
+
+
+class TestCompleteTrialClaims(unittest.TestCase):
+    def setUp(self):
+        self.store_path = tempfile.mkdtemp()
+        self.resource_manager = ResourceManager(self.store_path)
+        self.resource_manager.task_id = "claims"
+        self.resource_manager.hdl_id = ""
+        self.resource_manager.experiment_id = 0
+        self.resource_manager.init_trials_table()
+
+    def tearDown(self):
+        shutil.rmtree(self.store_path)
+
+    def test_one_claim_per_config(self):
+        # workers which finish the last folds of a config together
+        results = multiprocessing.Manager().list()
+        processes = [multiprocessing.Process(target=claim, args=(self.resource_manager, "config", results))
+                     for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(sorted(results), [False, False, False, True])
+
+    def test_release(self):
+        self.assertTrue(self.resource_manager.claim_complete_trial("config"))
+        self.assertFalse(self.resource_manager.claim_complete_trial("config"))
+        self.resource_manager.release_complete_trial("config")
+        self.assertTrue(self.resource_manager.claim_complete_trial("config"))
@@ -3,6 +3,7 @@ import unittest
 import numpy as np
 import pandas as pd
 
+from autoflow.pipeline.block_dataframe import BlockDataFrame
 from autoflow.pipeline.dataframe import GenericDataFrame
 
 
@@ -40,6 +41,79 @@ class TestGeneralDataFrame(unittest.TestCase):
         self.assertTrue(np.all(df3.feature_groups == pd.Series(suffix)))
         self.assertTrue(np.all(df3.columns_metadata == pd.Series(suffix)))
 
+    def test_dtypes_of_new_columns(self):
+        df = GenericDataFrame(pd.DataFrame({"a": [1.5, 2.5, 3.5], "b": ["x", "y", "x"], "c": [1, 2, 3]}),
+                              feature_groups=["num", "cat", "num"])
+        # an object array of mixed categorical and numerical columns
+        values = df.values
+        self.assertEqual(values.dtype, object)
+        df2 = df.replace_feature_groups(["num", "cat"], values, ["num2", "cat2", "num2"])
+        self.assertEqual(df2.dtypes.tolist(), [np.float64, object, np.int64])
+        self.assertTrue(np.all(df2.values == values))
+
+    def test_split_keeps_dtypes(self):
+        from autoflow.pipeline.components.preprocessing.operate.split.cat_num import SplitCatNum
+
+        df = GenericDataFrame(pd.DataFrame({"a": [1.5, 2.5, 3.5], "b": ["x", "y", "x"], "c": [1, 2, 3]}),
+                              feature_groups=["id", "id", "id"])
+        split = SplitCatNum()
+        split.in_feature_groups = "id"
+        split.out_feature_groups = None
+        split.fit(df)
+        df2 = split.transform(df)["X_train"]
+        self.assertEqual(df2.filter_feature_groups("num").dtypes.tolist(), [np.float64, np.int64])
+        self.assertEqual(df2.filter_feature_groups("cat").dtypes.tolist(), [object])
+
+
+class TestBlockDataFrame(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        df = pd.DataFrame(rng.rand(20, 5), columns=list("abcde"))
+        df["f"] = ["x", "y"] * 10
+        self.feature_groups = ["num", "cat", "num", "num", "id", "cat"]
+        self.df = GenericDataFrame(df, feature_groups=self.feature_groups)
+        self.block_df = BlockDataFrame.from_dataframe(self.df)
+
+    def test_filter_feature_groups(self):
+        filtered = self.block_df.filter_feature_groups(["num", "id"])
+        self.assertEqual(filtered.columns.tolist(), ["a", "c", "d", "e"])
+        self.assertTrue(np.all(filtered.feature_groups == pd.Series(["num"] * 3 + ["id"])))
+        # blocks are shared, not copied
+        self.assertIs(filtered.blocks["num"], self.block_df.blocks["num"])
+        self.assertTrue(np.all(filtered.get_values("num") == self.df[["a", "c", "d"]].values))
+
+    def test_replace_feature_groups(self):
+        selected = self.block_df.get_values("num")
+        # test 3->2
+        df3 = self.block_df.replace_feature_groups("num", selected[:, :2] * 2, "num2")
+        self.assertTrue(np.all(df3.feature_groups == pd.Series(["cat"] * 2 + ["id"] + ["num2"] * 2)))
+        self.assertIs(df3.blocks["id"], self.block_df.blocks["id"])
+        expected = self.df.replace_feature_groups("num", selected[:, :2] * 2, "num2")
+        # columns of a feature group are contiguous in blocks
+        self.assertEqual(sorted(df3.feature_groups), sorted(expected.feature_groups))
+        self.assertTrue(np.all(df3.get_values("num2") == expected.filter_feature_groups("num2").values))
+        # test 3->0
+        df3 = self.block_df.replace_feature_groups("num", np.zeros([20, 0]), "num2")
+        self.assertEqual(df3.shape, (20, 3))
+        # original frame is not modified
+        self.assertEqual(self.block_df.shape, (20, 6))
+        with self.assertRaises(ValueError):
+            self.block_df.blocks["num"].values[0, 0] = 1
+
+    def test_split(self):
+        df_train, df_valid = self.block_df.split([np.arange(5, 15), np.array([0, 3, 17])])
+        values = df_train.get_values("num")
+        self.assertTrue(np.shares_memory(values, self.block_df.blocks["num"].values))
+        self.assertTrue(np.all(values == self.df[["a", "c", "d"]].values[5:15]))
+        self.assertTrue(np.all(df_valid.get_values("num") == self.df[["a", "c", "d"]].values[[0, 3, 17]]))
+        self.assertEqual(df_valid.index.tolist(), [0, 3, 17])
+        df_sub, = df_train.split([[1, 2]])
+        self.assertEqual(df_sub.index.tolist(), [6, 7])
+        generic_df = df_valid.to_generic_dataframe()
+        self.assertTrue(isinstance(generic_df, GenericDataFrame))
+        self.assertEqual(generic_df["f"].tolist(), ["x", "y", "y"])
+        self.assertEqual(generic_df["a"].dtype, np.float64)
+
 
 if __name__ == '__main__':
     df = pd.read_csv("../examples/classification/train_classification.csv")
@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from autoflow.constants import multiclass_classification_task, regression_task
+from autoflow.evaluation.train_evaluator import TrainEvaluator
+from autoflow.tuner.tuner import Tuner
+from dsmac.configspace import ConfigurationSpace, UniformFloatHyperparameter
+from dsmac.facade.smac_hpo_facade import SMAC4HPO
+from dsmac.intensification.hyperband import Hyperband
+from dsmac.runhistory.runhistory2epm import RunHistory2EPM4Cost
+from dsmac.scenario.scenario import Scenario
+from dsmac.tae.execute_ta_run import StatusType
+
+# budgets 1/9, 1/3 and 1 of eta = 3
+INSTANCES = ["budget0.111111", "budget0.333333", "budget1"]
+
+
+def evaluate(config, seed=0, instance=""):
+    # runs on larger budgets are more expensive, so that budgets can be told apart by their costs
+    return config["x"] + 10 * INSTANCES.index(instance)
+
+
+class TestHyperband(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cs = ConfigurationSpace(seed=1)
+        self.cs.add_hyperparameter(UniformFloatHyperparameter("x", 0, 1))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_smac(self) -> SMAC4HPO:
+        scenario = Scenario({"run_obj": "quality", "cs": self.cs, "deterministic": "true",
+                             "instances": [[instance] for instance in INSTANCES],
+                             "cutoff_time": 10, "runcount-limit": 1000, "output_dir": ""},
+                            initial_runs=0, db_params={"database": os.path.join(self.directory, "runhistory.db")},
+                            use_pynisher=False)
+        return SMAC4HPO(scenario=scenario, rng=np.random.RandomState(1), tae_runner=evaluate,
+                        initial_configurations=[])
+
+    def test_budgets(self):
+        tuner = Tuner(evaluator=evaluate, search_method="hyperband")
+        np.testing.assert_allclose(tuner.get_budgets(), [1 / 9, 1 / 3, 1])
+        tuner = Tuner(evaluator=evaluate, search_method="hyperband",
+                      search_method_params={"eta": 2, "min_budget": 0.125})
+        np.testing.assert_allclose(tuner.get_budgets(), [0.125, 0.25, 0.5, 1])
+        self.assertEqual(TrainEvaluator().get_budget_instances("task", tuner.get_budgets()),
+                         ["task-budget0.125", "task-budget0.25", "task-budget0.5", "task-budget1"])
+
+    def test_rungs_and_promotions(self):
+        smac = self.get_smac()
+        hyperband = Hyperband(smac.solver, INSTANCES, eta=3)
+        # brackets s = 2, 1, 0: 9 -> 3 -> 1, 5 -> 1 and 3 configurations
+        hyperband.run(run_limit=22)
+        self.assertEqual(hyperband.n_runs, 22)
+        runs = list(smac.solver.runhistory.data.items())
+        instances = [run_key.instance_id for run_key, _ in runs]
+        self.assertEqual(instances, [INSTANCES[0]] * 9 + [INSTANCES[1]] * 3 + [INSTANCES[2]] +
+                         [INSTANCES[1]] * 5 + [INSTANCES[2]] + [INSTANCES[2]] * 3)
+        for stage, promoted in [(runs[:9], runs[9:12]), (runs[9:12], runs[12:13]), (runs[13:18], runs[18:19])]:
+            # the configurations with the lowest costs of a stage, in the order of their costs
+            best = sorted(stage, key=lambda run: run[1].cost)[:len(promoted)]
+            self.assertEqual([run_key.config_id for run_key, _ in best],
+                             [run_key.config_id for run_key, _ in promoted])
+        # each run of a bracket is on a new configuration
+        self.assertEqual(len({run_key.config_id for run_key, _ in runs[:9] + runs[13:18] + runs[19:]}), 17)
+
+    def test_run_limit(self):
+        smac = self.get_smac()
+        hyperband = Hyperband(smac.solver, INSTANCES, eta=3)
+        hyperband.run(run_limit=10)
+        self.assertEqual(len(smac.solver.runhistory.data), 10)
+
+    def test_model_of_one_budget(self):
+        smac = self.get_smac()
+        hyperband = Hyperband(smac.solver, INSTANCES, eta=3, use_model=True, min_points_in_model=4)
+        hyperband.run(run_limit=13)
+        trained_on = []
+        smac.solver.choose_next = lambda X, Y, incumbent_value: trained_on.append(Y) or []
+        hyperband.get_model_challengers()
+        # the largest budget with enough runs: 9 runs on the smallest one, 3 and 1 on the others
+        self.assertEqual(len(trained_on), 1)
+        self.assertEqual(trained_on[0].shape[0], 9)
+        self.assertTrue(np.all(trained_on[0] < 1))
+
+    def test_transform_of_budgets(self):
+        smac = self.get_smac()
+        Hyperband(smac.solver, INSTANCES, eta=3).run(run_limit=22)
+        runhistory = smac.solver.runhistory
+        rh2epm = RunHistory2EPM4Cost(scenario=smac.solver.scenario, num_params=1,
+                                     success_states=[StatusType.SUCCESS])
+        for i, instance in enumerate(INSTANCES):
+            X, Y = rh2epm.transform(runhistory, instances=[instance])
+            expected = [run_value.cost for run_key, run_value in runhistory.data.items()
+                        if run_key.instance_id == instance]
+            self.assertEqual(X.shape[0], len(expected))
+            # only runs of the budget
+            self.assertTrue(np.all((Y >= 10 * i) & (Y < 10 * i + 1)))
+            np.testing.assert_allclose(np.sort(Y.ravel()), np.sort(expected))
+        X, Y = rh2epm.transform(runhistory, instances=INSTANCES[1:])
+        self.assertEqual(X.shape[0], 13)
+        self.assertTrue(np.all(Y >= 10))
+
+
+class TestBudgetIndexes(unittest.TestCase):
+    def get_evaluator(self, ml_task, y_train):
+        evaluator = TrainEvaluator()
+        evaluator.ml_task = ml_task
+        evaluator.y_train = y_train
+        return evaluator
+
+    def test_classification(self):
+        y_train = np.array([0] * 90 + [1] * 45 + [2] * 9 + [0] * 18)
+        evaluator = self.get_evaluator(multiclass_classification_task, y_train)
+        self.assertIsNone(evaluator.get_budget_indexes(1))
+        previous = None
+        for budget in [1 / 27, 1 / 9, 1 / 3, 0.999]:
+            indexes = evaluator.get_budget_indexes(budget)
+            self.assertTrue(np.all(np.diff(indexes) > 0))
+            # classes keep their proportions, every class is present
+            counts = np.bincount(y_train[indexes], minlength=3)
+            np.testing.assert_array_equal(counts, [max(int(round(budget * n)), 1) for n in (108, 45, 9)])
+            # rows of a smaller budget are in larger ones
+            if previous is not None:
+                self.assertTrue(set(previous) <= set(indexes))
+            previous = indexes
+            # all the tuner workers use the same rows
+            np.testing.assert_array_equal(
+                self.get_evaluator(multiclass_classification_task, y_train).get_budget_indexes(budget), indexes)
+
+    def test_regression(self):
+        y_train = np.random.RandomState(0).rand(100)
+        evaluator = self.get_evaluator(regression_task, y_train)
+        small, large = evaluator.get_budget_indexes(0.1), evaluator.get_budget_indexes(0.5)
+        self.assertEqual((len(small), len(large)), (10, 50))
+        self.assertTrue(set(small) <= set(large))
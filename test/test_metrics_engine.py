@@ -0,0 +1,96 @@
+import unittest
+import warnings
+
+import numpy as np
+
+from autoflow.constants import binary_classification_task, multiclass_classification_task, regression_task
+from autoflow.metrics import _calculate_all_scores_by_scorers, calculate_score, accuracy, r2
+from autoflow.metrics.engine import calculate_all_classification_scores, calculate_all_regression_scores
+
+
+class TestMetricsEngine(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.RandomState(0)
+        warnings.simplefilter("ignore")
+
+    def tearDown(self):
+        warnings.resetwarnings()
+
+    def assert_scores_equal(self, score, expected):
+        self.assertEqual(sorted(score), sorted(expected))
+        for name in expected:
+            np.testing.assert_allclose(score[name], expected[name], rtol=1e-9, atol=1e-12, err_msg=name)
+
+    def get_classification_fold(self, n_classes, n_samples=60):
+        y_true = np.r_[np.arange(n_classes), self.rng.randint(n_classes, size=n_samples - n_classes)]
+        # few distinct probabilities, so that scores tie inside a column and across columns
+        counts = self.rng.randint(0, 4, size=(n_samples, n_classes)).astype("float64")
+        counts[np.arange(n_samples), y_true] += self.rng.randint(0, 3, size=n_samples)
+        counts[counts.sum(axis=1) == 0, 0] = 1
+        return y_true, counts / counts.sum(axis=1)[:, np.newaxis]
+
+    def test_classification(self):
+        for n_classes, ml_task in [(2, binary_classification_task), (3, multiclass_classification_task),
+                                   (5, multiclass_classification_task)]:
+            for seed in range(3):
+                with self.subTest(n_classes=n_classes, seed=seed):
+                    self.rng = np.random.RandomState(seed)
+                    y_true, y_proba = self.get_classification_fold(n_classes)
+                    self.assertTrue(np.any([len(np.unique(column)) < len(column) for column in y_proba.T]))
+                    score = calculate_all_classification_scores(y_true, y_proba)
+                    self.assertIsNotNone(score)
+                    self.assert_scores_equal(score, _calculate_all_scores_by_scorers(y_true, y_proba, ml_task))
+                    # labels as floats and as a column
+                    self.assert_scores_equal(calculate_all_classification_scores(
+                        y_true.astype("float64")[:, np.newaxis], y_proba), score)
+
+    def test_probabilities_not_normalized(self):
+        # roc_auc of multiclass folds is only defined if probabilities sum up to 1
+        y_true, y_proba = self.get_classification_fold(3)
+        y_proba[0] *= 0.5
+        score = calculate_all_classification_scores(y_true, y_proba)
+        self.assertNotIn("roc_auc_ovr_macro", score)
+        self.assert_scores_equal(score, _calculate_all_scores_by_scorers(y_true, y_proba,
+                                                                         multiclass_classification_task))
+
+    def test_classification_corner_cases(self):
+        y_true, y_proba = self.get_classification_fold(3)
+        corner_cases = {
+            "absent class": (np.where(y_true == 2, 1, y_true), y_proba),
+            "labels not encoded": (y_true + 1, y_proba),
+            "string labels": (np.array(["a", "b", "c"])[y_true], y_proba),
+            "predicted labels": (y_true, np.argmax(y_proba, axis=1)),
+            "decision values": (y_true, y_proba * 2 - 1),
+            "lengths differ": (y_true[1:], y_proba),
+        }
+        for case, (solution, prediction) in corner_cases.items():
+            with self.subTest(case=case):
+                self.assertIsNone(calculate_all_classification_scores(solution, prediction))
+        # the scorers are called one by one
+        solution, prediction = corner_cases["absent class"]
+        score = calculate_score(solution, prediction, multiclass_classification_task, accuracy, True)
+        self.assert_scores_equal(score, _calculate_all_scores_by_scorers(solution, prediction,
+                                                                         multiclass_classification_task))
+
+    def test_regression(self):
+        y_true = self.rng.randn(50)
+        # repeated residuals for the median
+        y_pred = y_true + np.round(self.rng.randn(50), 1)
+        score = calculate_all_regression_scores(y_true, y_pred)
+        self.assert_scores_equal(score, _calculate_all_scores_by_scorers(y_true, y_pred, regression_task))
+        self.assert_scores_equal(calculate_all_regression_scores(y_true, y_pred[:, np.newaxis]), score)
+        self.assert_scores_equal(calculate_score(y_true, y_pred, regression_task, r2, True), score)
+
+    def test_regression_corner_cases(self):
+        y_true = self.rng.randn(50)
+        corner_cases = {
+            "constant target": (np.ones(50), y_true),
+            "multi-output": (np.c_[y_true, y_true], np.c_[y_true, y_true]),
+            "lengths differ": (y_true[1:], y_true),
+        }
+        for case, (solution, prediction) in corner_cases.items():
+            with self.subTest(case=case):
+                self.assertIsNone(calculate_all_regression_scores(solution, prediction))
+        solution, prediction = corner_cases["constant target"]
+        self.assert_scores_equal(calculate_score(solution, prediction, regression_task, r2, True),
+                                 _calculate_all_scores_by_scorers(solution, prediction, regression_task))
@@ -0,0 +1,127 @@
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from autoflow.manager.model_loader import ModelCache, LazyModels
+from autoflow.manager.resource_manager import ResourceManager
+
+
+class TestModelCache(unittest.TestCase):
+    def test_lru(self):
+        cache = ModelCache(2)
+        cache.put("a", [1])
+        cache.put("b", [2])
+        # a is used more recently than b
+        self.assertEqual(cache.get("a"), [1])
+        cache.put("c", [3])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(list(cache.models), ["a", "c"])
+        # put again moves to the end
+        cache.put("a", [4])
+        cache.put("d", [5])
+        self.assertEqual(list(cache.models), ["a", "d"])
+        self.assertEqual(cache.get("a"), [4])
+
+    def test_disabled(self):
+        cache = ModelCache(0)
+        cache.put("a", [1])
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache.models), 0)
+
+
+class TestLazyModels(unittest.TestCase):
+    def setUp(self):
+        self.loaded = []
+
+    def load(self, path):
+        self.loaded.append(path)
+        time.sleep(0.1)
+        return [path, "fold1"]
+
+    def test_lazy(self):
+        models = LazyModels("path", self.load)
+        self.assertEqual(self.loaded, [])
+        self.assertIn("not loaded", repr(models))
+        self.assertEqual(len(models), 2)
+        self.assertEqual(models[0], "path")
+        self.assertEqual(list(models), ["path", "fold1"])
+        self.assertEqual(self.loaded, ["path"])
+        self.assertNotIn("not loaded", repr(models))
+
+    def test_threads(self):
+        models = LazyModels("path", self.load)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(models[1])) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["fold1"] * 8)
+        self.assertEqual(self.loaded, ["path"])
+
+    def test_pickle(self):
+        models = pickle.loads(pickle.dumps(LazyModels("path", self.load)))
+        self.assertIs(type(models), list)
+        self.assertEqual(models, ["path", "fold1"])
+
+
+class TestGetModelsList(unittest.TestCase):
+    def setUp(self):
+        self.store_path = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(3):
+            directory = os.path.join(self.store_path, f"trials{i % 2}")
+            os.makedirs(directory, exist_ok=True)
+            self.paths.append(os.path.join(directory, f"trial{i}.pkl"))
+        self.missing_path = os.path.join(self.store_path, "trials0", "missing.pkl")
+
+    def tearDown(self):
+        shutil.rmtree(self.store_path)
+
+    def get_resource_manager(self, **kwargs):
+        resource_manager = ResourceManager(self.store_path, **kwargs)
+        for i, path in enumerate(self.paths):
+            resource_manager.file_system.dump_pickle([i], path)
+        loaded = []
+        load_pickle = resource_manager.file_system.load_pickle
+        resource_manager.file_system.load_pickle = lambda path: loaded.append(path) or load_pickle(path)
+        return resource_manager, loaded
+
+    def test_model_cache(self):
+        resource_manager, loaded = self.get_resource_manager(model_cache_size=8)
+        paths = self.paths + [self.missing_path]
+        expected = [[0], [1], [2], None]
+        self.assertEqual(resource_manager.get_models_list(paths), expected)
+        self.assertEqual(resource_manager.get_models_list(paths), expected)
+        self.assertEqual(sorted(loaded), sorted(self.paths))
+        resource_manager, loaded = self.get_resource_manager()
+        resource_manager.get_models_list(paths)
+        resource_manager.get_models_list(paths)
+        self.assertEqual(len(loaded), 2 * len(self.paths))
+
+    def test_lazy_models(self):
+        resource_manager, loaded = self.get_resource_manager(lazy_models=True)
+        models_list = resource_manager.get_models_list(self.paths)
+        self.assertTrue(all(isinstance(models, LazyModels) for models in models_list))
+        self.assertEqual(loaded, [])
+        self.assertEqual(list(models_list[1]), [1])
+        self.assertEqual(loaded, [self.paths[1]])
+
+    def test_listdir_fails(self):
+        resource_manager, loaded = self.get_resource_manager()
+        checked = []
+        exists = resource_manager.file_system.exists
+
+        def listdir(parent):
+            raise OSError(parent)
+
+        resource_manager.file_system.listdir = listdir
+        resource_manager.file_system.exists = lambda path: checked.append(path) or exists(path)
+        paths = [self.paths[0], self.missing_path, self.paths[1]]
+        self.assertEqual(resource_manager.get_models_list(paths), [[0], None, [1]])
+        # the paths are checked one by one
+        self.assertEqual(sorted(checked), sorted(paths))
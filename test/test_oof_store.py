@@ -0,0 +1,92 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from autoflow.manager.oof_store import OOFStore
+from autoflow.manager.resource_manager import ResourceManager
+from autoflow.manager.trials_writer import TrialsWriter
+
+
+
+class TestOOFStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = OOFStore(self.directory, chunk_size=4)
+        self.y_true_indexes = [np.array([0, 2]), np.array([1, 3])]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, value):
+        return self.store.write(self.y_true_indexes, [np.full((2, 2), value), np.full((2, 2), -value)])
+
+    def test_row_order(self):
+        slot = self.write(1)
+        self.assertTrue(np.array_equal(self.store.get(slot)[:, 0], [1, -1, 1, -1]))
+
+    def test_take(self):
+        slots = [self.write(i) for i in range(6)]
+        view = self.store.take(slots[:3])
+        self.assertIsInstance(view, np.memmap)
+        self.assertEqual(view.shape, (3, 4, 2))
+        gathered = self.store.take([slots[0], slots[5]])
+        self.assertTrue(np.array_equal(gathered[:, 0, 0], [0, 5]))
+
+    def test_free(self):
+        slots = [self.write(i) for i in range(3)]
+        self.store.free([slots[1]])
+        slot = self.write(7)
+        self.assertEqual(slot, slots[1])
+        self.assertTrue(np.array_equal(self.store.get(slot)[:, 0], [7, -7, 7, -7]))
+        self.assertNotIn(self.write(8), slots)
+
+
+class TestOOFSlotsOfTrials(unittest.TestCase):
+    def setUp(self):
+        self.store_path = tempfile.mkdtemp()
+        self.resource_manager = ResourceManager(self.store_path, oof_store=True)
+        self.resource_manager.task_id = "oof_slots"
+        self.resource_manager.hdl_id = ""
+        self.resource_manager.experiment_id = 0
+        self.resource_manager.init_trials_table()
+
+    def tearDown(self):
+        self.resource_manager.close_trials_table()
+        shutil.rmtree(self.store_path)
+
+    def get_info(self, config_id, **kwargs):
+        return dict(config_id=config_id, loss=0.5, cost_time=1, status="SUCCESS", models=[], intermediate_result=None,
+                    y_true_indexes=[np.array([0, 2]), np.array([1, 3])], y_preds=[np.ones((2, 2))] * 2, **kwargs)
+
+    def get_slot_indexes(self):
+        return sorted(int(record.oof_slot.rsplit("/", 1)[1]) for record in self.resource_manager.TrialsModel.select())
+
+    def test_failed_insert(self):
+        # a score which can not be serialized fails the insert
+        bad_info = self.get_info("bad", all_score={"accuracy": object()})
+        with self.assertRaises(TypeError):
+            self.resource_manager.insert_many_to_trials_table([self.get_info("a"), bad_info])
+        with self.assertRaises(TypeError):
+            self.resource_manager.create_trial(self.resource_manager.get_trial_record(bad_info))
+        self.assertEqual(self.get_slot_indexes(), [])
+        # slots of the failed inserts are allocated again
+        self.resource_manager.insert_many_to_trials_table([self.get_info("a"), self.get_info("b")])
+        self.assertEqual(self.get_slot_indexes(), [0, 1])
+        # fold trials are not in the oof store
+        self.resource_manager.insert_many_to_trials_table([self.get_info("a", fold_index=0)])
+        self.assertEqual(self.resource_manager.TrialsModel.select().count(), 3)
+
+    def test_trials_writer(self):
+        writer = TrialsWriter(self.resource_manager)
+        writer.put(self.get_info("a"))
+        writer.put(self.get_info("bad", all_score={"accuracy": object()}))
+        writer.put(self.get_info("b"))
+        failed = writer.close()
+        self.assertEqual([info["config_id"] for info in failed], ["bad"])
+        # neither the failed batch nor the failed trial leak a slot
+        self.resource_manager.insert_many_to_trials_table([self.get_info("c")])
+        self.assertEqual(self.get_slot_indexes(), [0, 1, 2])
+        for record in self.resource_manager.TrialsModel.select():
+            self.assertTrue(np.array_equal(self.resource_manager.get_oof_store().get(record.oof_slot), np.ones((4, 2))))
@@ -0,0 +1,161 @@
+import os
+import shutil
+import signal
+import tempfile
+import time
+import unittest
+
+from pynisher import AnythingException, MemorylimitException, TimeoutException
+
+from autoflow.evaluation.train_evaluator import TrainEvaluator
+from autoflow.manager.resource_manager import ResourceManager
+from dsmac.configspace import ConfigurationSpace, CategoricalHyperparameter
+from dsmac.scenario.scenario import Scenario
+from dsmac.stats.stats import Stats
+from dsmac.tae.execute_func import ExecuteTAFuncDict
+from dsmac.tae.execute_ta_run import StatusType
+from dsmac.tae.persistent_worker import PersistentWorker
+
+# state of the process, changed by the initializer of the worker
+STATE = {"cache": True}
+
+
+def get_vm_size_in_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmSize:"):
+                return int(line.split()[1]) // 1024
+
+
+def evaluate(mode):
+    if mode == "sleep":
+        time.sleep(30)
+    elif mode == "stuck":
+        # as a function stuck in native code, which never handles the alarm
+        signal.signal(signal.SIGALRM, signal.SIG_IGN)
+        time.sleep(30)
+    elif mode == "memory":
+        return len(bytearray(1024 ** 3))
+    elif mode == "exception":
+        raise ValueError(mode)
+    elif mode == "exit":
+        os._exit(1)
+    elif mode == "cache":
+        return STATE["cache"]
+    return os.getpid()
+
+
+def evaluate_config(config):
+    result = evaluate(config["mode"])
+    return 0.5 if result is not None else None
+
+
+def disable_cache():
+    STATE["cache"] = False
+
+
+class TestPersistentWorker(unittest.TestCase):
+    def setUp(self):
+        # 256MB more than the address space of this process, which the worker inherits
+        self.worker = PersistentWorker(evaluate, mem_in_mb=get_vm_size_in_mb() + 256, grace_period_in_s=1)
+        self.worker.enforce_limits(wall_time_in_s=1)
+
+    def tearDown(self):
+        self.worker.close()
+
+    def test_success(self):
+        pid = self.worker("ok")
+        self.assertEqual(self.worker.exit_status, 0)
+        self.assertNotEqual(pid, os.getpid())
+        # the same process serves the next calls
+        self.assertEqual(self.worker("ok"), pid)
+
+    def test_exception(self):
+        pid = self.worker("ok")
+        self.assertIsNone(self.worker("exception"))
+        self.assertIs(self.worker.exit_status, AnythingException)
+        # the worker is kept alive
+        self.assertEqual(self.worker("ok"), pid)
+
+    def test_timeout(self):
+        pid = self.worker("ok")
+        self.assertIsNone(self.worker("sleep"))
+        self.assertIs(self.worker.exit_status, TimeoutException)
+        self.assertLess(self.worker.wall_clock_time, 2)
+        self.assertIsNone(self.worker.process)
+        self.assertNotEqual(self.worker("ok"), pid)
+
+    def test_memory_limit(self):
+        pid = self.worker("ok")
+        # 1GB is over the address space left to the worker
+        self.assertIsNone(self.worker("memory"))
+        self.assertIs(self.worker.exit_status, MemorylimitException)
+        self.assertIsNone(self.worker.process)
+        self.assertNotEqual(self.worker("ok"), pid)
+
+    def test_watchdog(self):
+        pid = self.worker("ok")
+        process = self.worker.process
+        self.assertIsNone(self.worker("stuck"))
+        # the parent waited for the wall time and the grace period, and killed the worker
+        self.assertIs(self.worker.exit_status, TimeoutException)
+        self.assertLess(self.worker.wall_clock_time, 4)
+        self.assertFalse(process.is_alive())
+        self.assertNotEqual(self.worker("ok"), pid)
+
+    def test_died(self):
+        pid = self.worker("ok")
+        self.assertIsNone(self.worker("exit"))
+        self.assertIs(self.worker.exit_status, AnythingException)
+        self.assertNotEqual(self.worker("ok"), pid)
+
+    def test_initializer(self):
+        worker = PersistentWorker(evaluate, initializer=disable_cache)
+        try:
+            self.assertIs(worker("cache"), False)
+            self.assertIs(STATE["cache"], True)
+        finally:
+            worker.close()
+
+
+class TestPersistentWorkerStatus(unittest.TestCase):
+    def setUp(self):
+        self.cs = ConfigurationSpace(seed=1)
+        self.cs.add_hyperparameter(CategoricalHyperparameter(
+            "mode", ["ok", "sleep", "stuck", "memory", "exception", "exit"]))
+        stats = Stats(Scenario({"run_obj": "quality", "cs": self.cs, "output_dir": ""}))
+        self.tae_runner = ExecuteTAFuncDict(ta=evaluate_config, stats=stats, memory_limit=get_vm_size_in_mb() + 256,
+                                            use_pynisher=True, persistent_worker=True)
+
+    def tearDown(self):
+        self.tae_runner.close()
+
+    def test_status(self):
+        expected = {"ok": StatusType.SUCCESS, "sleep": StatusType.TIMEOUT, "stuck": StatusType.TIMEOUT,
+                    "memory": StatusType.MEMOUT, "exception": StatusType.CRASHED, "exit": StatusType.CRASHED}
+        for mode, status in expected.items():
+            with self.subTest(mode=mode):
+                config = self.cs.get_default_configuration()
+                config["mode"] = mode
+                self.assertEqual(self.tae_runner.run(config, cutoff=1)[0], status)
+        self.assertEqual(self.tae_runner.run(self.cs.get_default_configuration(), cutoff=1)[:2],
+                         (StatusType.SUCCESS, 0.5))
+
+
+class TestMemoryCaches(unittest.TestCase):
+    def setUp(self):
+        self.store_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.store_path)
+
+    def test_disable_memory_caches(self):
+        for preprocessing_cache in ("memory", "disk"):
+            with self.subTest(preprocessing_cache=preprocessing_cache):
+                evaluator = TrainEvaluator(preprocessing_cache=preprocessing_cache)
+                evaluator.resource_manager = ResourceManager(self.store_path, model_cache_size=8)
+                evaluator.init_preprocessing_cache()
+                evaluator.disable_memory_caches()
+                # the disk cache is shared with the other workers, and does not take memory
+                self.assertEqual(evaluator.cache is None, preprocessing_cache == "memory")
+                self.assertEqual(evaluator.resource_manager.model_cache_size, 0)
@@ -0,0 +1,197 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import KFold
+
+from autoflow import constants
+from autoflow.evaluation.train_evaluator import TrainEvaluator
+from autoflow.pipeline.cache import get_step_cache_key, MemoryPreprocessingCache, DiskPreprocessingCache
+from autoflow.pipeline.components.classification.logistic_regression import LogisticRegression
+from autoflow.pipeline.components.preprocessing.encode.label import LabelEncoder
+from autoflow.pipeline.components.preprocessing.impute.fill_cat import FillCat
+from autoflow.pipeline.components.preprocessing.impute.fill_num import FillNum
+from autoflow.pipeline.dataframe import GenericDataFrame
+from autoflow.pipeline.pipeline import GenericPipeline
+
+
+def get_data(n_samples=90):
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame({
+        "cat": rng.choice(["a", "b", "c", None], size=n_samples),
+        "num": np.where(rng.rand(n_samples) < 0.1, np.nan, rng.randn(n_samples)),
+    })
+    y = ((df["cat"] == "a") | (df["num"] > 0.5)).values.astype("int")
+    return GenericDataFrame(df, feature_groups=["cat_nan", "num_nan"]), y
+
+
+def get_pipeline(fill_num_strategy="median"):
+    fill_cat = FillCat()
+    fill_cat.in_feature_groups = "cat_nan"
+    fill_cat.out_feature_groups = "cat"
+    fill_cat.update_hyperparams({"strategy": "<NULL>"})
+
+    fill_num = FillNum()
+    fill_num.in_feature_groups = "num_nan"
+    fill_num.out_feature_groups = "num"
+    fill_num.update_hyperparams({"strategy": fill_num_strategy})
+
+    label = LabelEncoder()
+    label.in_feature_groups = "cat"
+    label.out_feature_groups = "num"
+
+    lr = LogisticRegression()
+    lr.in_feature_groups = "num"
+    lr.update_hyperparams({"C": 1.0, "random_state": 10})
+
+    return GenericPipeline([
+        ("fill_cat", fill_cat),
+        ("fill_num", fill_num),
+        ("label", label),
+        ("lr", lr),
+    ])
+
+
+def get_evaluator(cache=None, **kwargs):
+    evaluator = TrainEvaluator(**kwargs)
+    evaluator.ml_task = constants.binary_classification_task
+    evaluator.splitter = KFold(n_splits=3, shuffle=True, random_state=0)
+    evaluator.resource_manager = SimpleNamespace(task_id="task")
+    evaluator.should_store_intermediate_result = False
+    evaluator.debug = True
+    evaluator.cache = cache
+    return evaluator
+
+
+class TestFoldExecutors(unittest.TestCase):
+    def get_fold_results(self, **kwargs):
+        X, y = get_data()
+        return list(get_evaluator(**kwargs).iter_fold_results(get_pipeline(), X, y, X, y))
+
+    def test_executors(self):
+        expected = self.get_fold_results()
+        self.assertEqual(len(expected), 3)
+        for kwargs in [{"n_fold_jobs": 3}, {"n_fold_jobs": 3, "fold_executor": "process"}]:
+            with self.subTest(**kwargs):
+                fold_results = self.get_fold_results(**kwargs)
+                # folds keep the order of the splitter
+                self.assertEqual(len(fold_results), len(expected))
+                for fold_result, expected_result in zip(fold_results, expected):
+                    self.assertEqual(fold_result["status"], "SUCCESS")
+                    np.testing.assert_array_equal(fold_result["valid_index"], expected_result["valid_index"])
+                    np.testing.assert_array_equal(fold_result["y_valid"], expected_result["y_valid"])
+                    np.testing.assert_allclose(fold_result["y_pred"], expected_result["y_pred"])
+                    np.testing.assert_allclose(fold_result["y_test_pred"], expected_result["y_test_pred"])
+        # each fold fits its own copy of the pipeline
+        self.assertEqual(len({id(fold_result["model"]) for fold_result in expected}), 3)
+
+    def test_fold_indexes(self):
+        expected = self.get_fold_results()
+        X, y = get_data()
+        fold_results = list(get_evaluator(n_fold_jobs=2).iter_fold_results(get_pipeline(), X, y, X, y, [2, 0]))
+        for fold_result, expected_result in zip(fold_results, [expected[2], expected[0]]):
+            np.testing.assert_array_equal(fold_result["valid_index"], expected_result["valid_index"])
+            np.testing.assert_allclose(fold_result["y_pred"], expected_result["y_pred"])
+
+
+class TestCacheKeys(unittest.TestCase):
+    def test_step_cache_key(self):
+        fill_num = get_pipeline()["fill_num"]
+        key = get_step_cache_key("prefix", "fill_num", fill_num)
+        self.assertEqual(get_step_cache_key("prefix", "fill_num", get_pipeline()["fill_num"]), key)
+        keys = {
+            "hyperparams": get_step_cache_key("prefix", "fill_num", get_pipeline("mean")["fill_num"]),
+            "prefix": get_step_cache_key("other prefix", "fill_num", fill_num),
+            "name": get_step_cache_key("prefix", "other_fill_num", fill_num),
+        }
+        for feature_groups in ["in_feature_groups", "out_feature_groups"]:
+            transformer = get_pipeline()["fill_num"]
+            setattr(transformer, feature_groups, "other")
+            keys[feature_groups] = get_step_cache_key("prefix", "fill_num", transformer)
+        for changed, changed_key in keys.items():
+            with self.subTest(changed=changed):
+                self.assertNotEqual(changed_key, key)
+        self.assertEqual(len(set(keys.values())), len(keys))
+
+    def test_fold_cache_key(self):
+        self.assertEqual(get_evaluator().get_fold_cache_key([0, 1], [2]), "")
+        evaluator = get_evaluator(MemoryPreprocessingCache())
+        key = evaluator.get_fold_cache_key(np.array([0, 1]), np.array([2]))
+        self.assertEqual(evaluator.get_fold_cache_key([0, 1], [2]), key)
+        self.assertNotEqual(evaluator.get_fold_cache_key([0, 2], [1]), key)
+        self.assertNotEqual(evaluator.get_fold_cache_key([0, 1], [3]), key)
+        evaluator.resource_manager.task_id = "other task"
+        self.assertNotEqual(evaluator.get_fold_cache_key([0, 1], [2]), key)
+
+
+class TestPreprocessingCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def get_caches(self, max_size_mb=1024):
+        return [MemoryPreprocessingCache(max_size_mb), DiskPreprocessingCache(self.cache_dir, max_size_mb)]
+
+    def test_fresh_copy(self):
+        for cache in self.get_caches():
+            with self.subTest(cache=cache.__class__.__name__):
+                cache.set("key", {"X": np.arange(3)})
+                value = cache.get("key")
+                self.assertIsNot(cache.get("key"), value)
+                value["X"][0] = 10
+                value["y"] = 1
+                self.assertEqual(list(cache.get("key")), ["X"])
+                np.testing.assert_array_equal(cache.get("key")["X"], np.arange(3))
+                self.assertIsNone(cache.get("missing"))
+                cache.clear()
+                self.assertIsNone(cache.get("key"))
+
+    def test_memory_eviction(self):
+        # about 400 bytes per entry, 2 entries fit
+        cache = MemoryPreprocessingCache(1000 / 1024 / 1024)
+        cache.set("k0", bytes(400))
+        cache.set("k1", bytes(400))
+        cache.get("k0")
+        cache.set("k2", bytes(400))
+        self.assertEqual(list(cache.entries), ["k0", "k2"])
+        self.assertLessEqual(cache.size, cache.max_size)
+        # an entry larger than the cache is not stored
+        cache.set("k3", bytes(2000))
+        self.assertEqual(list(cache.entries), ["k0", "k2"])
+
+    def test_disk_eviction(self):
+        cache = DiskPreprocessingCache(self.cache_dir, 1000 / 1024 / 1024)
+        start_time = time.time() - 100
+        for i, key in enumerate(["k0", "k1"]):
+            cache.set(key, bytes(400))
+            os.utime(cache.get_path(key), (start_time + i, start_time + i))
+        # a read makes k0 the most recently used
+        self.assertIsNotNone(cache.get("k0"))
+        cache.set("k2", bytes(400))
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ["k0.pkl", "k2.pkl"])
+        cache.set("k3", bytes(2000))
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ["k0.pkl", "k2.pkl"])
+
+    def test_pipeline_cache(self):
+        X, y = get_data()
+        for cache in self.get_caches():
+            with self.subTest(cache=cache.__class__.__name__):
+                evaluator = get_evaluator(cache)
+                first = list(evaluator.iter_fold_results(get_pipeline(), X, y, X, y))
+                second = list(evaluator.iter_fold_results(get_pipeline(), X, y, X, y))
+                # fill_cat, fill_num and label of each fold
+                self.assertEqual([result["cache_stats"] for result in first], [{"hits": 0, "misses": 3}] * 3)
+                self.assertEqual([result["cache_stats"] for result in second], [{"hits": 3, "misses": 0}] * 3)
+                for first_result, second_result in zip(first, second):
+                    np.testing.assert_allclose(second_result["y_pred"], first_result["y_pred"])
+                    self.assertIsNot(second_result["model"]["label"], first_result["model"]["label"])
+                # another hyperparameter of fill_num misses fill_num and the following steps
+                results = list(evaluator.iter_fold_results(get_pipeline("mean"), X, y, X, y))
+                self.assertEqual([result["cache_stats"] for result in results], [{"hits": 1, "misses": 2}] * 3)
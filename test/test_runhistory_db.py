@@ -0,0 +1,126 @@
+import datetime
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from dsmac.configspace import ConfigurationSpace, UniformFloatHyperparameter
+from dsmac.runhistory.runhistory import RunHistory
+from dsmac.runhistory.structure import DataOrigin
+from dsmac.tae.execute_ta_run import StatusType
+from dsmac.optimizer.objective import average_cost
+
+
+class TestRunHistoryDB(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cs = ConfigurationSpace(seed=1)
+        self.cs.add_hyperparameter(UniformFloatHyperparameter("x", 0, 1))
+        self.configs = self.cs.sample_configuration(4)
+        for config in self.configs:
+            config.origin = "Random Search"
+        # writers may wait 30s for the lock of the database
+        db_params = {"database": os.path.join(self.directory, "runhistory.db"), "timeout": 30}
+        # the runhistory of this process, and the one of another worker
+        self.runhistory = RunHistory(average_cost, overwrite_existing_runs=True, config_space=self.cs,
+                                     db_params=db_params)
+        self.other = RunHistory(average_cost, config_space=self.cs, db_params=db_params)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def insert_other(self, config, cost):
+        db = self.other.db
+        db.insert_runhistory(config, cost, 1.0, StatusType.SUCCESS)
+        # as if it was written by another process
+        db.Model.update(pid=os.getpid() + 1).where(db.Model.pid == os.getpid()).execute()
+
+    def test_timestamps_of_database(self):
+        self.insert_other(self.configs[0], 0.5)
+        first = self.other.db.Model.get().timestamp
+        self.assertIsInstance(first, datetime.datetime)
+        # the timestamp is updated with the row
+        self.insert_other(self.configs[0], 0.25)
+        self.assertGreaterEqual(self.other.db.Model.get().timestamp, first)
+
+    def test_fetch_new_runhistory(self):
+        db = self.runhistory.db
+        db.fetch_new_runhistory(True)
+        self.insert_other(self.configs[0], 0.5)
+        self.insert_other(self.configs[1], 0.25)
+        db.fetch_new_runhistory(False)
+        self.assertEqual(len(self.runhistory.data), 2)
+        # rows of the overlap window are not added twice
+        db.fetch_new_runhistory(False)
+        self.assertEqual(len(self.runhistory.data), 2)
+        # an updated row is read again
+        self.insert_other(self.configs[1], 0.125)
+        db.fetch_new_runhistory(False)
+        self.assertEqual(self.runhistory.get_cost(self.configs[1]), 0.125)
+
+    def test_late_commit(self):
+        db = self.runhistory.db
+        db.fetch_new_runhistory(True)
+        self.insert_other(self.configs[0], 0.5)
+        db.fetch_new_runhistory(False)
+        self.assertEqual(len(self.runhistory.data), 1)
+        # a row committed after the watermark was read, with a timestamp before it: its writer waited for the lock
+        self.insert_other(self.configs[1], 0.25)
+        late = db.watermark - datetime.timedelta(seconds=20)
+        Model = self.other.db.Model
+        Model.update(timestamp=late).where(Model.config_id == Model.get(Model.cost == 0.25).config_id).execute()
+        db.fetch_new_runhistory(False)
+        self.assertEqual(len(self.runhistory.data), 2)
+        self.assertEqual(self.runhistory.get_cost(self.configs[1]), 0.25)
+
+    def test_sync_overlap(self):
+        self.assertGreater(self.runhistory.db.sync_overlap, datetime.timedelta(seconds=30))
+        runhistory = RunHistory(average_cost, config_space=self.cs,
+                                db_params={"database": os.path.join(self.directory, "runhistory.db")})
+        self.assertGreaterEqual(runhistory.db.sync_overlap, datetime.timedelta(seconds=5))
+
+    def test_table_of_older_version(self):
+        import peewee as pw
+
+        database = pw.SqliteDatabase(os.path.join(self.directory, "old.db"))
+
+        class Run_History(pw.Model):
+            run_id = pw.CharField(primary_key=True)
+            config_id = pw.CharField(default="")
+            config = pw.TextField(default="{}")
+            config_bin = pw.BitField(default=0)
+            config_origin = pw.TextField(default="")
+            cost = pw.FloatField(default=65535)
+            time = pw.FloatField(default=0.0)
+            instance_id = pw.CharField(default="")
+            seed = pw.IntegerField(default=0)
+            status = pw.IntegerField(default=0)
+            additional_info = pw.CharField(default="")
+            origin = pw.IntegerField(default=0)
+            weight = pw.FloatField(default=0.0)
+            pid = pw.IntegerField(default=os.getpid)
+            # local time of the writer, ahead of UTC
+            timestamp = pw.DateTimeField(default=lambda: datetime.datetime.now() + datetime.timedelta(hours=8))
+
+            class Meta:
+                database = None
+                table_name = "runhistory"
+
+        Run_History._meta.set_database(database)
+        database.create_tables([Run_History])
+        Run_History.create(run_id="old", config_id="old", config_bin=pickle.dumps(self.configs[0]), cost=0.5,
+                           status=StatusType.SUCCESS.value, additional_info="{}", origin=DataOrigin.INTERNAL.value,
+                           pid=os.getpid() + 1)
+        database.close()
+        runhistory = RunHistory(average_cost, config_space=self.cs, db_params={"database": database.database})
+        db = runhistory.db
+        self.assertIn(["timestamp"], [index.columns for index in db.db.get_indexes("runhistory")])
+        self.assertIn(["pid", "origin"], [index.columns for index in db.db.get_indexes("runhistory")])
+        db.fetch_new_runhistory(True)
+        self.assertEqual(len(runhistory.data), 1)
+        self.other = RunHistory(average_cost, config_space=self.cs, db_params={"database": database.database})
+        self.insert_other(self.configs[1], 0.25)
+        # the watermark is not held in the future by the old rows
+        db.fetch_new_runhistory(False)
+        self.assertEqual(len(runhistory.data), 2)
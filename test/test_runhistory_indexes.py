@@ -0,0 +1,218 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from dsmac.configspace import ConfigurationSpace, UniformFloatHyperparameter, CategoricalHyperparameter, \
+    InCondition
+from dsmac.configspace.util import convert_configurations_to_array
+from dsmac.optimizer.objective import average_cost
+from dsmac.runhistory.columnar_runhistory import ColumnarRunHistory
+from dsmac.runhistory.runhistory import RunHistory
+from dsmac.runhistory.runhistory2epm import RunHistory2EPM4Cost, RunHistory2EPM4LogScaledCost
+from dsmac.scenario.scenario import Scenario
+from dsmac.tae.execute_ta_run import StatusType
+
+STATUSES = [StatusType.SUCCESS, StatusType.SUCCESS, StatusType.SUCCESS, StatusType.TIMEOUT, StatusType.CRASHED,
+            StatusType.CAPPED]
+
+
+def reference_incumbent(runhistory: RunHistory):
+    # get_incumbent before the costs were indexed: a scan of all the runs
+    incumbent = None
+    min_cost = np.inf
+    for run_key, run_value in runhistory.data.items():
+        cost = run_value.cost
+        if cost < min_cost:
+            incumbent = runhistory.ids_config[run_key.config_id]
+            min_cost = cost
+    return incumbent
+
+
+def reference_transform(rh2epm, runhistory: RunHistory, instances=None):
+    # transform before the runs were indexed: a scan of all the runs, one configuration converted per run
+    run_keys = [k for k in runhistory.data.keys() if instances is None or k.instance_id in instances]
+    s_keys = [k for k in run_keys if runhistory.data[k].status in rh2epm.success_states]
+    t_keys = [k for k in run_keys if runhistory.data[k].status == StatusType.TIMEOUT and
+              runhistory.data[k].time >= rh2epm.cutoff_time]
+
+    def build_matrix(keys, store_statistics):
+        X = np.full([len(keys), rh2epm.num_params + rh2epm.n_feats], np.nan)
+        y = np.ones([len(keys), 1])
+        for row, key in enumerate(keys):
+            conf_vector = convert_configurations_to_array([runhistory.ids_config[key.config_id]])[0]
+            if rh2epm.n_feats:
+                X[row, :] = np.hstack((conf_vector, rh2epm.instance_features[key.instance_id]))
+            else:
+                X[row, :] = conf_vector
+            y[row, 0] = runhistory.data[key].cost
+        if y.size > 0:
+            if store_statistics:
+                rh2epm.perc = np.percentile(y, rh2epm.scale_perc)
+                rh2epm.min_y = np.min(y)
+                rh2epm.max_y = np.max(y)
+            y = rh2epm.transform_response_values(values=y)
+        return X, y
+
+    X, Y = build_matrix(s_keys, True)
+    tX, tY = build_matrix(t_keys, rh2epm.min_y is None)
+    if not s_keys:
+        return tX, tY
+    return np.vstack((X, tX)), np.concatenate((Y, tY))
+
+
+class TestRunHistoryIndexes(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cs = ConfigurationSpace(seed=1)
+        classifier = CategoricalHyperparameter("classifier", ["a", "b"])
+        c = UniformFloatHyperparameter("c", 0, 1)
+        self.cs.add_hyperparameters([classifier, c, UniformFloatHyperparameter("x", 0, 1)])
+        # inactive hyperparameters are NaN in the configuration arrays
+        self.cs.add_condition(InCondition(c, classifier, ["a"]))
+        self.instances = ["i0", "i1", "i2"]
+        self.scenario = Scenario({"cs": self.cs, "run_obj": "quality", "output_dir": "", "cutoff_time": 10,
+                                  "instances": [[instance] for instance in self.instances],
+                                  "features": {instance: np.array([i, 1. / (i + 1)])
+                                               for i, instance in enumerate(self.instances)}})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_runhistory(self, klass, overwrite_existing_runs):
+        db_params = {"database": os.path.join(self.directory, f"{klass.__name__}.db")}
+        return klass(average_cost, overwrite_existing_runs=overwrite_existing_runs, config_space=self.cs,
+                     db_params=db_params)
+
+    def get_rh2epm(self, klass):
+        return klass(scenario=self.scenario, num_params=len(self.cs.get_hyperparameters()))
+
+    def generate_runs(self, seed, n_runs=150):
+        rng = np.random.RandomState(seed)
+        configs = self.cs.sample_configuration(12)
+        # costs are rounded, so that configurations tie
+        costs = np.round(rng.rand(n_runs), 1)
+        costs[rng.rand(n_runs) < 0.05] = np.nan
+        for i in range(n_runs):
+            yield dict(config=configs[rng.randint(len(configs))], cost=costs[i], time=rng.rand() * 20,
+                       status=STATUSES[rng.randint(len(STATUSES))], instance_id=self.instances[rng.randint(3)],
+                       seed=rng.randint(2), additional_info={})
+
+    def assert_runs_equal(self, runhistory: RunHistory, reference: RunHistory):
+        self.assertEqual(list(runhistory.data.keys()), list(reference.data.keys()))
+        for value, reference_value in zip(runhistory.data.values(), reference.data.values()):
+            # costs may be NaN
+            np.testing.assert_array_equal(value.cost, reference_value.cost)
+            self.assertEqual(value[1:], reference_value[1:])
+
+    def assert_costs_equal(self, runhistory: RunHistory, reference: RunHistory):
+        self.assertEqual(runhistory.get_incumbent(), reference.get_incumbent())
+        for config in reference.get_all_configs():
+            np.testing.assert_array_equal(runhistory.get_cost(config), reference.get_cost(config))
+
+    def test_incumbent_and_costs(self):
+        for klass in (RunHistory, ColumnarRunHistory):
+            for overwrite_existing_runs in (False, True):
+                with self.subTest(klass=klass.__name__, overwrite_existing_runs=overwrite_existing_runs):
+                    runhistory = self.get_runhistory(klass, overwrite_existing_runs)
+                    for run in self.generate_runs(1):
+                        runhistory.add(**run)
+                        self.assertEqual(runhistory.get_incumbent(), reference_incumbent(runhistory))
+                        if overwrite_existing_runs:
+                            # costs are not updated when a run is overwritten by a capped run
+                            continue
+                        for config in runhistory.get_all_configs():
+                            runs = runhistory.get_runs_for_config(config)
+                            if runs:
+                                # the incremental moving average is the aggregation of the runs
+                                np.testing.assert_allclose(runhistory.get_cost(config),
+                                                           average_cost(config, runhistory, runs))
+
+    def test_ties(self):
+        runhistory = self.get_runhistory(RunHistory, False)
+        configs = self.cs.sample_configuration(3)
+        for config in configs:
+            runhistory.add(config, 0.5, 1, StatusType.SUCCESS)
+        # the first run which got the minimal cost is the incumbent
+        self.assertEqual(runhistory.get_incumbent(), configs[0])
+        runhistory.add(configs[1], 0.5, 1, StatusType.SUCCESS, instance_id="i1")
+        self.assertEqual(runhistory.get_incumbent(), configs[0])
+        runhistory.add(configs[2], np.nan, 1, StatusType.SUCCESS, instance_id="i1")
+        self.assertEqual(runhistory.get_incumbent(), configs[0])
+        self.assertEqual(reference_incumbent(runhistory), configs[0])
+
+    def test_cheapest_run(self):
+        for klass in (RunHistory, ColumnarRunHistory):
+            with self.subTest(klass=klass.__name__):
+                runhistory = self.get_runhistory(klass, True)
+                a, b = self.cs.sample_configuration(2)
+                runhistory.add(a, 0.1, 1, StatusType.SUCCESS, instance_id="i0")
+                runhistory.add(a, 0.9, 1, StatusType.SUCCESS, instance_id="i1")
+                runhistory.add(b, 0.3, 1, StatusType.SUCCESS, instance_id="i0")
+                runhistory.add(b, 0.3, 1, StatusType.SUCCESS, instance_id="i1")
+                # not the configuration with the lowest aggregated cost
+                self.assertEqual(runhistory.get_incumbent(), a)
+                # the cheapest run is overwritten
+                runhistory.add(a, 0.95, 1, StatusType.SUCCESS, instance_id="i0")
+                self.assertEqual(runhistory.get_incumbent(), b)
+                runhistory.add(a, 0.05, 1, StatusType.SUCCESS, instance_id="i1")
+                self.assertEqual(runhistory.get_incumbent(), a)
+
+    def test_only_nan(self):
+        runhistory = self.get_runhistory(RunHistory, False)
+        runhistory.add(self.cs.sample_configuration(), np.nan, 1, StatusType.SUCCESS)
+        self.assertIsNone(runhistory.get_incumbent())
+        self.assertIsNone(reference_incumbent(runhistory))
+
+    def test_columnar_runhistory(self):
+        runhistory = self.get_runhistory(RunHistory, False)
+        columnar = self.get_runhistory(ColumnarRunHistory, False)
+        for run in self.generate_runs(2):
+            runhistory.add(**run)
+            columnar.add(**run)
+            self.assertEqual(columnar.get_incumbent(), runhistory.get_incumbent())
+        self.assert_runs_equal(columnar, runhistory)
+        self.assert_costs_equal(columnar, runhistory)
+        for config in runhistory.get_all_configs():
+            self.assertEqual(columnar.get_runs_for_config(config), runhistory.get_runs_for_config(config))
+
+    def test_transform(self):
+        for rh2epm_class in (RunHistory2EPM4Cost, RunHistory2EPM4LogScaledCost):
+            for klass in (RunHistory, ColumnarRunHistory):
+                for instances in (None, ["i0", "i2"]):
+                    with self.subTest(rh2epm=rh2epm_class.__name__, klass=klass.__name__, instances=instances):
+                        runhistory = self.get_runhistory(klass, True)
+                        rh2epm = self.get_rh2epm(rh2epm_class)
+                        reference = self.get_rh2epm(rh2epm_class)
+                        for i, run in enumerate(self.generate_runs(3)):
+                            runhistory.add(**run)
+                            if i % 10 == 0:
+                                X, Y = rh2epm.transform(runhistory, instances)
+                                X_reference, Y_reference = reference_transform(reference, runhistory, instances)
+                                np.testing.assert_array_equal(X, X_reference)
+                                np.testing.assert_array_equal(Y, Y_reference)
+
+    def test_npz(self):
+        columnar = self.get_runhistory(ColumnarRunHistory, False)
+        for run in self.generate_runs(4):
+            columnar.add(**run)
+        path = os.path.join(self.directory, "runhistory.npz")
+        columnar.save_json(path, save_external=True)
+        loaded = self.get_runhistory(ColumnarRunHistory, False)
+        loaded.load_json(path, self.cs)
+        self.assert_runs_equal(loaded, columnar)
+        # the saved runs are added again in the order of data, as by RunHistory.load_json
+        reference = self.get_runhistory(RunHistory, False)
+        for key, value in columnar.data.items():
+            reference.add(columnar.ids_config[key.config_id], value.cost, value.time, value.status, key.instance_id,
+                          key.seed, value.additional_info, columnar.external[key])
+        self.assert_costs_equal(loaded, reference)
+        # costs of the saved runhistory are averaged in another order, they are equal up to rounding
+        for config in columnar.get_all_configs():
+            np.testing.assert_allclose(loaded.get_cost(config), columnar.get_cost(config))
+        transformed = self.get_rh2epm(RunHistory2EPM4LogScaledCost).transform(columnar)
+        transformed_loaded = self.get_rh2epm(RunHistory2EPM4LogScaledCost).transform(loaded)
+        for array, array_loaded in zip(transformed, transformed_loaded):
+            np.testing.assert_array_equal(array, array_loaded)
@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from autoflow.manager.resource_manager import ResourceManager
+
+
+class TestSharedDatabase(unittest.TestCase):
+    def setUp(self):
+        self.store_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.store_path, ignore_errors=True)
+
+    def get_resource_manager(self):
+        resource_manager = ResourceManager(self.store_path, pooled_db=True)
+        resource_manager.task_id = "shared"
+        resource_manager.hdl_id = ""
+        resource_manager.experiment_id = 0
+        resource_manager.init_trials_table()
+        return resource_manager
+
+    def test_tables_created_once(self):
+        resource_manager = self.get_resource_manager()
+        resource_manager.TrialsModel.create(config_id="a")
+        # the tables are not created again by the next resource managers of the process
+        database = resource_manager.trials_db
+        created = []
+        create_tables = database.create_tables
+        database.create_tables = lambda models, **kwargs: created.append(models) or create_tables(models, **kwargs)
+        try:
+            other = ResourceManager(self.store_path, pooled_db=True)
+            other.task_id = "shared"
+            other.init_trials_table()
+            self.assertIs(other.trials_db, database)
+            self.assertEqual(created, [])
+            self.assertEqual(other.TrialsModel.select().count(), 1)
+        finally:
+            del database.create_tables
+
+    def test_store_removed(self):
+        resource_manager = self.get_resource_manager()
+        resource_manager.TrialsModel.create(config_id="a")
+        database_path = resource_manager.trials_db.database
+        resource_manager.close_trials_table()
+        shutil.rmtree(self.store_path)
+        # the tables are created again in the new store
+        resource_manager = self.get_resource_manager()
+        resource_manager.TrialsModel.create(config_id="b")
+        self.assertEqual([record.config_id for record in resource_manager.TrialsModel.select()], ["b"])
+        self.assertTrue(os.path.exists(database_path))
@@ -0,0 +1,62 @@
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from autoflow.manager.data_manager import DataManager
+
+
+def is_memory_mapped(array: np.ndarray) -> bool:
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+
+class TestSharedDataFrame(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_df(self, n_samples, seed):
+        rng = np.random.RandomState(seed)
+        return pd.DataFrame({
+            "cat": rng.choice(["a", "b", None], size=n_samples),
+            "many_cats": [f"c{i}" for i in rng.permutation(n_samples)],
+            "num": np.where(rng.rand(n_samples) < 0.2, np.nan, rng.randn(n_samples)),
+            "int": rng.randint(10, size=n_samples),
+            "target": rng.randint(2, size=n_samples),
+        })
+
+    def test_unpickled_data_manager(self):
+        data_manager = DataManager(X_train=self.get_df(300, 0), X_test=self.get_df(20, 1),
+                                   column_descriptions={"target": "target"})
+        expected = {name: getattr(data_manager, name).copy() for name in ("X_train", "X_test")}
+        data_manager.share_data(self.directory)
+        data_manager = pickle.loads(pickle.dumps(data_manager))
+        for name, expected_df in expected.items():
+            with self.subTest(name=name):
+                df = getattr(data_manager, name)
+                np.testing.assert_array_equal(df.feature_groups, expected_df.feature_groups)
+                pd.testing.assert_frame_equal(pd.DataFrame(df).astype(object), pd.DataFrame(expected_df).astype(object))
+                n_categoricals = 0
+                for block in df._mgr.blocks:
+                    if isinstance(block.values, pd.Categorical):
+                        # codes are attached, only categories are held by the process
+                        codes = block.values.codes
+                        self.assertTrue(is_memory_mapped(codes))
+                        self.assertFalse(codes.flags.writeable)
+                        n_categoricals += 1
+                    else:
+                        self.assertIsInstance(block.values, np.memmap)
+                        self.assertFalse(block.values.flags.writeable)
+                self.assertEqual(n_categoricals, 2)
+                # codes have the dtype pandas uses for the number of categories, they are not cast
+                self.assertEqual(df["cat"].cat.codes.dtype.name, "int8")
+                self.assertEqual(df["many_cats"].cat.codes.dtype.name, "int16" if name == "X_train" else "int8")
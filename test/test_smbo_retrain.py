@@ -0,0 +1,85 @@
+import unittest
+
+import numpy as np
+
+from dsmac.configspace import ConfigurationSpace, UniformFloatHyperparameter
+from dsmac.epm.rf_with_instances import RandomForestWithInstances
+from dsmac.epm.util_funcs import get_types
+from dsmac.optimizer.acquisition import EI
+from dsmac.optimizer.smbo import SMBO
+from dsmac.scenario.scenario import Scenario
+from dsmac.stats.stats import Stats
+
+
+class TestSMBORetrain(unittest.TestCase):
+    def setUp(self):
+        cs = ConfigurationSpace(seed=1)
+        cs.add_hyperparameters([UniformFloatHyperparameter(f"x{i}", 0, 1) for i in range(2)])
+        self.scenario = Scenario({"cs": cs, "run_obj": "quality", "output_dir": "", "deterministic": True})
+        types, bounds = get_types(cs, None)
+        self.model = RandomForestWithInstances(cs, types=types, bounds=bounds, seed=1, num_trees=5)
+        self.rng = np.random.RandomState(1)
+        self.X = self.rng.rand(12, 2)
+        self.Y = (self.X.sum(axis=1) + 0.1).reshape((-1, 1))
+
+    def get_smbo(self, **kwargs):
+        return SMBO(scenario=self.scenario, stats=Stats(self.scenario), initial_design=None, runhistory=None,
+                    runhistory2epm=None, intensifier=None, aggregate_func=None, num_run=1, model=self.model,
+                    acq_optimizer=None, acquisition_func=EI(self.model), rng=self.rng, **kwargs)
+
+    def test_retrain_every(self):
+        smbo = self.get_smbo(retrain_every=3)
+        smbo._train_model(self.X[:4], self.Y[:4])
+        smbo._train_model(self.X[:5], self.Y[:5])
+        smbo._train_model(self.X[:6], self.Y[:6])
+        self.assertEqual(smbo.stats.surrogate_fits, 1)
+        self.assertEqual(smbo.stats.surrogate_partial_fits, 0)
+        smbo._train_model(self.X[:7], self.Y[:7])
+        self.assertEqual(smbo.stats.surrogate_fits, 2)
+
+    def test_partial_retrain(self):
+        smbo = self.get_smbo(retrain_every=3, partial_retrain=True)
+        smbo._train_model(self.X[:4], self.Y[:4])
+        smbo._train_model(self.X[:5], self.Y[:5])
+        smbo._train_model(self.X[:6], self.Y[:6])
+        self.assertEqual(smbo.stats.surrogate_fits, 1)
+        self.assertEqual(smbo.stats.surrogate_partial_fits, 2)
+        self.assertTrue(np.array_equal(smbo._trained_Y, self.Y[:6]))
+
+    def test_nan_features(self):
+        # inactive hyperparameters are NaN, they do not force a retraining
+        X = self.X.copy()
+        X[::2, 1] = np.nan
+        smbo = self.get_smbo(retrain_every=3)
+        smbo._train_model(X[:4], self.Y[:4])
+        smbo._train_model(X[:5], self.Y[:5])
+        self.assertEqual(smbo.stats.surrogate_fits, 1)
+
+    def test_changed_configurations(self):
+        smbo = self.get_smbo(retrain_every=3)
+        smbo._train_model(self.X[:4], self.Y[:4])
+        smbo._train_model(self.X[1:6], self.Y[1:6])
+        self.assertEqual(smbo.stats.surrogate_fits, 2)
+
+    def test_rescaled_costs(self):
+        # as the log-scaled costs of runhistory2epm, normalized by the best cost
+        def transform(Y, best):
+            return np.log(Y - best + 0.01)
+
+        smbo = self.get_smbo(retrain_every=3, partial_retrain=True)
+        smbo._train_model(self.X[:4], transform(self.Y[:4], 0))
+        Y = transform(self.Y[:5], 0.05)
+        smbo._train_model(self.X[:5], Y)
+        self.assertEqual(smbo.stats.surrogate_fits, 1)
+        self.assertEqual(smbo.stats.surrogate_partial_fits, 1)
+        # costs of the trained observations are mapped back to the scale of the model
+        self.assertTrue(np.allclose(smbo._to_model_scale(Y[:4]), transform(self.Y[:4], 0)))
+        self.assertTrue(np.array_equal(smbo._trained_Y[:4], transform(self.Y[:4], 0)))
+
+        # the order of the costs changed, the model is retrained
+        Y = transform(self.Y[:6], 0)
+        Y[:2] = Y[:2][::-1]
+        smbo._train_model(self.X[:6], Y)
+        self.assertEqual(smbo.stats.surrogate_fits, 2)
+        self.assertIsNone(smbo._y_rescaling)
+        self.assertTrue(np.array_equal(smbo._to_model_scale(Y), Y))
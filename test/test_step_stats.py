@@ -0,0 +1,100 @@
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import KFold
+
+from autoflow import constants
+from autoflow.evaluation.train_evaluator import TrainEvaluator
+from autoflow.metrics import accuracy
+from autoflow.pipeline.cache import MemoryPreprocessingCache
+from autoflow.pipeline.components.classification.logistic_regression import LogisticRegression
+from autoflow.pipeline.components.preprocessing.impute.fill_num import FillNum
+from autoflow.pipeline.components.preprocessing.scale.standardize import StandardScaler
+from autoflow.pipeline.dataframe import GenericDataFrame
+from autoflow.pipeline.pipeline import GenericPipeline
+from dsmac.configspace import ConfigurationSpace, UniformFloatHyperparameter
+
+
+def get_pipeline():
+    fill_num = FillNum()
+    fill_num.in_feature_groups = "num_nan"
+    fill_num.out_feature_groups = "num"
+    fill_num.update_hyperparams({"strategy": "median"})
+
+    scale = StandardScaler()
+    scale.in_feature_groups = "num"
+    scale.out_feature_groups = "num"
+
+    lr = LogisticRegression()
+    lr.in_feature_groups = "num"
+    lr.update_hyperparams({"C": 1.0, "random_state": 10})
+
+    return GenericPipeline([
+        ("fill_num", fill_num),
+        ("scale", scale),
+        ("lr", lr),
+    ])
+
+
+class TestStepStats(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        X = rng.randn(60, 3)
+        X[rng.rand(60, 3) < 0.1] = np.nan
+        self.X = GenericDataFrame(pd.DataFrame(X, columns=["a", "b", "c"]), feature_groups=["num_nan"] * 3)
+        self.y = (np.nan_to_num(X[:, 0]) > 0).astype("int")
+
+    def assert_step_stats(self, step_stats, n_train, n_valid, n_test, cached):
+        self.assertEqual([(stats["name"], stats["phase"]) for stats in step_stats],
+                         [("fill_num", "fit"), ("scale", "fit"), ("lr", "fit"), ("lr", "predict"), ("lr", "predict")])
+        self.assertEqual([stats["input_shape"] for stats in step_stats],
+                         [[n_train, 3], [n_train, 3], [n_train, 3], [n_valid, 3], [n_test, 3]])
+        self.assertEqual([stats["output_shape"] for stats in step_stats],
+                         [[n_train, 3], [n_train, 3], None, [n_valid, 2], [n_test, 2]])
+        # only the preprocessing steps can be taken from the cache
+        self.assertEqual([stats.get("cached") for stats in step_stats], [cached, cached, None, None, None])
+        for stats in step_stats:
+            for key in ("wall_time", "cpu_time", "peak_rss_delta"):
+                self.assertGreaterEqual(stats[key], 0)
+
+    def test_procedure(self):
+        X_train, X_valid = self.X.split([np.arange(40), np.arange(40, 60)])
+        y_train, y_valid = self.y[:40], self.y[40:]
+        cache = MemoryPreprocessingCache()
+        for cached in (False, True):
+            result = get_pipeline().procedure(constants.binary_classification_task, X_train, y_train,
+                                              X_valid, y_valid, self.X, self.y, preprocessing_cache=cache)
+            self.assert_step_stats(result["step_stats"], 40, 20, 60, cached)
+
+    def test_trial(self):
+        infos = []
+        evaluator = TrainEvaluator(trace_allocations=True)
+        evaluator.init_data(
+            random_state=0,
+            data_manager=SimpleNamespace(X_train=self.X, y_train=self.y, X_test=self.X, y_test=self.y,
+                                         ml_task=constants.binary_classification_task),
+            metric=accuracy,
+            should_calc_all_metric=False,
+            splitter=KFold(n_splits=3, shuffle=True),
+            should_store_intermediate_result=False,
+            resource_manager=SimpleNamespace(task_id="task", insert_to_trials_table=infos.append),
+        )
+        evaluator.shp2model = lambda shp: ({constants.PHASE2: {"lr": {}}}, get_pipeline())
+        cs = ConfigurationSpace(seed=1)
+        cs.add_hyperparameter(UniformFloatHyperparameter("x", 0, 1))
+        self.assertEqual(evaluator(cs.sample_configuration())["status"], "SUCCESS")
+        info = infos[0]
+        # one list of steps per fold
+        self.assertEqual(len(info["step_stats"]), 3)
+        for step_stats in info["step_stats"]:
+            self.assert_step_stats(step_stats, 40, 20, 60, False)
+        # memory allocated from getting the data to scoring all the folds
+        self.assertEqual(sorted(info["allocation_stats"]), ["peak_bytes", "retained_bytes"])
+        self.assertGreater(info["allocation_stats"]["peak_bytes"], 0)
+        self.assertGreaterEqual(info["allocation_stats"]["peak_bytes"], info["allocation_stats"]["retained_bytes"])
+        # opt-in
+        evaluator.trace_allocations = False
+        evaluator(cs.sample_configuration())
+        self.assertNotIn("allocation_stats", infos[1])
@@ -0,0 +1,113 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import peewee as pw
+from playhouse.sqlite_ext import JSONField
+
+from autoflow.constants import binary_classification_task
+from autoflow.manager.resource_manager import ResourceManager
+from autoflow.utils.peewee import PickleFiled
+
+
+def create_old_trials_table(database_path):
+    # trials table of a store created before fold_index, budget, step_stats, ... were added
+    database = pw.SqliteDatabase(database_path)
+
+    class Trials(pw.Model):
+        trial_id = pw.IntegerField(primary_key=True)
+        config_id = pw.CharField(default="")
+        task_id = pw.CharField(default="")
+        hdl_id = pw.CharField(default="")
+        experiment_id = pw.IntegerField(default=0)
+        estimator = pw.CharField(default="")
+        loss = pw.FloatField(default=65535)
+        losses = JSONField(default=[])
+        models_bin = PickleFiled(default=0)
+        models_path = pw.TextField(default="")
+        y_true_indexes = PickleFiled(default=0)
+        y_preds = PickleFiled(default=0)
+        dict_hyper_param = JSONField(default={})
+        cost_time = pw.FloatField(default=65535)
+        status = pw.CharField(default="SUCCESS")
+        timestamp = pw.DateTimeField(default=datetime.datetime.now)
+
+        class Meta:
+            database = None
+
+    Trials._meta.set_database(database)
+    database.create_tables([Trials])
+    for config_id, loss in [("a", 0.5), ("b", 0.25), ("c", 0.75)]:
+        Trials.create(config_id=config_id, estimator="lr", loss=loss, cost_time=1, dict_hyper_param={"id": config_id})
+    database.close()
+
+
+class TestTrialsMigration(unittest.TestCase):
+    def setUp(self):
+        self.store_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.store_path)
+
+    def get_resource_manager(self, **kwargs):
+        resource_manager = ResourceManager(self.store_path, **kwargs)
+        resource_manager.task_id = "migration"
+        resource_manager.hdl_id = ""
+        resource_manager.experiment_id = 0
+        return resource_manager
+
+    def test_add_missing_columns(self):
+        for kwargs in ({}, {"pooled_db": True}, {"oof_store": True}):
+            with self.subTest(**kwargs):
+                resource_manager = self.get_resource_manager(**kwargs)
+                create_old_trials_table(os.path.join(resource_manager.databases_dir, "task_migration.db"))
+                resource_manager.init_trials_table()
+                columns = {column.name for column in resource_manager.trials_db.get_columns("trials")}
+                self.assertTrue({"fold_index", "budget", "step_stats", "intermediate_result_path",
+                                 "intermediate_result_bin"} <= columns)
+                self.assertEqual("oof_slot" in columns, "oof_store" in kwargs)
+                # old trials are complete trials
+                record = resource_manager.TrialsModel.get(resource_manager.TrialsModel.config_id == "a")
+                self.assertEqual((record.fold_index, record.budget, record.step_stats), (-1, 1, []))
+                best = resource_manager.get_best_k_trials(2)
+                self.assertEqual([resource_manager.TrialsModel.get_by_id(trial_id).config_id for trial_id in best],
+                                 ["b", "a"])
+                self.assertEqual(resource_manager.load_best_dhp(), {"id": "b"})
+                # new trials are inserted next to the old ones
+                resource_manager.create_trial(resource_manager.get_trial_record(
+                    {"config_id": "d", "loss": 0.125, "cost_time": 1, "status": "SUCCESS", "models": [],
+                     "intermediate_result": None}))
+                self.assertEqual(resource_manager.load_best_dhp(), {})
+                resource_manager.close_trials_table()
+                shutil.rmtree(resource_manager.databases_dir)
+                os.makedirs(resource_manager.databases_dir)
+
+    def insert_trial(self, resource_manager, config_id, loss, cost_time):
+        resource_manager.insert_to_trials_table(
+            {"config_id": config_id, "loss": loss, "cost_time": cost_time, "status": "SUCCESS",
+             "models": [f"model of {config_id}"], "intermediate_result": None})
+
+    def test_trial_blobs(self):
+        resource_manager = self.get_resource_manager(persistent_mode="db")
+        for config_id, loss, cost_time in [("a", 0.5, 1), ("b", 0.25, 2), ("c", 0.25, 1)]:
+            self.insert_trial(resource_manager, config_id, loss, cost_time)
+        resource_manager.close_trials_table()
+        # trials of the store are moved to the trialblobs table
+        resource_manager = self.get_resource_manager(persistent_mode="db", lean_trials=True)
+        resource_manager.init_trials_table()
+        self.assertNotIn("models_bin", {column.name for column in resource_manager.trials_db.get_columns("trials")})
+        # the trial with the lowest cost_time among the trials with the lowest loss
+        self.assertEqual(resource_manager.load_best_estimator(binary_classification_task).models, ["model of c"])
+        self.insert_trial(resource_manager, "d", 0.125, 1)
+        self.assertEqual(resource_manager.load_best_estimator(binary_classification_task).models, ["model of d"])
+        resource_manager.close_trials_table()
+        # and back to the trials table
+        resource_manager = self.get_resource_manager(persistent_mode="db")
+        resource_manager.init_trials_table()
+        self.assertEqual({record.config_id: record.models_bin for record in resource_manager.TrialsModel.select()},
+                         {config_id: [f"model of {config_id}"] for config_id in "abcd"})
+        self.insert_trial(resource_manager, "e", 0.0625, 1)
+        self.assertEqual(resource_manager.load_best_estimator(binary_classification_task).models, ["model of e"])
+        resource_manager.close_trials_table()
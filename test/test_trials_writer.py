@@ -0,0 +1,27 @@
+import unittest
+
+from autoflow.manager.trials_writer import TrialsWriter
+
+
+class FailingResourceManager():
+    # trials table which rejects the trials of config "bad"
+    def __init__(self):
+        self.rows = []
+
+    def insert_many_to_trials_table(self, infos):
+        if any(info["config_id"] == "bad" for info in infos):
+            raise ValueError("bad trial")
+        self.rows.extend(infos)
+
+
+class TestTrialsWriter(unittest.TestCase):
+    def test_failed_batch(self):
+        resource_manager = FailingResourceManager()
+        writer = TrialsWriter(resource_manager)
+        for config_id in ["a", "bad", "b"]:
+            writer.put({"config_id": config_id})
+        failed = writer.flush()
+        self.assertEqual([info["config_id"] for info in failed], ["bad"])
+        self.assertEqual(sorted(info["config_id"] for info in resource_manager.rows), ["a", "b"])
+        writer.put({"config_id": "bad"})
+        self.assertEqual(len(writer.close()), 1)
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from autoflow.tuner.tuner import Tuner
+from dsmac.configspace import ConfigurationSpace, UniformFloatHyperparameter
+from dsmac.facade.smac_hpo_facade import SMAC4HPO
+from dsmac.scenario.scenario import Scenario
+from dsmac.stats.stats import Stats
+from dsmac.tae.execute_ta_run import ExecuteTARun, StatusType, BudgetExhaustedException
+
+
+def evaluate(config, seed=0, instance=""):
+    time.sleep(0.2)
+    return config["x"]
+
+
+class RecordingTARun(ExecuteTARun):
+    # records the cutoff of each run
+    def __init__(self, stats):
+        super().__init__(ta=None, stats=stats, run_obj="quality")
+        self.cutoffs = []
+
+    def run(self, config, instance=None, cutoff=None, seed=12345, instance_specific="0"):
+        self.cutoffs.append(cutoff)
+        return StatusType.SUCCESS, 0, 0, {}
+
+
+class TestTunerDeadline(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cs = ConfigurationSpace(seed=1)
+        self.cs.add_hyperparameter(UniformFloatHyperparameter("x", 0, 1))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_smac(self, tuner: Tuner, initial_configs) -> SMAC4HPO:
+        scenario = Scenario({"run_obj": "quality", "cs": self.cs, "deterministic": "true", "instances": [["i0"]],
+                             "cutoff_time": 10, "runcount-limit": 1000, "output_dir": ""},
+                            initial_runs=0, db_params={"database": os.path.join(self.directory, "runhistory.db")},
+                            use_pynisher=False)
+        smac = SMAC4HPO(scenario=scenario, rng=np.random.RandomState(1), tae_runner=evaluate,
+                        initial_configurations=initial_configs)
+        smac.solver.initial_configurations = initial_configs
+        # as in Tuner.build_smac
+        smac.get_tae_runner().before_run = tuner.get_trial_time_left
+        smac.get_tae_runner().after_run = tuner.trial_times.append
+        return smac
+
+    def test_initial_design(self):
+        tuner = Tuner(evaluator=evaluate, time_left_for_this_task=0.5, ensemble_time_fraction=0)
+        tuner.set_deadline()
+        smac = self.get_smac(tuner, self.cs.sample_configuration(6))
+        smac.solver.start_()
+        # the deadline is checked before each run of the initial design
+        n_runs = len(smac.solver.runhistory.data)
+        self.assertLess(n_runs, 4)
+        self.assertLess(time.time() - tuner.deadline, 0.2)
+        # the wall time of each run, not of the whole initial design
+        self.assertEqual(len(tuner.trial_times), n_runs)
+        self.assertTrue(all(0.2 <= trial_time < 0.4 for trial_time in tuner.trial_times))
+
+    def test_trial_time_left(self):
+        tuner = Tuner(evaluator=evaluate)
+        tuner.set_deadline()
+        self.assertEqual(tuner.get_trial_time_left(), np.inf)
+        tuner = Tuner(evaluator=evaluate, time_left_for_this_task=10, ensemble_time_fraction=0)
+        tuner.set_deadline()
+        self.assertGreater(tuner.get_trial_time_left(), 9)
+        # the next trial is predicted to end after the deadline
+        tuner.trial_times.extend([8, 12])
+        self.assertEqual(tuner.get_trial_time_left(), 0)
+
+    def test_hooks_of_runs(self):
+        tae_runner = RecordingTARun(Stats(Scenario({"run_obj": "quality", "cs": self.cs, "output_dir": ""})))
+        wall_times = []
+        tae_runner.after_run = wall_times.append
+        tae_runner.before_run = lambda: 2.5
+        config = self.cs.sample_configuration()
+        tae_runner.start(config, "i0", cutoff=60)
+        self.assertEqual(tae_runner.cutoffs, [2])
+        tae_runner.before_run = lambda: np.inf
+        tae_runner.start(config, "i0", cutoff=60)
+        self.assertEqual(tae_runner.cutoffs, [2, 60])
+        self.assertEqual(len(wall_times), 2)
+        # no time left, the run is not started
+        tae_runner.before_run = lambda: 0
+        with self.assertRaises(BudgetExhaustedException):
+            tae_runner.start(config, "i0", cutoff=60)
+        self.assertEqual(len(tae_runner.cutoffs), 2)
+        self.assertEqual(len(wall_times), 2)
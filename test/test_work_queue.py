@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+from copy import deepcopy
+from multiprocessing import Manager
+from types import SimpleNamespace
+
+from autoflow.evaluation.base import BaseEvaluator
+from autoflow.tuner.tuner import Tuner
+from autoflow.utils.concurrence import WorkQueue
+from dsmac.configspace import ConfigurationSpace, UniformFloatHyperparameter
+
+
+class Evaluator(BaseEvaluator):
+    def __init__(self, path):
+        # configurations evaluated by all the processes, one line each
+        self.path = path
+        self.resource_manager = SimpleNamespace(delete_models=lambda: True)
+
+    def __call__(self, config, seed=0, instance=""):
+        with open(self.path, "a") as f:
+            f.write(f"{config['x']!r}\n")
+        return config["x"]
+
+
+def run_worker(tuner: Tuner, work_queue: WorkQueue, kwargs):
+    tuner.run([], work_queue=work_queue, **kwargs)
+
+
+class TestWorkQueue(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # smac writes its output in the working directory
+        self.cwd = os.getcwd()
+        os.chdir(self.directory)
+        self.manager = Manager()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.manager.shutdown()
+        shutil.rmtree(self.directory)
+
+    def test_work_stealing(self):
+        path = os.path.join(self.directory, "evaluated.txt")
+        tuner = Tuner(evaluator=Evaluator(path), run_limit=4, limit_resource=False, n_jobs=2,
+                      work_stealing=True)
+        tuner.shps = ConfigurationSpace(seed=1)
+        tuner.shps.add_hyperparameter(UniformFloatHyperparameter("x", 0, 1))
+        initial_configs = tuner.shps.sample_configuration(3)
+        items = [(config.get_array(), "Initial design") for config in initial_configs]
+        # a broken work unit, it fails in the worker which pulls it
+        items.insert(1, ("broken", "work", "unit"))
+        work_queue = WorkQueue(self.manager, items, tuner.get_run_limit())
+        kwargs = {"instance_id": "task", "rh_db_params": {"database": os.path.join(self.directory, "runhistory.db")}}
+        processes = [multiprocessing.Process(target=run_worker, args=(deepcopy(tuner), work_queue, kwargs))
+                     for _ in range(2)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        self.assertEqual([p.exitcode for p in processes], [0, 0])
+        # every initial configuration is evaluated once
+        with open(path) as f:
+            evaluated = [float(line) for line in f]
+        counts = Counter(evaluated)
+        for config in initial_configs:
+            self.assertEqual(counts[config["x"]], 1)
+        # the run limit is shared by the processes
+        self.assertEqual(work_queue.counter.value, 4)
+        self.assertIsNone(work_queue.get())
+        utilization = work_queue.get_utilization()
+        self.assertEqual(set(utilization), {p.pid for p in processes})
+        # the worker which pulled the broken work unit went on with the next ones
+        self.assertEqual(sum(stats["n_works"] for stats in utilization.values()), len(items) + 4)
+        self.assertGreaterEqual(len(evaluated), 3 + 4)